@@ -8,9 +8,33 @@ bl_info = {
     "category": "Object",
 }
 
+import argparse
+import atexit
+import gzip
+import hashlib
+import heapq
+import importlib
+import itertools
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
 import bpy
+import numpy as np
 from bpy.props import (
     BoolProperty,
+    CollectionProperty,
     EnumProperty,
     FloatProperty,
     FloatVectorProperty,
@@ -18,7 +42,131 @@ from bpy.props import (
     PointerProperty,
     StringProperty,
 )
-from bpy.types import Operator, Panel, PropertyGroup
+from bpy.types import Operator, Panel, PropertyGroup, UIList
+from mathutils import Matrix, Vector
+
+
+# -----------------------------
+# RNA capability probe
+# -----------------------------
+
+# Session-wide, per RNA struct type: attr -> setter check (see _compile_setter).
+# Built once per type by `_setters_for`, so applies never re-reflect.
+_SETTERS = {}
+# Diagnostics: rna identifier -> {attr: reason} for requested-but-unusable props.
+_REJECTED = {}
+
+_UNPROBED = object()
+
+
+def _compile_setter(prop):
+    """Return the value check for a writable RNA property, or None if read-only.
+
+    The check is `True` (accept anything), a tuple of Python types, or a
+    frozenset of enum identifiers.
+    """
+    if prop.is_readonly:
+        return None
+    kind = prop.type
+    if kind == "ENUM":
+        if prop.is_enum_flag:
+            return True
+        return frozenset(item.identifier for item in prop.enum_items)
+    if getattr(prop, "array_length", 0):
+        return True
+    if kind == "BOOLEAN":
+        return (bool, int)
+    if kind == "INT":
+        return (int,)
+    if kind == "FLOAT":
+        return (int, float)
+    if kind == "STRING":
+        return (str,)
+    return True
+
+
+def _setters_for(struct):
+    """Compiled setter table for the RNA type of `struct` (probed once per session)."""
+    rna = struct.bl_rna
+    setters = _SETTERS.get(rna.identifier)
+    if setters is None:
+        setters = {}
+        for prop in rna.properties:
+            if prop.identifier != "rna_type":
+                setters[prop.identifier] = _compile_setter(prop)
+        _SETTERS[rna.identifier] = setters
+    return setters
+
+
+def _reject(struct, attr, reason):
+    _REJECTED.setdefault(struct.bl_rna.identifier, {})[attr] = reason
+
+
+def _supports_enum(struct, attr, value) -> bool:
+    check = _setters_for(struct).get(attr)
+    return isinstance(check, frozenset) and value in check
+
+
+def _write_props(struct, pairs):
+    """Straight-line writes of (attr, value) pairs using the compiled setter table.
+
+    Unknown, read-only or mistyped properties are recorded in the probe
+    table and skipped from then on; other write errors are only recorded.
+    """
+    if struct is None:
+        return
+    setters = _setters_for(struct)
+    for attr, value in pairs:
+        check = setters.get(attr, _UNPROBED)
+        if check is True or (
+            check is not None
+            and check is not _UNPROBED
+            and (value in check if isinstance(check, frozenset) else isinstance(value, check))
+        ):
+            try:
+                setattr(struct, attr, value)
+            except AttributeError as e:
+                setters[attr] = None
+                _reject(struct, attr, f"not writable: {e}")
+            except Exception as e:
+                if isinstance(e, TypeError) and "read-only" in str(e):
+                    setters[attr] = None
+                    _reject(struct, attr, "read-only")
+                else:
+                    # Mode/context/range failures are per value: keep the setter.
+                    _reject(struct, attr, f"write failed: {e}")
+            continue
+        if check is _UNPROBED:
+            setters[attr] = None
+            _reject(struct, attr, "missing in this Blender build")
+        elif check is not None:
+            _reject(struct, attr, f"unsupported value {value!r}")
+        elif attr not in _REJECTED.get(struct.bl_rna.identifier, {}):
+            _reject(struct, attr, "read-only")
+
+
+def _set_if_has(obj, attr, value):
+    """Set attribute if it exists; swallow Blender version differences."""
+    _write_props(obj, ((attr, value),))
+
+
+def capability_table():
+    """Probe results for diagnostics.
+
+    Returns {rna_type: {"writable": [...], "rejected": {attr: reason}}} for
+    every RNA type this session has written to, plus the fluid settings types.
+    """
+    for name in ("FluidDomainSettings", "FluidFlowSettings"):
+        cls = getattr(bpy.types, name, None)
+        if cls is not None:
+            _setters_for(cls)
+    table = {}
+    for rna_id, setters in sorted(_SETTERS.items()):
+        table[rna_id] = {
+            "writable": sorted(a for a, check in setters.items() if check is not None),
+            "rejected": dict(sorted(_REJECTED.get(rna_id, {}).items())),
+        }
+    return table
 
 
 # -----------------------------
@@ -30,263 +178,2920 @@ DOMAIN_NAME = "FireVFX_Domain"
 EMITTER_NAME = "FireVFX_Emitter"
 MATERIAL_NAME = "FireVFX_Volume"
 
+# ID property holding the last values this addon wrote (JSON, see _apply_props).
+SNAPSHOT_PROP = "fire_vfx_applied"
+# Mesh ID property: object scale already baked into the vertices.
+BAKED_SCALE_PROP = "fire_vfx_baked_scale"
 
-def _set_if_has(obj, attr, value):
-    """Set attribute if it exists; swallow Blender version differences."""
-    if obj is None:
+
+def _snapshot_value(value):
+    """Normalize a value to its JSON-comparable snapshot form."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float, str)):
+        return value
+    try:
+        return [float(v) for v in value]
+    except TypeError:
+        return str(value)
+
+
+def _read_snapshot(id_data):
+    """Return the last-applied snapshot stored on an ID (empty dict if none)."""
+    if id_data is None:
+        return {}
+    raw = id_data.get(SNAPSHOT_PROP)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_snapshot(id_data, section: str, values):
+    if id_data is None:
         return
-    if hasattr(obj, attr):
-        try:
-            setattr(obj, attr, value)
-        except Exception:
-            # Some RNA props can throw due to mode/context/range.
-            pass
+    data = _read_snapshot(id_data)
+    data[section] = values
+    id_data[SNAPSHOT_PROP] = json.dumps(data, sort_keys=True)
+
+
+def _clear_snapshot(id_data):
+    if id_data is not None and SNAPSHOT_PROP in id_data:
+        del id_data[SNAPSHOT_PROP]
+
+
+def _apply_props(struct, pairs, previous, applied):
+    """Write only the (attr, value) pairs whose value differs from `previous`.
+
+    `applied` receives the snapshot form of every pair (written or not).
+    Returns (written, skipped).
+    """
+    changed = []
+    for attr, value in pairs:
+        key = _snapshot_value(value)
+        applied[attr] = key
+        if attr not in previous or previous[attr] != key:
+            changed.append((attr, value))
+    _write_props(struct, changed)
+    return len(changed), len(pairs) - len(changed)
 
 
-def _ensure_collection(name: str):
+def _ensure_collection(name: str, scene=None):
     col = bpy.data.collections.get(name)
     if col is None:
         col = bpy.data.collections.new(name)
-        bpy.context.scene.collection.children.link(col)
+        (scene or bpy.context.scene).collection.children.link(col)
     return col
 
 
-def _link_to_collection(obj, col):
-    if obj is None or col is None:
+def _get_or_create_material(name: str):
+    mat = bpy.data.materials.get(name)
+    if mat is None:
+        mat = bpy.data.materials.new(name=name)
+    mat.use_nodes = True
+    return mat
+
+
+def _set_color_ramp_elements(color_ramp, elements):
+    """Set ColorRamp elements deterministically.
+
+    Blender doesn't allow removing the last element in some versions, so we:
+    - Ensure at least 1 element exists
+    - Resize to match desired count
+    - Set positions/colors in index order
+    """
+    if color_ramp is None:
+        return
+
+    desired = list(elements)
+    if not desired:
         return
-    # Unlink from current collections (except scene root) then link to ours.
-    for c in list(obj.users_collection):
+
+    cr = color_ramp
+
+    # Ensure at least one element exists.
+    if len(cr.elements) == 0:
+        cr.elements.new(0.0)
+
+    # Grow/shrink to desired length.
+    while len(cr.elements) < len(desired):
+        cr.elements.new(desired[len(cr.elements)][0])
+
+    while len(cr.elements) > len(desired):
         try:
-            c.objects.unlink(obj)
+            cr.elements.remove(cr.elements[-1])
+        except Exception:
+            break
+
+    # Apply values.
+    for i, (pos, col) in enumerate(desired):
+        try:
+            cr.elements[i].position = float(pos)
+            cr.elements[i].color = col
         except Exception:
             pass
+
+
+# Tagged node names let `_sync_volume_shader` recognize a graph it built.
+NODE_OUTPUT = "FireVFX_Output"
+NODE_VOLUME = "FireVFX_PrincipledVolume"
+NODE_ATTR_DENSITY = "FireVFX_AttrDensity"
+NODE_ATTR_FLAME = "FireVFX_AttrFlame"
+NODE_RAMP = "FireVFX_FlameRamp"
+NODE_FLAME_MULT = "FireVFX_FlameMult"
+NODE_DENSITY_MULT = "FireVFX_DensityMult"
+NODE_EMISSION = "FireVFX_Emission"
+NODE_ABSORPTION = "FireVFX_Absorption"
+NODE_ADD = "FireVFX_AddShader"
+
+SHADER_NODES = {
+    NODE_OUTPUT: "ShaderNodeOutputMaterial",
+    NODE_VOLUME: "ShaderNodeVolumePrincipled",
+    NODE_ATTR_DENSITY: "ShaderNodeAttribute",
+    NODE_ATTR_FLAME: "ShaderNodeAttribute",
+    NODE_RAMP: "ShaderNodeValToRGB",
+    NODE_FLAME_MULT: "ShaderNodeMath",
+    NODE_DENSITY_MULT: "ShaderNodeMath",
+}
+
+# (from node, output, to node, input); sockets by name or index.
+SHADER_LINKS = (
+    (NODE_VOLUME, 0, NODE_OUTPUT, 1),  # Volume -> Material Output Volume
+    (NODE_ATTR_FLAME, "Fac", NODE_RAMP, 0),
+    (NODE_RAMP, "Color", NODE_VOLUME, "Emission Color"),
+    (NODE_ATTR_FLAME, "Fac", NODE_FLAME_MULT, 0),
+    (NODE_FLAME_MULT, "Value", NODE_VOLUME, "Emission Strength"),
+    (NODE_ATTR_DENSITY, "Fac", NODE_DENSITY_MULT, 0),
+    (NODE_DENSITY_MULT, "Value", NODE_VOLUME, "Density"),
+)
+
+# Cheaper graphs for thin flames: no scattering, optionally no smoke at all.
+_EMISSION_NODES = {
+    NODE_OUTPUT: "ShaderNodeOutputMaterial",
+    NODE_EMISSION: "ShaderNodeEmission",
+    NODE_ATTR_FLAME: "ShaderNodeAttribute",
+    NODE_RAMP: "ShaderNodeValToRGB",
+    NODE_FLAME_MULT: "ShaderNodeMath",
+}
+_EMISSION_LINKS = (
+    (NODE_ATTR_FLAME, "Fac", NODE_RAMP, 0),
+    (NODE_RAMP, "Color", NODE_EMISSION, "Color"),
+    (NODE_ATTR_FLAME, "Fac", NODE_FLAME_MULT, 0),
+    (NODE_FLAME_MULT, "Value", NODE_EMISSION, "Strength"),
+)
+
+# shader mode -> (nodes, links) of the graph `_build_volume_shader` makes.
+SHADER_GRAPHS = {
+    "FULL": (SHADER_NODES, SHADER_LINKS),
+    "EMISSION_ABSORPTION": (
+        dict(
+            _EMISSION_NODES,
+            **{
+                NODE_ATTR_DENSITY: "ShaderNodeAttribute",
+                NODE_DENSITY_MULT: "ShaderNodeMath",
+                NODE_ABSORPTION: "ShaderNodeVolumeAbsorption",
+                NODE_ADD: "ShaderNodeAddShader",
+            },
+        ),
+        _EMISSION_LINKS
+        + (
+            (NODE_ATTR_DENSITY, "Fac", NODE_DENSITY_MULT, 0),
+            (NODE_DENSITY_MULT, "Value", NODE_ABSORPTION, "Density"),
+            (NODE_EMISSION, 0, NODE_ADD, 0),
+            (NODE_ABSORPTION, 0, NODE_ADD, 1),
+            (NODE_ADD, 0, NODE_OUTPUT, 1),
+        ),
+    ),
+    "EMISSION": (_EMISSION_NODES, _EMISSION_LINKS + ((NODE_EMISSION, 0, NODE_OUTPUT, 1),)),
+}
+
+# Relative volume shading cost per sample (Cycles, calibrated by eye):
+# scattering needs light samples at every step, emission/absorption don't.
+SHADER_MODE_COST = {"FULL": 1.0, "EMISSION_ABSORPTION": 0.45, "EMISSION": 0.3}
+# AUTO picks a cheaper mode below these smoke weights (see `_smoke_weight`).
+_EMISSION_ONLY_SMOKE = 0.05
+_ABSORPTION_ONLY_SMOKE = 0.2
+
+
+_SHADER_MODE_ITEMS = [
+    ("AUTO", "Auto", "Pick the cheapest mode that still shows the rig's smoke"),
+    ("FULL", "Full Volume", "Principled Volume: emission, absorption and scattering"),
+    ("EMISSION_ABSORPTION", "Emission + Absorption", "No scattering: thin smoke darkens but is not lit"),
+    ("EMISSION", "Emission Only", "Flame only, smoke is invisible; cheapest for candles and torches"),
+]
+
+
+def _smoke_weight(settings) -> float:
+    """How much visible smoke a rig makes: smoke per flame x inflow density x shading density."""
+    return settings.flame_smoke * settings.flow_density * settings.smoke_density
+
+
+def _resolve_shader_mode(settings) -> str:
+    if settings.shader_mode != "AUTO":
+        return settings.shader_mode
+    weight = _smoke_weight(settings)
+    if weight < _EMISSION_ONLY_SMOKE:
+        return "EMISSION"
+    if weight < _ABSORPTION_ONLY_SMOKE:
+        return "EMISSION_ABSORPTION"
+    return "FULL"
+
+
+def _socket(sockets, key):
+    if isinstance(key, int):
+        return sockets[key] if key < len(sockets) else None
+    return sockets.get(key)
+
+
+def _build_volume_shader(mat, flame_strength=25.0, smoke_density=2.0, flame_ramp=((0.0, (0.05, 0.01, 0.0, 1.0)), (0.25, (1.0, 0.35, 0.05, 1.0)), (1.0, (1.0, 1.0, 1.0, 1.0))), mode="FULL"):
+    """Build a simple, robust Mantaflow volume shader.
+
+    Uses `Attribute` nodes: "density" and "flame". Nodes are named after
+    the `SHADER_GRAPHS[mode]` table so later updates can patch them in place.
+    """
+    graph_nodes, graph_links = SHADER_GRAPHS[mode]
+
+    nt = mat.node_tree
+    nodes = nt.nodes
+    links = nt.links
+
+    nodes.clear()
+
+    def new_node(name, location):
+        if name not in graph_nodes:
+            return None
+        node = nodes.new(graph_nodes[name])
+        node.name = name
+        node.label = name.replace("FireVFX_", "")
+        node.location = location
+        return node
+
+    new_node(NODE_OUTPUT, (520, 0))
+    pv = new_node(NODE_VOLUME, (260, 0))
+    new_node(NODE_EMISSION, (180, 140))
+    new_node(NODE_ABSORPTION, (180, -120))
+    new_node(NODE_ADD, (360, 0))
+
+    # Density
+    attr_density = new_node(NODE_ATTR_DENSITY, (-520, -120))
+    if attr_density is not None:
+        attr_density.attribute_name = "density"
+
+    # Flame
+    attr_flame = new_node(NODE_ATTR_FLAME, (-520, 140))
+    attr_flame.attribute_name = "flame"
+
+    ramp = new_node(NODE_RAMP, (-240, 140))
+    _set_color_ramp_elements(ramp.color_ramp, flame_ramp)
+
+    # Flame strength: flame * strength
+    mult = new_node(NODE_FLAME_MULT, (-20, 140))
+    mult.operation = "MULTIPLY"
+    mult.inputs[1].default_value = float(flame_strength)
+
+    # Smoke density: density * smoke_density
+    mult_d = new_node(NODE_DENSITY_MULT, (-20, -120))
+    if mult_d is not None:
+        mult_d.operation = "MULTIPLY"
+        mult_d.inputs[1].default_value = float(smoke_density)
+
+    # Links
+    for from_name, from_key, to_name, to_key in graph_links:
+        links.new(
+            _socket(nodes[from_name].outputs, from_key),
+            _socket(nodes[to_name].inputs, to_key),
+        )
+
+    if pv is not None:
+        # A little extinction helps smoke read.
+        _set_if_has(pv.inputs.get("Anisotropy"), "default_value", 0.2)
+        _set_if_has(pv.inputs.get("Color"), "default_value", (0.2, 0.2, 0.2, 1.0))
+
+
+def _shader_topology_ok(nt, mode="FULL"):
+    """True if `nt` is exactly the tagged `mode` graph `_build_volume_shader` makes.
+
+    Any missing/retyped node, extra node or changed link counts as a hand
+    edit, which makes the caller fall back to a full rebuild.
+    """
+    if nt is None:
+        return False
+    graph_nodes, graph_links = SHADER_GRAPHS[mode]
+    nodes = nt.nodes
+    if len(nodes) != len(graph_nodes) or len(nt.links) != len(graph_links):
+        return False
+    for name, idname in graph_nodes.items():
+        node = nodes.get(name)
+        if node is None or node.bl_idname != idname:
+            return False
+    for from_name, from_key, to_name, to_key in graph_links:
+        from_sock = _socket(nodes[from_name].outputs, from_key)
+        to_sock = _socket(nodes[to_name].inputs, to_key)
+        if from_sock is None or to_sock is None or not to_sock.is_linked:
+            return False
+        link = to_sock.links[0]
+        if link.from_node.name != from_name or link.from_socket.identifier != from_sock.identifier:
+            return False
+    return True
+
+
+def _patch_volume_shader(nt, flame_strength, smoke_density, flame_ramp):
+    """Update only the values of an intact FireVFX graph (no recompile of topology)."""
+    nodes = nt.nodes
+    for name, value in ((NODE_FLAME_MULT, flame_strength), (NODE_DENSITY_MULT, smoke_density)):
+        if name not in nodes:  # emission-only graph has no smoke
+            continue
+        sock = nodes[name].inputs[1]
+        if abs(sock.default_value - float(value)) > 1e-6:
+            sock.default_value = float(value)
+
+    elements = nodes[NODE_RAMP].color_ramp.elements
+    desired = list(flame_ramp)
+    same = len(elements) == len(desired) and all(
+        abs(el.position - float(pos)) < 1e-6
+        and all(abs(a - float(b)) < 1e-6 for a, b in zip(el.color, col))
+        for el, (pos, col) in zip(elements, desired)
+    )
+    if not same:
+        _set_color_ramp_elements(nodes[NODE_RAMP].color_ramp, desired)
+
+
+def _sync_volume_shader(mat, flame_strength, smoke_density, flame_ramp, patch=True, mode="FULL"):
+    """Patch the shader in place when possible, else rebuild. Returns True if rebuilt."""
+    if patch and _shader_topology_ok(mat.node_tree, mode):
+        _patch_volume_shader(mat.node_tree, flame_strength, smoke_density, flame_ramp)
+        return False
+    _build_volume_shader(
+        mat,
+        flame_strength=flame_strength,
+        smoke_density=smoke_density,
+        flame_ramp=flame_ramp,
+        mode=mode,
+    )
+    return True
+
+
+def _shader_values(settings):
+    """Shading inputs that feed `_build_volume_shader`, as snapshot pairs."""
+    return (
+        ("flame_strength", float(settings.flame_strength)),
+        ("smoke_density", float(settings.smoke_density)),
+        ("flame_color_low", tuple(settings.flame_color_low)),
+        ("flame_color_mid", tuple(settings.flame_color_mid)),
+        ("flame_color_high", tuple(settings.flame_color_high)),
+        ("shader_mode", _resolve_shader_mode(settings)),
+    )
+
+
+# Shared shader: one material for every rig, its look read per object.
+SHARED_MATERIAL_NAME = "FireVFX_Volume_Shared"
+SHADER_GROUP_NAME = "FireVFX_FireShader"
+NODE_GROUP = "FireVFX_Group"
+# Bump when the node group layout changes so older files rebuild it.
+SHADER_GROUP_VERSION = 1
+# Shading setting -> object custom property read by an Object attribute node.
+SHADING_PROPS = (
+    ("flame_strength", "fire_vfx_flame_strength"),
+    ("smoke_density", "fire_vfx_smoke_density"),
+    ("flame_color_low", "fire_vfx_flame_color_low"),
+    ("flame_color_mid", "fire_vfx_flame_color_mid"),
+    ("flame_color_high", "fire_vfx_flame_color_high"),
+)
+# Flame values where the low/mid/high colors sit (same as the ColorRamp).
+FLAME_RAMP_POSITIONS = (0.0, 0.25, 1.0)
+
+
+def _shared_names(mode: str):
+    """(node group, material) names of the shared shader for a shader mode."""
+    if mode == "FULL":
+        return SHADER_GROUP_NAME, SHARED_MATERIAL_NAME
+    suffix = "_" + mode.title().replace("_", "")
+    return SHADER_GROUP_NAME + suffix, SHARED_MATERIAL_NAME + suffix
+
+
+def _new_group_output(ng, name: str, socket_type: str):
+    if hasattr(ng, "interface"):  # Blender 4.0+
+        return ng.interface.new_socket(name, in_out="OUTPUT", socket_type=socket_type)
+    return ng.outputs.new(socket_type, name)
+
+
+def _clear_group_interface(ng):
+    if hasattr(ng, "interface"):
+        ng.interface.clear()
+    else:
+        ng.inputs.clear()
+        ng.outputs.clear()
+
+
+def _build_shader_group(mode="FULL"):
+    """(Re)build the FireVFX fire node group for a shader mode; returns it.
+
+    Density/flame come from the volume grids; strength, density scale and
+    the three flame colors come from the object's custom properties (see
+    `SHADING_PROPS`). The flame ramp is two clamped Map Range + Mix nodes,
+    since ColorRamp stops cannot be driven by sockets.
+    """
+    group_name = _shared_names(mode)[0]
+    ng = bpy.data.node_groups.get(group_name)
+    if ng is None:
+        ng = bpy.data.node_groups.new(group_name, "ShaderNodeTree")
+    ng.nodes.clear()
+    _clear_group_interface(ng)
+    _new_group_output(ng, "Volume", "NodeSocketShader")
+    nodes, links = ng.nodes, ng.links
+
+    def node(idname, x, y):
+        n = nodes.new(idname)
+        n.location = (x, y)
+        return n
+
+    def attribute(name, kind, y):
+        n = node("ShaderNodeAttribute", -900, y)
+        n.attribute_name = name
+        _set_if_has(n, "attribute_type", kind)
+        return n
+
+    def math(op, a, b, x, y):
+        n = node("ShaderNodeMath", x, y)
+        n.operation = op
+        links.new(a, n.inputs[0])
+        links.new(b, n.inputs[1])
+        return n.outputs[0]
+
+    def map_range(value, lo, hi, y):
+        n = node("ShaderNodeMapRange", -600, y)
+        _set_if_has(n, "clamp", True)
+        links.new(value, n.inputs["Value"])
+        n.inputs["From Min"].default_value = lo
+        n.inputs["From Max"].default_value = hi
+        return n.outputs["Result"]
+
+    def mix(fac, a, b, x, y):
+        n = node("ShaderNodeMixRGB", x, y)
+        links.new(fac, n.inputs["Fac"])
+        links.new(a, n.inputs["Color1"])
+        links.new(b, n.inputs["Color2"])
+        return n.outputs["Color"]
+
+    props = dict(SHADING_PROPS)
+    flame = attribute("flame", "GEOMETRY", 300).outputs["Fac"]
+    strength = attribute(props["flame_strength"], "OBJECT", 100).outputs["Fac"]
+    low = attribute(props["flame_color_low"], "OBJECT", 700).outputs["Color"]
+    mid = attribute(props["flame_color_mid"], "OBJECT", 600).outputs["Color"]
+    high = attribute(props["flame_color_high"], "OBJECT", 500).outputs["Color"]
+
+    p0, p1, p2 = FLAME_RAMP_POSITIONS
+    color = mix(map_range(flame, p0, p1, 450), low, mid, -350, 600)
+    color = mix(map_range(flame, p1, p2, 250), color, high, -150, 500)
+
+    emission = math("MULTIPLY", flame, strength, -350, 200)
+    if mode != "EMISSION":
+        density = attribute("density", "GEOMETRY", -300).outputs["Fac"]
+        smoke = attribute(props["smoke_density"], "OBJECT", -500).outputs["Fac"]
+        smoke = math("MULTIPLY", density, smoke, -350, -400)
+
+    if mode == "FULL":
+        pv = node("ShaderNodeVolumePrincipled", 200, 0)
+        links.new(color, _socket(pv.inputs, "Emission Color"))
+        links.new(emission, _socket(pv.inputs, "Emission Strength"))
+        links.new(smoke, _socket(pv.inputs, "Density"))
+        _set_if_has(pv.inputs.get("Anisotropy"), "default_value", 0.2)
+        _set_if_has(pv.inputs.get("Color"), "default_value", (0.2, 0.2, 0.2, 1.0))
+        shader = pv.outputs[0]
+    else:
+        em = node("ShaderNodeEmission", 100, 100)
+        links.new(color, em.inputs["Color"])
+        links.new(emission, em.inputs["Strength"])
+        shader = em.outputs[0]
+        if mode == "EMISSION_ABSORPTION":
+            ab = node("ShaderNodeVolumeAbsorption", 100, -200)
+            links.new(smoke, ab.inputs["Density"])
+            add = node("ShaderNodeAddShader", 300, 0)
+            links.new(shader, add.inputs[0])
+            links.new(ab.outputs[0], add.inputs[1])
+            shader = add.outputs[0]
+
+    out = node("NodeGroupOutput", 500, 0)
+    links.new(shader, out.inputs[0])
+    ng["fire_vfx_version"] = SHADER_GROUP_VERSION
+    return ng
+
+
+def _ensure_shared_material(mode="FULL"):
+    """The shared FireVFX material of a shader mode (group node -> volume output)."""
+    group_name, mat_name = _shared_names(mode)
+    ng = bpy.data.node_groups.get(group_name)
+    if ng is None or ng.get("fire_vfx_version") != SHADER_GROUP_VERSION:
+        ng = _build_shader_group(mode)
+    mat = _get_or_create_material(mat_name)
+    nt = mat.node_tree
+    group = nt.nodes.get(NODE_GROUP)
+    output = nt.nodes.get(NODE_OUTPUT)
+    if (
+        group is None
+        or output is None
+        or len(nt.nodes) != 2
+        or group.node_tree != ng
+        or not output.inputs["Volume"].is_linked
+    ):
+        nt.nodes.clear()
+        output = nt.nodes.new("ShaderNodeOutputMaterial")
+        output.name = NODE_OUTPUT
+        output.location = (300, 0)
+        group = nt.nodes.new("ShaderNodeGroup")
+        group.name = NODE_GROUP
+        group.node_tree = ng
+        nt.links.new(group.outputs[0], output.inputs["Volume"])
+    return mat
+
+
+def _shading_props(settings):
+    """(object custom property, value) pairs the shared shader reads."""
+    values = dict(_shader_values(settings))
+    return tuple((prop, values[attr]) for attr, prop in SHADING_PROPS)
+
+
+def _copy_shading_props(src, dst):
+    for _attr, prop in SHADING_PROPS:
+        if prop in src:
+            dst[prop] = src[prop]
+
+
+def _assign_material(obj, mat):
+    if obj.data is None:
+        return
+    if len(obj.data.materials) == 0:
+        obj.data.materials.append(mat)
+    elif obj.data.materials[0] != mat:
+        obj.data.materials[0] = mat
+
+
+def _ensure_shared_shading(domain_obj, settings, force=False):
+    """Write the rig's look as domain custom properties; returns (written, skipped).
+
+    Only object properties change, so the shared material's shader is
+    never recompiled for a look change.
+    """
+    mat = _ensure_shared_material(_resolve_shader_mode(settings))
+    previous = {} if force else _read_snapshot(domain_obj).get("shading", {})
+    applied = {}
+    written = skipped = 0
+    for prop, value in _shading_props(settings):
+        key = _snapshot_value(value)
+        applied[prop] = key
+        if previous.get(prop) == key and prop in domain_obj:
+            skipped += 1
+            continue
+        domain_obj[prop] = key
+        written += 1
+    if written:
+        _write_snapshot(domain_obj, "shading", applied)
+        # ID property writes do not tag the object for the depsgraph.
+        domain_obj.update_tag()
+    _assign_material(domain_obj, mat)
+    return written, skipped
+
+
+# Material pool (Baked Values mode): one material per distinct look.
+MATERIAL_POOL_PREFIX = MATERIAL_NAME + "_"
+# Material ID properties: hash of the look it renders, and the rig ids using it.
+POOL_HASH_PROP = "fire_vfx_shading_hash"
+POOL_USERS_PROP = "fire_vfx_rigs"
+
+
+def _shading_hash(settings) -> str:
+    values = [[a, _snapshot_value(v)] for a, v in _shader_values(settings)]
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()[:12]
+
+
+def _pool_users(mat):
+    return {u for u in mat.get(POOL_USERS_PROP, "").split(",") if u}
+
+
+def _set_pool_users(mat, users):
+    mat[POOL_USERS_PROP] = ",".join(sorted(users))
+
+
+def _pool_material(settings, current, rig_id: str):
+    """Pooled material for `settings`' look, with `rig_id` counted as a user.
+
+    An existing material with the same hash is reused as is. Otherwise the
+    rig's current pool material is re-keyed in place when the rig is its
+    only user (so the shader can be patched rather than compiled anew),
+    else a new pool material is made.
+    """
+    h = _shading_hash(settings)
+    name = MATERIAL_POOL_PREFIX + h
+    mat = bpy.data.materials.get(name)
+    if mat is None:
+        if current is not None and current.get(POOL_HASH_PROP) and _pool_users(current) <= {rig_id}:
+            mat = current
+            mat.name = name
+        else:
+            mat = bpy.data.materials.new(name)
+    mat[POOL_HASH_PROP] = h
+    mat.use_nodes = True
+    if rig_id:
+        _set_pool_users(mat, _pool_users(mat) | {rig_id})
+    return mat
+
+
+def _release_pool_material(mat, rig_id: str):
+    """Drop `rig_id` from a pool material; delete it once nothing uses it."""
+    if not mat.get(POOL_HASH_PROP):
+        return
+    users = _pool_users(mat) - {rig_id}
+    _set_pool_users(mat, users)
+    if not users and mat.users == 0:
+        bpy.data.materials.remove(mat)
+
+
+def gc_material_pool():
+    """Recount pool users from every scene's rigs and delete orphans.
+
+    The legacy single FireVFX_Volume material is removed too once nothing
+    uses it. Returns the number of materials deleted.
+    """
+    refs = {}
+    for scene in bpy.data.scenes:
+        state = getattr(scene, "fire_vfx_scene", None)
+        for rig in state.rigs if state is not None else ():
+            mat = rig.domain.active_material if rig.domain is not None else None
+            if mat is not None and mat.get(POOL_HASH_PROP):
+                refs.setdefault(mat.name, set()).add(rig.rig_id)
+    removed = 0
+    for mat in list(bpy.data.materials):
+        pooled = bool(mat.get(POOL_HASH_PROP))
+        if not pooled and mat.name != MATERIAL_NAME:
+            continue
+        users = refs.get(mat.name, set())
+        if pooled:
+            _set_pool_users(mat, users)
+        if not users and mat.users == 0:
+            bpy.data.materials.remove(mat)
+            removed += 1
+    return removed
+
+
+def _ensure_pooled_material(domain_obj, settings, current, force=False):
+    """Baked Values mode: assign the pooled material for the rig's look."""
+    mat = _pool_material(settings, current, domain_obj.get(RIG_ID_PROP, ""))
+
+    previous = {} if force else _read_snapshot(mat).get("shader", {})
+    applied = {}
+    written = skipped = 0
+    for attr, value in _shader_values(settings):
+        key = _snapshot_value(value)
+        applied[attr] = key
+        if previous.get(attr) == key:
+            skipped += 1
+        else:
+            written += 1
+
+    mode = _resolve_shader_mode(settings)
+    if written or not _shader_topology_ok(mat.node_tree, mode):
+        flame_ramp = (
+            (0.0, settings.flame_color_low),
+            (0.25, settings.flame_color_mid),
+            (1.0, settings.flame_color_high),
+        )
+        _sync_volume_shader(
+            mat,
+            settings.flame_strength,
+            settings.smoke_density,
+            flame_ramp,
+            patch=settings.shader_patch_in_place,
+            mode=mode,
+        )
+        _write_snapshot(mat, "shader", applied)
+
+    _assign_material(domain_obj, mat)
+    return written, skipped
+
+
+def _ensure_domain_material(domain_obj, settings, force=False):
+    """Build/refresh the domain material; returns (written, skipped)."""
+    if domain_obj is None:
+        return 0, 0
+    current = domain_obj.active_material
+    if settings.material_mode == "SHARED":
+        result = _ensure_shared_shading(domain_obj, settings, force=force)
+    else:
+        result = _ensure_pooled_material(domain_obj, settings, current, force=force)
+    if current is not None and current != domain_obj.active_material:
+        _release_pool_material(current, domain_obj.get(RIG_ID_PROP, ""))
+    return result
+
+
+def _ensure_fluid_modifier(obj):
+    if obj is None:
+        return None
+    for m in obj.modifiers:
+        if m.type == "FLUID":
+            return m
+    # A fresh modifier holds RNA defaults, so any stored snapshot is stale.
+    _clear_snapshot(obj)
+    return obj.modifiers.new(name="Fluid", type="FLUID")
+
+
+def _domain_values(settings, cache_directory=None, resolution=None):
+    """(attr, value) pairs for FluidDomainSettings, in write order.
+
+    `resolution` defaults to `_effective_resolution(settings)`.
+    """
+    if resolution is None:
+        resolution = _effective_resolution(settings)
+    tier = _tier(settings)
+    use_noise, noise_scale = _tier_noise(settings)
+    return (
+        ("domain_type", "GAS"),
+        # Cache
+        ("cache_directory", settings.cache_directory if cache_directory is None else cache_directory),
+        ("cache_type", "MODULAR"),
+        # Core quality / sim
+        ("resolution_max", int(resolution)),
+        ("time_scale", float(settings.time_scale)),
+        ("vorticity", float(settings.vorticity)),
+        # Substeps (quality tier)
+        ("timesteps_max", int(tier["timesteps_max"])),
+        ("cfl_condition", float(tier["cfl_condition"])),
+        # Adaptive domain / padding
+        ("use_adaptive_domain", bool(settings.use_adaptive_domain)),
+        ("additional_res", int(settings.adaptive_additional_res)),
+        ("adapt_margin", _tier_margin(settings)),
+        # Noise
+        ("use_noise", use_noise),
+        ("noise_strength", float(settings.noise_strength)),
+        ("noise_scale", noise_scale),
+        # Dissolve smoke (optional)
+        ("use_dissolve_smoke", bool(settings.use_dissolve_smoke)),
+        ("dissolve_speed", int(settings.dissolve_speed)),
+        # Flames & smoke from reaction (property names vary by Blender version)
+        ("use_reaction", True),
+        ("burning_rate", float(settings.burning_rate)),
+        ("flame_smoke", float(settings.flame_smoke)),
+    )
+
+
+def _flow_values(settings, flow_type="FIRE"):
+    """(attr, value) pairs for FluidFlowSettings, in write order."""
+    return (
+        ("flow_type", flow_type),
+        ("flow_behavior", "INFLOW"),
+        # How much stuff we add
+        ("density", float(settings.flow_density)),
+        ("temperature", float(settings.flow_temperature)),
+        ("fuel_amount", float(settings.flow_fuel)),
+        # Initial velocity can cause a nice torch look; keep optional.
+        ("use_initial_velocity", bool(settings.use_initial_velocity)),
+        ("velocity_factor", float(settings.velocity_factor)),
+    )
+
+
+def _apply_domain_settings(domain_obj, settings, force=False, cache_directory=None, resolution=None):
+    """Write domain settings that changed since the last apply.
+
+    Returns (written, skipped). `force` ignores the stored snapshot;
+    `cache_directory` / `resolution` override the values from settings.
+    """
+    mod = _ensure_fluid_modifier(domain_obj)
+    if mod is None:
+        return 0, 0
+
+    previous = {} if force else _read_snapshot(domain_obj).get("domain", {})
+    applied = {}
+
+    written, skipped = _apply_props(mod, (("fluid_type", "DOMAIN"),), previous, applied)
+
+    ds = getattr(mod, "domain_settings", None)
+    if ds is not None:
+        w, s = _apply_props(ds, _domain_values(settings, cache_directory, resolution), previous, applied)
+        written += w
+        skipped += s
+
+    _write_snapshot(domain_obj, "domain", applied)
+    return written, skipped
+
+
+def _apply_flow_settings(emitter_obj, settings, force=False):
+    """Write flow settings that changed since the last apply.
+
+    Returns (written, skipped). `force` ignores the stored snapshot.
+    """
+    mod = _ensure_fluid_modifier(emitter_obj)
+    if mod is None:
+        return 0, 0
+
+    previous = {} if force else _read_snapshot(emitter_obj).get("flow", {})
+    applied = {}
+
+    written, skipped = _apply_props(mod, (("fluid_type", "FLOW"),), previous, applied)
+
+    fs = getattr(mod, "flow_settings", None)
+    if fs is not None:
+        # Blender enums differ; prefer FIRE, fall back to SMOKE.
+        flow_type = "FIRE" if _supports_enum(fs, "flow_type", "FIRE") else "SMOKE"
+        w, s = _apply_props(fs, _flow_values(settings, flow_type), previous, applied)
+        written += w
+        skipped += s
+
+    _write_snapshot(emitter_obj, "flow", applied)
+    return written, skipped
+
+
+def _set_object_scale(obj, scale):
+    """Set object scale only when it differs; returns (written, skipped)."""
+    target = tuple(float(v) for v in scale)
+    if all(abs(a - b) < 1e-6 for a, b in zip(obj.scale, target)):
+        return 0, 1
+    obj.scale = target
+    return 1, 0
+
+
+def _mesh_users_map():
+    """mesh pointer -> objects using it; build once per batch to stay linear."""
+    users = {}
+    for obj in bpy.data.objects:
+        if obj.type == "MESH" and obj.data is not None:
+            users.setdefault(obj.data.as_pointer(), []).append(obj)
+    return users
+
+
+def _set_rig_scale(obj, scale, bake=False, users_map=None):
+    """Give `obj` the target scale, optionally baked into its mesh data.
+
+    The mesh remembers the scale already baked into it (BAKED_SCALE_PROP),
+    so repeated updates only apply the remaining factor instead of
+    compounding. Other objects sharing the mesh get the inverse factor on
+    their object scale, so their shape does not change.
+    Returns (written, skipped).
+    """
+    target = tuple(float(v) for v in scale)
+    mesh = obj.data
+    if mesh is None:
+        return _set_object_scale(obj, target)
+    baked = tuple(mesh.get(BAKED_SCALE_PROP, (1.0, 1.0, 1.0)))
+
+    if not bake:
+        return _set_object_scale(obj, tuple(t / b for t, b in zip(target, baked)))
+
+    factor = tuple(t / b for t, b in zip(target, baked))
+    if all(abs(f - 1.0) < 1e-6 for f in factor):
+        return _set_object_scale(obj, (1.0, 1.0, 1.0))
+
+    if mesh.users > 1:
+        if users_map is None:
+            others = [o for o in bpy.data.objects if o.data == mesh]
+        else:
+            others = users_map.get(mesh.as_pointer(), ())
+        for other in others:
+            if other != obj:
+                other.scale = tuple(s / f for s, f in zip(other.scale, factor))
+
+    mesh.transform(Matrix.Diagonal(factor).to_4x4())
+    mesh.update()
+    mesh[BAKED_SCALE_PROP] = target
+    obj.scale = (1.0, 1.0, 1.0)
+    return 1, 0
+
+
+def _domain_scale(settings):
+    # The domain mesh is a 2 m cube, so scale = size / 2.
+    return (settings.domain_size[0] / 2.0, settings.domain_size[1] / 2.0, settings.domain_size[2] / 2.0)
+
+
+def _apply_rig_transforms(domain, emitter, settings, users_map=None):
+    """Scale domain/emitter from settings; returns (written, skipped)."""
+    bake = settings.apply_scale_on_update
+    written = skipped = 0
+    for obj, scale in ((domain, _domain_scale(settings)), (emitter, settings.emitter_scale)):
+        w, s = _set_rig_scale(obj, scale, bake=bake, users_map=users_map)
+        written += w
+        skipped += s
+    return written, skipped
+
+
+# -----------------------------
+# Rig registry
+# -----------------------------
+
+# Object ID property tying a domain/emitter to its registry entry.
+RIG_ID_PROP = "fire_vfx_rig_id"
+# Domain ID property listing the rig ids of emitters clustered into it.
+MEMBERS_PROP = "fire_vfx_members"
+
+# Session cache: scene pointer -> {rig_id: index into scene.fire_vfx_scene.rigs}.
+_RIG_INDEX = {}
+
+
+def _new_rig_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def _rig_index(scene, rebuild=False):
+    key = scene.as_pointer()
+    index = None if rebuild else _RIG_INDEX.get(key)
+    if index is None:
+        index = {rig.rig_id: i for i, rig in enumerate(scene.fire_vfx_scene.rigs)}
+        _RIG_INDEX[key] = index
+    return index
+
+
+def _get_rig(scene, rig_id: str):
+    """O(1) registry lookup by rig id (the index self-heals after edits)."""
+    if not rig_id:
+        return None
+    rigs = scene.fire_vfx_scene.rigs
+    i = _rig_index(scene).get(rig_id)
+    if i is None or i >= len(rigs) or rigs[i].rig_id != rig_id:
+        i = _rig_index(scene, rebuild=True).get(rig_id)
+        if i is None:
+            return None
+    return rigs[i]
+
+
+def _rig_for_object(scene, obj):
+    """Registry entry owning `obj` as domain or emitter, or None."""
+    if obj is None:
+        return None
+    rig = _get_rig(scene, obj.get(RIG_ID_PROP, ""))
+    if rig is None or (rig.domain != obj and rig.emitter != obj):
+        # Duplicated objects carry the custom prop but are not the rig.
+        return None
+    return rig
+
+
+def _rig_owns_domain(rig) -> bool:
+    return rig.domain is not None and rig.domain.get(RIG_ID_PROP) == rig.rig_id
+
+
+def _domain_rig(scene, rig):
+    """Rig whose settings drive `rig`'s domain: itself unless clustered."""
+    if rig is None or rig.domain is None or _rig_owns_domain(rig):
+        return rig
+    owner = _get_rig(scene, rig.domain.get(RIG_ID_PROP, ""))
+    return owner if owner is not None and owner.domain == rig.domain else rig
+
+
+def _domain_members(scene, rig):
+    """Other rigs whose emitters feed `rig`'s (shared) domain."""
+    if rig.domain is None:
+        return []
+    members = []
+    for rig_id in rig.domain.get(MEMBERS_PROP, "").split(","):
+        member = _get_rig(scene, rig_id)
+        if member is not None and member.rig_id != rig.rig_id and member.domain == rig.domain and member.emitter is not None:
+            members.append(member)
+    return members
+
+
+def _active_rig(scene):
+    state = scene.fire_vfx_scene
+    if 0 <= state.active_rig_index < len(state.rigs):
+        return state.rigs[state.active_rig_index]
+    return None
+
+
+def _active_settings(scene):
+    """Settings shown in the panel: the active rig's, else the scene template."""
+    rig = _active_rig(scene)
+    return rig.settings if rig is not None else scene.fire_vfx_settings
+
+
+_SETTINGS_NOT_COPIED = {"rna_type", "name", "preset", "domain_object_name", "emitter_object_name"}
+
+
+def _copy_settings(src, dst):
+    # Preset first: its update callback resets the fields copied below.
+    dst.preset = src.preset
+    for prop in src.bl_rna.properties:
+        attr = prop.identifier
+        if attr in _SETTINGS_NOT_COPIED or prop.is_readonly:
+            continue
+        setattr(dst, attr, getattr(src, attr))
+
+
+def _register_rig(scene, domain, emitter, settings=None):
+    """Add a registry entry for domain/emitter, copying `settings` into it."""
+    state = scene.fire_vfx_scene
+    rig = state.rigs.add()
+    rig.rig_id = _new_rig_id()
+    rig.name = domain.name
+    rig.domain = domain
+    rig.emitter = emitter
+    _copy_settings(settings or scene.fire_vfx_settings, rig.settings)
+    domain[RIG_ID_PROP] = rig.rig_id
+    emitter[RIG_ID_PROP] = rig.rig_id
+    state.active_rig_index = len(state.rigs) - 1
+    _rig_index(scene, rebuild=True)
+    return rig
+
+
+def _migrate_legacy_rig(scene):
+    """Register the pre-registry single rig (stored by object names) once."""
+    settings = scene.fire_vfx_settings
+    dom = bpy.data.objects.get(settings.domain_object_name) if settings.domain_object_name else None
+    emi = bpy.data.objects.get(settings.emitter_object_name) if settings.emitter_object_name else None
+    if dom is None or emi is None or _rig_for_object(scene, dom) is not None:
+        return None
+    rig = _register_rig(scene, dom, emi, settings)
+    settings.domain_object_name = ""
+    settings.emitter_object_name = ""
+    return rig
+
+
+def _find_rig(context):
+    rig = _active_rig(context.scene)
+    if rig is None:
+        rig = _migrate_legacy_rig(context.scene)
+    if rig is None:
+        return None, None
+    return rig.domain, rig.emitter
+
+
+def _update_emitter(rig, force=False, users_map=None):
+    """Scale and flow settings for one emitter; returns (written, skipped)."""
+    settings = rig.settings
+    w1, s1 = _set_rig_scale(rig.emitter, settings.emitter_scale, bake=settings.apply_scale_on_update, users_map=users_map)
+    w2, s2 = _apply_flow_settings(rig.emitter, settings, force=force)
+    return w1 + w2, s1 + s2
+
+
+def _update_rig(rig, force=False, users_map=None, voxel_scale=None):
+    """Apply a rig entry's settings to its objects, writing only what changed.
+
+    Batch callers pass a precomputed `users_map` and `voxel_scale` so the
+    whole pass stays linear in rig count.
+    Returns (written, skipped), or None if the rig lost its objects.
+    """
+    domain, emitter, settings = rig.domain, rig.emitter, rig.settings
+    if domain is None or emitter is None:
+        return None
+    _invalidate_panel_caches()
+
+    scene = rig.id_data
+    if _domain_rig(scene, rig).rig_id != rig.rig_id:
+        # Clustered emitter: the owning rig drives the shared domain.
+        return _update_emitter(rig, force=force, users_map=users_map)
+
+    # Update transforms (scale only, so the sim location is kept)
+    written, skipped = _apply_rig_transforms(domain, emitter, settings, users_map=users_map)
+    for member in _domain_members(scene, rig):
+        w, s = _update_emitter(member, force=force, users_map=users_map)
+        written += w
+        skipped += s
+
+    # After transforms: the cache key covers the emitter's placed geometry.
+    resolution = _effective_resolution(settings, voxel_scale)
+    cache_directory = _rig_cache_directory(rig, resolution)
+
+    for w, s in (
+        _apply_domain_settings(domain, settings, force=force, cache_directory=cache_directory, resolution=resolution),
+        _apply_flow_settings(emitter, settings, force=force),
+        _ensure_domain_material(domain, settings, force=force),
+    ):
+        written += w
+        skipped += s
+    return written, skipped
+
+
+# -----------------------------
+# Rig construction (bpy.data only)
+# -----------------------------
+
+DOMAIN_LOCATION = (0.0, 0.0, 1.0)
+EMITTER_LOCATION = (0.0, 0.0, 0.25)
+
+
+def _cube_mesh(name: str, size=2.0):
+    """Cube mesh matching `primitive_cube_add(size=size)`, built with from_pydata."""
+    h = size / 2.0
+    verts = [
+        (-h, -h, -h), (-h, -h, h), (-h, h, -h), (-h, h, h),
+        (h, -h, -h), (h, -h, h), (h, h, -h), (h, h, h),
+    ]
+    faces = [
+        (0, 1, 3, 2), (2, 3, 7, 6), (6, 7, 5, 4),
+        (4, 5, 1, 0), (2, 6, 4, 0), (7, 3, 1, 5),
+    ]
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], faces)
+    mesh.update()
+    return mesh
+
+
+def _cylinder_mesh(name: str, radius=0.25, depth=1.0, segments=32):
+    """Capped cylinder matching `primitive_cylinder_add`, built with from_pydata."""
+    h = depth / 2.0
+    verts = []
+    for i in range(segments):
+        a = 2.0 * math.pi * i / segments
+        x, y = radius * math.cos(a), radius * math.sin(a)
+        verts.append((x, y, -h))
+        verts.append((x, y, h))
+    faces = []
+    for i in range(segments):
+        j = (i + 1) % segments
+        faces.append((2 * i, 2 * j, 2 * j + 1, 2 * i + 1))
+    faces.append(tuple(2 * i + 1 for i in range(segments)))
+    faces.append(tuple(2 * i for i in reversed(range(segments))))
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], faces)
+    mesh.update()
+    return mesh
+
+
+def _new_object(name: str, mesh, col, location):
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = location
+    col.objects.link(obj)
+    return obj
+
+
+def build_rig(scene=None, settings=None, location=None):
+    """Create a new FireVFX rig (domain + emitter) without calling bpy.ops.
+
+    Meshes are made with `bpy.data.meshes` and objects are linked straight
+    into the FireVFX collection, so this works from timers and headless
+    (`blender -b`) scripts. `settings` (default: the scene template) is
+    copied into the new registry entry; `location` defaults to the 3D
+    cursor. Returns the registry entry.
+    """
+    scene = scene or bpy.context.scene
+    base = Vector(scene.cursor.location if location is None else location)
+
+    col = _ensure_collection(COLLECTION_NAME, scene)
+    domain = _new_object(DOMAIN_NAME, _cube_mesh(DOMAIN_NAME), col, base + Vector(DOMAIN_LOCATION))
+    emitter = _new_object(EMITTER_NAME, _cylinder_mesh(EMITTER_NAME), col, base + Vector(EMITTER_LOCATION))
+
+    rig = _register_rig(scene, domain, emitter, settings)
+
+    # Transforms, fluid settings and shader (full write: objects are new)
+    _update_rig(rig, force=True)
+
+    # Small viewport niceties
+    _set_if_has(domain, "display_type", "WIRE")
+    _set_if_has(emitter, "display_type", "SOLID")
+
+    return rig
+
+
+# -----------------------------
+# Cache inspection
+# -----------------------------
+
+# Mantaflow modular cache files end in a frame number: fluid_data_0012.vdb,
+# density_0012.uni, fluid_mesh_0012.bobj.gz ...
+_FRAME_RE = re.compile(r"_(\d+)\.[A-Za-z0-9]+(?:\.gz)?$")
+
+
+def _scan_cache_frames(cache_dir: str, subdir="data"):
+    """Return {frame: bytes} for files in `<cache_dir>/<subdir>`."""
+    frames = {}
     try:
-        col.objects.link(obj)
+        it = os.scandir(os.path.join(cache_dir, subdir))
+    except OSError:
+        return frames
+    with it:
+        for entry in it:
+            m = _FRAME_RE.search(entry.name)
+            if m is None or not entry.is_file():
+                continue
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                continue
+            frame = int(m.group(1))
+            frames[frame] = frames.get(frame, 0) + size
+    return frames
+
+
+def _format_bytes(n) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024.0:
+            return f"{n:.1f} {unit}" if unit != "B" else f"{int(n)} B"
+        n /= 1024.0
+    return f"{n:.1f} TB"
+
+
+# -----------------------------
+# Content-addressed bake cache
+# -----------------------------
+
+CACHE_MANIFEST = "fire_vfx_manifest.json"
+# Domain attrs only the noise (upres) pass reads.
+NOISE_ATTRS = frozenset({"use_noise", "noise_strength", "noise_scale"})
+BAKE_STAGE_LABELS = {"BAKED": "Baked", "STALE": "Stale", "MISSING": "Not Baked", "OFF": "Off"}
+# Mantaflow's FluidDomainSettings defaults, used before the modifier exists.
+DEFAULT_CACHE_FRAMES = (1, 250)
+
+
+def _object_matrix(obj):
+    """World matrix from the object's own loc/rot/scale (and its parents').
+
+    Unlike `matrix_world` this does not wait for a depsgraph update, so it
+    already reflects values written a moment ago. Constraints are ignored.
+    """
+    m = obj.matrix_basis
+    if obj.parent is not None:
+        m = _object_matrix(obj.parent) @ obj.matrix_parent_inverse @ m
+    return m
+
+
+def _emitter_geometry_digest(emitter, origin) -> str:
+    """Hash of the emitter's world-space geometry relative to `origin`.
+
+    Covers mesh, scale (object or baked) and placement inside the domain in
+    one value, so baking scale into the mesh does not change the key.
+    """
+    h = hashlib.sha1()
+    mesh = emitter.data
+    if mesh is None or not hasattr(mesh, "vertices"):
+        h.update(emitter.type.encode())
+        return h.hexdigest()
+    co = np.empty(3 * len(mesh.vertices), dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    m = np.array(_object_matrix(emitter), dtype=np.float64)
+    placed = co.reshape(-1, 3).astype(np.float64) @ m[:3, :3].T + (m[:3, 3] - np.asarray(origin, dtype=np.float64))
+    # `+ 0.0` folds -0.0 into 0.0 so the bytes hash stably.
+    h.update((np.round(placed, 5) + 0.0).tobytes())
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loops)
+    h.update(loops.tobytes())
+    return h.hexdigest()
+
+
+def _sim_fingerprint(rig, resolution=None, noise=True):
+    """(key, payload) over every simulation-affecting input of a rig.
+
+    Shading (flame_strength, smoke_density, colors) is deliberately not
+    part of it, so look-dev changes reuse the existing bake. With
+    `noise=False` the noise settings are left out too: that key names the
+    base data, which a noise-only change does not invalidate.
+    """
+    settings = rig.settings
+    ds = _fluid_domain_settings(rig.domain)
+    frames = (ds.cache_frame_start, ds.cache_frame_end) if ds is not None else DEFAULT_CACHE_FRAMES
+    origin = tuple(_object_matrix(rig.domain).translation) if rig.domain is not None else (0.0, 0.0, 0.0)
+    payload = {
+        "domain": [
+            [a, _snapshot_value(v)]
+            for a, v in _domain_values(settings, resolution=resolution)
+            if a != "cache_directory" and (noise or a not in NOISE_ATTRS)
+        ],
+        "flow": [[a, _snapshot_value(v)] for a, v in _flow_values(settings)],
+        "domain_size": _snapshot_value(settings.domain_size),
+        "emitter_scale": _snapshot_value(settings.emitter_scale),
+        "emitter": _emitter_geometry_digest(rig.emitter, origin) if rig.emitter is not None else "",
+        "frames": list(frames),
+    }
+    members = _domain_members(rig.id_data, rig)
+    if members:
+        # Clustered domain: every emitter feeding it is part of the sim.
+        payload["members"] = sorted(
+            (
+                [
+                    [[a, _snapshot_value(v)] for a, v in _flow_values(m.settings)],
+                    _snapshot_value(m.settings.emitter_scale),
+                    _emitter_geometry_digest(m.emitter, origin),
+                ]
+                for m in members
+            ),
+            key=json.dumps,
+        )
+    blob = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha1(blob).hexdigest()[:16], payload
+
+
+def _rig_cache_base(rig) -> str:
+    """`cache_directory`, plus the rig id when per-rig subfolders are on."""
+    root = rig.settings.cache_directory
+    if not rig.settings.use_rig_cache_dir:
+        return root
+    return os.path.join(root, rig.rig_id)
+
+
+def _rig_cache_directory(rig, resolution=None) -> str:
+    """Cache directory a rig should bake into (keyed subdir when enabled).
+
+    Keyed by the base-data fingerprint, so noise variants share the data.
+    """
+    base = _rig_cache_base(rig)
+    if not rig.settings.use_content_cache:
+        return base
+    key, _payload = _sim_fingerprint(rig, resolution, noise=False)
+    return os.path.join(base, key)
+
+
+def _read_manifest(cache_dir: str, name=CACHE_MANIFEST):
+    try:
+        with open(os.path.join(cache_dir, name)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_manifest(cache_dir: str, data, name=CACHE_MANIFEST):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, name)
+    # Per-process temp name: the UI and a bake worker may write the same file.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _cache_is_complete(cache_dir: str, key: str, frame_start: int, frame_end: int) -> bool:
+    """True if the manifest matches `key` and every frame's data is on disk."""
+    manifest = _read_manifest(cache_dir)
+    if not manifest.get("complete") or manifest.get("key") != key:
+        return False
+    frames = _scan_cache_frames(cache_dir)
+    return all(f in frames for f in range(frame_start, frame_end + 1))
+
+
+def _rig_bake_state(rig):
+    """(key, abs cache dir, complete) for a rig whose settings are applied."""
+    ds = _fluid_domain_settings(rig.domain)
+    if ds is None:
+        return "", None, False
+    key = _sim_fingerprint(rig)[0]
+    cache_dir = _abs_cache_dir(ds.cache_directory)
+    if cache_dir is None:
+        return key, None, False
+    complete = _cache_is_complete(cache_dir, key, ds.cache_frame_start, ds.cache_frame_end)
+    if complete:
+        _touch_cache(rig, cache_dir)
+    return key, cache_dir, complete
+
+
+# Session cache of `_bake_stages` for the panel: rig id -> stages. Cleared
+# whenever a rig is updated, a bake is recorded or freed, or a worker ends.
+_BAKE_STAGES = {}
+
+
+# Other panel values (estimate, cache collisions/usage): name -> (key, value),
+# recomputed when the key changes and dropped with the bake stages.
+_PANEL_CACHE = {}
+
+
+def _invalidate_panel_caches():
+    _BAKE_STAGES.clear()
+    _PANEL_CACHE.clear()
+
+
+def _panel_cached(name, key, compute):
+    hit = _PANEL_CACHE.get(name)
+    if hit is None or hit[0] != key:
+        hit = _PANEL_CACHE[name] = (key, compute())
+    return hit[1]
+
+
+def _settings_key(settings):
+    """Hashable snapshot of a settings group, so cached panel values follow edits."""
+    values = []
+    for prop in settings.bl_rna.properties:
+        if prop.identifier != "rna_type":
+            value = _snapshot_value(getattr(settings, prop.identifier))
+            values.append(tuple(value) if isinstance(value, list) else value)
+    return tuple(values)
+
+
+def _cached_bake_stages(rig):
+    stages = _BAKE_STAGES.get(rig.rig_id)
+    if stages is None:
+        stages = _BAKE_STAGES[rig.rig_id] = _bake_stages(rig)
+    return stages
+
+
+def _bake_stages(rig):
+    """{"data": state, "noise": state} of the rig's cache for its current settings.
+
+    States: BAKED, STALE (baked for other settings), MISSING, or OFF for
+    noise when the rig (or its quality tier) has no noise.
+    """
+    ds = _fluid_domain_settings(rig.domain)
+    cache_dir = _abs_cache_dir(ds.cache_directory) if ds is not None else None
+    manifest = _read_manifest(cache_dir) if cache_dir is not None else {}
+
+    if manifest.get("data_complete") and manifest.get("data_key") == _sim_fingerprint(rig, noise=False)[0]:
+        data = "BAKED"
+    else:
+        data = "STALE" if manifest.get("data_complete") else "MISSING"
+
+    if not _tier_noise(rig.settings)[0]:
+        noise = "OFF"
+    elif not manifest.get("noise_complete"):
+        noise = "MISSING"
+    elif data == "BAKED" and manifest.get("noise_key") == _sim_fingerprint(rig)[0]:
+        noise = "BAKED"
+    else:
+        noise = "STALE"
+    return {"data": data, "noise": noise}
+
+
+def _record_bake(rig, cache_dir=None, extra=None, stage="ALL", defer_stats=False):
+    """Write the manifest sidecar after a bake; `complete` reflects the files.
+
+    `stage` is the pass that just ran (ALL, DATA or NOISE): a data bake
+    invalidates the noise, a noise bake keeps the data. `extra` is merged
+    into the manifest (e.g. a wedge variant's overrides). `defer_stats`
+    runs the cache analysis on a thread so interactive bakes don't block.
+    """
+    ds = _fluid_domain_settings(rig.domain)
+    cache_dir = cache_dir or (_abs_cache_dir(ds.cache_directory) if ds is not None else None)
+    if ds is None or cache_dir is None:
+        return None
+    _invalidate_panel_caches()
+    key, payload = _sim_fingerprint(rig)
+    frame_range = range(ds.cache_frame_start, ds.cache_frame_end + 1)
+    frames = _scan_cache_frames(cache_dir)
+    noise_frames = _scan_cache_frames(cache_dir, "noise")
+    data_complete = all(f in frames for f in frame_range)
+
+    previous = _read_manifest(cache_dir)
+    if stage == "DATA":
+        noise_key, noise_complete = None, False
+    else:
+        noise_key, noise_complete = key, all(f in noise_frames for f in frame_range)
+    use_noise = _tier_noise(rig.settings)[0]
+    manifest = {
+        "key": key,
+        "data_key": _sim_fingerprint(rig, noise=False)[0] if stage != "NOISE" else previous.get("data_key"),
+        "data_complete": data_complete,
+        "noise_key": noise_key if use_noise else None,
+        "noise_complete": noise_complete if use_noise else False,
+        "rig_id": rig.rig_id,
+        "rig": rig.name,
+        "blend": bpy.data.filepath,
+        "frame_start": ds.cache_frame_start,
+        "frame_end": ds.cache_frame_end,
+        "bytes": sum(frames.values()) + sum(noise_frames.values()),
+        "complete": data_complete and (noise_complete or not use_noise),
+        "baked_at": time.time(),
+        "settings": payload,
+    }
+    manifest.update(extra or {})
+    _write_manifest(cache_dir, manifest)
+    if data_complete:
+        _clear_checkpoint(cache_dir)
+        analyze = rig.settings.analyze_after_bake and _stats_readable(ds, manifest["noise_complete"])
+        if analyze and defer_stats:
+            _analyze_in_thread(cache_dir, manifest["noise_complete"])
+        elif analyze:
+            try:
+                _update_cache_stats(cache_dir, manifest["noise_complete"])
+            except OSError as e:
+                print(f"[FireVFX] stats for {cache_dir} not written: {e}")
+    _touch_cache(rig, cache_dir)
+
+    scene = rig.id_data
+    state = scene.fire_vfx_scene
+    if state.cache_auto_evict and state.cache_quota_gb > 0.0 and not bpy.app.background:
+        _enforce_cache_quota(scene)
+    return manifest
+
+
+# -----------------------------
+# Resumable bakes
+# -----------------------------
+
+CACHE_CHECKPOINT = "fire_vfx_checkpoint.json"
+_FRAME_DIGITS_RE = re.compile(r"_\d+(?=\.[A-Za-z0-9]+(?:\.gz)?$)")
+# Leading bytes of intact cache files, by extension.
+_CACHE_MAGIC = {".vdb": b" BDV", ".gz": b"\x1f\x8b"}
+# A frame's file smaller than this fraction of the previous frame's is truncated.
+_MIN_SIZE_RATIO = 0.25
+
+
+def _frame_files(cache_dir: str, subdir="data"):
+    """{frame: {stem: (path, bytes)}} for `<cache_dir>/<subdir>`; stem drops the frame number."""
+    files = {}
+    try:
+        it = os.scandir(os.path.join(cache_dir, subdir))
+    except OSError:
+        return files
+    with it:
+        for entry in it:
+            m = _FRAME_RE.search(entry.name)
+            if m is None or not entry.is_file():
+                continue
+            try:
+                size = entry.stat().st_size
+            except OSError:  # deleted meanwhile (e.g. by a resuming worker)
+                continue
+            stem = _FRAME_DIGITS_RE.sub("", entry.name)
+            files.setdefault(int(m.group(1)), {})[stem] = (entry.path, size)
+    return files
+
+
+def _file_intact(path: str, size: int, previous_size: int) -> bool:
+    if size <= 0 or size < _MIN_SIZE_RATIO * previous_size:
+        return False
+    magic = _CACHE_MAGIC.get(os.path.splitext(path)[1])
+    if magic is None:
+        return True
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(magic)) == magic
+    except OSError:
+        return False
+
+
+def _last_complete_frame(cache_dir: str, frame_start: int, frame_end: int, after=None):
+    """Last frame F such that every frame in [frame_start, F] has all its data files intact.
+
+    Frames up to `after` (a previous checkpoint) are trusted without
+    re-reading. Returns frame_start - 1 if the first frame is incomplete.
+    """
+    files = _frame_files(cache_dir)
+    stems = set(files.get(frame_start, {}))
+    last = frame_start - 1
+    if not stems:
+        return last
+    if after is not None and frame_start <= after <= frame_end:
+        last = after
+    sizes = {}
+    for frame in range(frame_start, last + 1):
+        sizes.update({stem: size for stem, (_path, size) in files.get(frame, {}).items()})
+    for frame in range(last + 1, frame_end + 1):
+        present = files.get(frame, {})
+        if set(present) != stems:
+            break
+        if not all(_file_intact(path, size, sizes.get(stem, 0)) for stem, (path, size) in present.items()):
+            break
+        sizes.update({stem: size for stem, (_path, size) in present.items()})
+        last = frame
+    return last
+
+
+def _update_checkpoint(cache_dir: str):
+    """Advance a running bake's checkpoint to its last complete frame.
+
+    Runs from timers while a worker may be rewriting the cache, so file
+    errors skip this round (None) instead of escaping.
+    """
+    checkpoint = _read_manifest(cache_dir, CACHE_CHECKPOINT)
+    if not checkpoint.get("key") or "frame_end" not in checkpoint:
+        return None
+    try:
+        frame = _last_complete_frame(cache_dir, checkpoint["frame_start"], checkpoint["frame_end"], checkpoint.get("frame"))
+        if frame != checkpoint.get("frame"):
+            checkpoint["frame"] = frame
+            checkpoint["updated"] = time.time()
+            _write_manifest(cache_dir, checkpoint, CACHE_CHECKPOINT)
+    except OSError as e:
+        print(f"[FireVFX] checkpoint for {cache_dir} not updated: {e}")
+        return None
+    return frame
+
+
+def _clear_checkpoint(cache_dir: str):
+    try:
+        os.remove(os.path.join(cache_dir, CACHE_CHECKPOINT))
+    except OSError:
+        pass
+
+
+def _prepare_resume(rig, cache_dir: str):
+    """Set the domain up to resume a crashed or paused data bake.
+
+    Resumes only when the checkpoint was written for the same base-data key
+    and the domain's pause frame is writable here. Returns the frame the
+    bake continues after, or None for a fresh bake. Either way a checkpoint
+    for this bake is written.
+    """
+    ds = _fluid_domain_settings(rig.domain)
+    if ds is None or cache_dir is None:
+        return None
+    fs, fe = ds.cache_frame_start, ds.cache_frame_end
+    key = _sim_fingerprint(rig, noise=False)[0]
+    checkpoint = _read_manifest(cache_dir, CACHE_CHECKPOINT)
+
+    resume = None
+    if checkpoint.get("key") == key and _setters_for(ds).get("cache_frame_pause_data") is not None:
+        last = _last_complete_frame(cache_dir, fs, fe, checkpoint.get("frame"))
+        if fs <= last < fe:
+            # Frames past the last intact one may be half written.
+            for frame, stems in _frame_files(cache_dir).items():
+                if frame > last:
+                    for path, _size in stems.values():
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+            _write_props(ds, (("cache_frame_pause_data", last),))
+            resume = last
+    checkpoint = {
+        "key": key,
+        "frame_start": fs,
+        "frame_end": fe,
+        "frame": fs - 1 if resume is None else resume,
+        "updated": time.time(),
+    }
+    _write_manifest(cache_dir, checkpoint, CACHE_CHECKPOINT)
+    return resume
+
+
+def _run_bake(resume, use_noise: bool) -> bool:
+    """Run the fluid bake ops synchronously: everything, or data onwards from a resume."""
+    if resume is None:
+        return "FINISHED" in bpy.ops.fluid.bake_all()
+    ok = "FINISHED" in bpy.ops.fluid.bake_data()
+    if ok and use_noise:
+        ok = "FINISHED" in bpy.ops.fluid.bake_noise()
+    return ok
+
+
+# -----------------------------
+# Cache statistics
+# -----------------------------
+
+# Columnar per-frame stats next to the cache (numpy .npz, see `analyze_cache`).
+CACHE_STATS = "fire_vfx_stats.npz"
+STATS_GRIDS = ("density", "flame")
+# Grid values at or below this count as empty space.
+STATS_THRESHOLD = 1e-3
+# Voxels per slab when streaming a grid (~16 MB of float32).
+_STATS_SLAB_VOXELS = 4 * 1024 * 1024
+# Mantaflow .uni: b"MNT3" then UniHeader (dims, grid/element type, element
+# size, info[256], dimT, timestamp); x varies fastest in the data that follows.
+_UNI_MAGIC = b"MNT3"
+_UNI_HEADER = struct.Struct("<6i256si4xQ")
+_UNI_REAL = 1
+
+
+def _openvdb():
+    """The OpenVDB Python module, or None (Blender does not bundle it)."""
+    for name in ("openvdb", "pyopenvdb"):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None
+
+
+def _stats_readable(ds, use_noise: bool) -> bool:
+    """Whether the domain's cache frames can be analyzed here (.uni, or .vdb with openvdb)."""
+    formats = {ds.cache_data_format, ds.cache_noise_format} if use_noise else {ds.cache_data_format}
+    return "OPENVDB" not in formats or _openvdb() is not None
+
+
+def _uni_slabs(path: str):
+    """Yield ((x0, y0, z0), zyx float32 slab) for a real-valued .uni grid."""
+    with gzip.open(path, "rb") as f:
+        if f.read(len(_UNI_MAGIC)) != _UNI_MAGIC:
+            raise ValueError(f"{path}: not a Mantaflow MNT3 grid")
+        nx, ny, nz, _grid, element, size, _info, _dim_t, _stamp = _UNI_HEADER.unpack(f.read(_UNI_HEADER.size))
+        if element != _UNI_REAL or size != 4:
+            raise ValueError(f"{path}: not a float grid")
+        depth = max(1, _STATS_SLAB_VOXELS // max(1, nx * ny))
+        for z0 in range(0, nz, depth):
+            d = min(depth, nz - z0)
+            buf = f.read(nx * ny * d * 4)
+            if len(buf) != nx * ny * d * 4:
+                raise ValueError(f"{path}: truncated")
+            yield (0, 0, z0), np.frombuffer(buf, dtype="<f4").reshape(d, ny, nx)
+
+
+def _vdb_slabs(vdb, path: str, names):
+    """Like `_uni_slabs` for the first grid in `names` found in a .vdb file."""
+    for name in names:
+        try:
+            grid = vdb.read(path, name)
+        except (KeyError, LookupError, RuntimeError, ValueError):
+            continue
+        lo, hi = grid.evalActiveVoxelBoundingBox()
+        nx, ny = hi[0] - lo[0] + 1, hi[1] - lo[1] + 1
+        if nx <= 0 or ny <= 0 or hi[2] < lo[2]:
+            return
+        depth = max(1, _STATS_SLAB_VOXELS // (nx * ny))
+        for z0 in range(lo[2], hi[2] + 1, depth):
+            slab = np.zeros((nx, ny, min(depth, hi[2] + 1 - z0)), dtype=np.float32)
+            grid.copyToArray(slab, ijk=(lo[0], lo[1], z0))
+            yield (lo[0], lo[1], z0), slab.T
+        return
+
+
+def _grid_stats(slabs, threshold=STATS_THRESHOLD):
+    """Stream slabs once; returns (bbox_min, bbox_max, sum, max), bbox None if empty."""
+    lo = hi = None
+    total = peak = 0.0
+    for (x0, y0, z0), slab in slabs:
+        if slab.size == 0:
+            continue
+        total += float(slab.sum(dtype=np.float64))
+        peak = max(peak, float(slab.max()))
+        mask = slab > threshold
+        if not mask.any():
+            continue
+        zs = np.flatnonzero(mask.any(axis=(1, 2)))
+        ys = np.flatnonzero(mask.any(axis=(0, 2)))
+        xs = np.flatnonzero(mask.any(axis=(0, 1)))
+        a = (x0 + int(xs[0]), y0 + int(ys[0]), z0 + int(zs[0]))
+        b = (x0 + int(xs[-1]), y0 + int(ys[-1]), z0 + int(zs[-1]))
+        lo = a if lo is None else tuple(map(min, lo, a))
+        hi = b if hi is None else tuple(map(max, hi, b))
+    return lo, hi, total, peak
+
+
+def _stats_inputs(cache_dir: str, use_noise: bool):
+    """{frame: (noise?, {grid: (path, vdb grid names or None)})} to analyze.
+
+    The noise (upres) grids are what renders, so they are used for frames
+    that have them when `use_noise`; other frames fall back to the data grids.
+    """
+    inputs = {}
+    for subdir, suffix in (("data", ""), ("noise", "_noise")):
+        if suffix and not use_noise:
+            continue
+        for frame, files in _frame_files(cache_dir, subdir).items():
+            grids = {}
+            for grid in STATS_GRIDS:
+                uni = files.get(f"{grid}{suffix}.uni")
+                vdb = files.get(f"fluid_{subdir}.vdb")
+                if uni is not None:
+                    grids[grid] = (uni[0], None)
+                elif vdb is not None:
+                    grids[grid] = (vdb[0], (grid + suffix, grid) if suffix else (grid,))
+            if grids:
+                inputs[frame] = (bool(suffix), grids)
+    return inputs
+
+
+def _stats_signature(grids):
+    """Hash of the source files' names/sizes/mtimes; None if one just vanished."""
+    h = hashlib.sha1()
+    for path in sorted({path for path, _names in grids.values()}):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def _analyze_frame(grids, vdb):
+    """One frame's stats row, or None if a grid needs OpenVDB and it is missing."""
+    lo = hi = None
+    energy = max_density = 0.0
+    for grid, (path, names) in grids.items():
+        if names is not None and vdb is None:
+            return None
+        slabs = _uni_slabs(path) if names is None else _vdb_slabs(vdb, path, names)
+        g_lo, g_hi, total, peak = _grid_stats(slabs)
+        if grid == "flame":
+            energy = total
+        elif grid == "density":
+            max_density = peak
+        if g_lo is not None:
+            lo = g_lo if lo is None else tuple(map(min, lo, g_lo))
+            hi = g_hi if hi is None else tuple(map(max, hi, g_hi))
+    if lo is None:
+        return (0, 0, 0), (-1, -1, -1), energy, max_density, True
+    return lo, hi, energy, max_density, False
+
+
+def cache_stats(cache_dir: str):
+    """Per-frame stats of a bake as {column: numpy array}, or None if not analyzed.
+
+    Columns (one row per frame, sorted by frame): frame, bbox_min/bbox_max
+    (occupied voxel box in grid index space, inclusive; -1 when empty),
+    flame_energy (sum of flame values), max_density, empty, noise (stats
+    come from the upres grids) and signature (of the source files).
+    """
+    path = os.path.join(cache_dir, CACHE_STATS)
+    try:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _update_cache_stats(cache_dir: str, use_noise=True, force=False):
+    """Bring the stats sidecar up to date; returns (stats, recomputed, unreadable).
+
+    Only frames whose source files changed (size/mtime) are re-read, one
+    at a time in bounded slabs; frames whose files are gone are dropped.
+    """
+    inputs = _stats_inputs(cache_dir, use_noise)
+    old = {} if force else (cache_stats(cache_dir) or {})
+    rows = {}
+    if "signature" in old:
+        for i, frame in enumerate(old["frame"].tolist()):
+            rows[frame] = (
+                tuple(old["bbox_min"][i].tolist()),
+                tuple(old["bbox_max"][i].tolist()),
+                float(old["flame_energy"][i]),
+                float(old["max_density"][i]),
+                bool(old["empty"][i]),
+                bool(old["noise"][i]),
+                str(old["signature"][i]),
+            )
+    vdb = _openvdb()
+    stats = {}
+    recomputed = unreadable = 0
+    for frame in sorted(inputs):
+        noise, grids = inputs[frame]
+        signature = _stats_signature(grids)
+        if signature is None:
+            continue
+        row = rows.get(frame)
+        if row is not None and row[6] == signature:
+            stats[frame] = row
+            continue
+        try:
+            result = _analyze_frame(grids, vdb)
+        except (OSError, EOFError, ValueError, zlib.error) as e:
+            print(f"[FireVFX] stats: frame {frame}: {e}")
+            result = None
+        if result is None:
+            unreadable += 1
+            continue
+        stats[frame] = result + (noise, signature)
+        recomputed += 1
+
+    if not stats and not old:
+        return None, 0, unreadable
+    frames = sorted(stats)
+    columns = {
+        "frame": np.array(frames, dtype=np.int32),
+        "bbox_min": np.array([stats[f][0] for f in frames], dtype=np.int32).reshape(-1, 3),
+        "bbox_max": np.array([stats[f][1] for f in frames], dtype=np.int32).reshape(-1, 3),
+        "flame_energy": np.array([stats[f][2] for f in frames], dtype=np.float64),
+        "max_density": np.array([stats[f][3] for f in frames], dtype=np.float32),
+        "empty": np.array([stats[f][4] for f in frames], dtype=bool),
+        "noise": np.array([stats[f][5] for f in frames], dtype=bool),
+        "signature": np.array([stats[f][6] for f in frames], dtype="U40"),
+    }
+    if recomputed or len(frames) != len(rows):
+        tmp = os.path.join(cache_dir, f"{CACHE_STATS}.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        np.savez_compressed(tmp, **columns)
+        os.replace(tmp, os.path.join(cache_dir, CACHE_STATS))
+    return columns, recomputed, unreadable
+
+
+def analyze_cache(cache_dir: str, use_noise=None, force=False):
+    """Analyze a bake's frames (incrementally) and return `cache_stats` columns.
+
+    `use_noise` defaults to whether the cache manifest marks the noise pass
+    complete. Frames stored as .vdb need the `openvdb` Python module.
+    """
+    if use_noise is None:
+        use_noise = bool(_read_manifest(cache_dir).get("noise_complete"))
+    return _update_cache_stats(cache_dir, use_noise, force)[0]
+
+
+# Cache dirs being analyzed by `_analyze_in_thread` (guarded by the lock).
+_STATS_RUNNING = set()
+_STATS_LOCK = threading.Lock()
+
+
+def _analyze_in_thread(cache_dir: str, use_noise: bool):
+    """Run `_update_cache_stats` off the UI thread (it does not touch bpy)."""
+    with _STATS_LOCK:
+        if cache_dir in _STATS_RUNNING:
+            return
+        _STATS_RUNNING.add(cache_dir)
+
+    def run():
+        try:
+            _update_cache_stats(cache_dir, use_noise)
+        except OSError as e:
+            print(f"[FireVFX] stats for {cache_dir} not written: {e}")
+        finally:
+            with _STATS_LOCK:
+                _STATS_RUNNING.discard(cache_dir)
+
+    threading.Thread(target=run, name="FireVFX stats", daemon=True).start()
+
+
+# -----------------------------
+# Cache accounting / LRU eviction
+# -----------------------------
+
+CACHE_INDEX = "fire_vfx_index.json"
+# Subdirectories Mantaflow's modular cache writes into.
+_CACHE_SUBDIRS = ("config", "data", "noise", "mesh", "particles", "guiding", "script")
+
+# Session copies of each root's on-disk index: abs root -> {"entries": {...}}.
+_CACHE_INDEXES = {}
+
+
+def _cache_root(rig):
+    """Absolute root under which a rig's keyed bakes live (None if unresolved)."""
+    return _abs_cache_dir(rig.settings.cache_directory)
+
+
+def _dir_signature(path: str):
+    """Cheap change detector: mtimes of a bake dir, its manifest and subdirs."""
+    sig = []
+    for sub in ("", CACHE_MANIFEST) + _CACHE_SUBDIRS:
+        try:
+            sig.append(os.stat(os.path.join(path, sub)).st_mtime_ns)
+        except OSError:
+            sig.append(0)
+    return sig
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _find_bake_dirs(root: str, depth=2):
+    """Yield directories under `root` holding a FireVFX manifest (bounded depth)."""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        subdirs = [e.path for e in it if e.is_dir() and e.name not in _CACHE_SUBDIRS]
+    for path in subdirs:
+        if os.path.isfile(os.path.join(path, CACHE_MANIFEST)):
+            yield path
+        elif depth > 1:
+            yield from _find_bake_dirs(path, depth - 1)
+
+
+def _load_cache_index(root: str):
+    index = _CACHE_INDEXES.get(root)
+    if index is None:
+        try:
+            with open(os.path.join(root, CACHE_INDEX)) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        if not isinstance(index.get("entries"), dict):
+            index = {"entries": {}}
+        _CACHE_INDEXES[root] = index
+    return index
+
+
+def _save_cache_index(root: str, index):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, CACHE_INDEX)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _index_entry(path: str, previous=None):
+    """(Re)build one index entry; the dir is only re-walked if its signature moved."""
+    sig = _dir_signature(path)
+    if previous is not None and previous.get("signature") == sig:
+        return previous, False
+    manifest = _read_manifest(path)
+    entry = dict(previous or {})
+    entry.update(
+        signature=sig,
+        bytes=_dir_bytes(path),
+        rig_id=manifest.get("rig_id", entry.get("rig_id", "")),
+        rig=manifest.get("rig", entry.get("rig", "")),
+        key=manifest.get("key", ""),
+    )
+    entry.setdefault("last_access", manifest.get("baked_at", time.time()))
+    return entry, True
+
+
+def _refresh_cache_index(root: str):
+    """Bring a root's index up to date, re-walking only bakes that changed."""
+    index = _load_cache_index(root)
+    entries = index["entries"]
+    seen = set()
+    changed = False
+    for path in _find_bake_dirs(root):
+        rel = os.path.relpath(path, root)
+        seen.add(rel)
+        entry, moved = _index_entry(path, entries.get(rel))
+        if moved:
+            entries[rel] = entry
+            changed = True
+    for rel in set(entries) - seen:
+        del entries[rel]
+        changed = True
+    if changed:
+        _save_cache_index(root, index)
+    return index
+
+
+def _touch_cache(rig, cache_dir: str):
+    """Mark a rig's bake as used now and refresh just that entry."""
+    root = _cache_root(rig)
+    if root is None or cache_dir is None or not rig.settings.use_content_cache:
+        return
+    rel = os.path.relpath(cache_dir, root)
+    if rel.startswith(".."):
+        return
+    index = _load_cache_index(root)
+    entry, _moved = _index_entry(cache_dir, index["entries"].get(rel))
+    entry["last_access"] = time.time()
+    entry["rig_id"] = rig.rig_id
+    entry["rig"] = rig.name
+    index["entries"][rel] = entry
+    _save_cache_index(root, index)
+
+
+def _scene_cache_roots(scene):
+    roots = set()
+    for rig in scene.fire_vfx_scene.rigs:
+        root = _cache_root(rig) if rig.settings.use_content_cache else None
+        if root is not None:
+            roots.add(root)
+    return roots
+
+
+def _referenced_cache_dirs():
+    """Absolute cache dirs any domain or rig in the open file points at."""
+    refs = set()
+    for obj in bpy.data.objects:
+        ds = _fluid_domain_settings(obj) if obj.type == "MESH" else None
+        path = _abs_cache_dir(ds.cache_directory) if ds is not None else None
+        if path is not None:
+            refs.add(path)
+    for scene in bpy.data.scenes:
+        state = getattr(scene, "fire_vfx_scene", None)
+        for rig in state.rigs if state is not None else ():
+            path = _abs_cache_dir(_rig_cache_directory(rig)) if rig.domain is not None else None
+            if path is not None:
+                refs.add(path)
+    for volume in bpy.data.volumes:
+        # Instanced bakes read `<cache>/data/*.vdb` or `<cache>/noise/*.vdb`, so they pin the cache.
+        if volume.name.startswith(INSTANCE_VOLUME_PREFIX) and volume.filepath:
+            path = _abs_cache_dir(volume.filepath)
+            if path is not None:
+                refs.add(os.path.dirname(os.path.dirname(path)))
+    return refs
+
+
+def _cache_collisions(scene):
+    """{abs cache dir: [domain objects]} for dirs more than one domain writes to."""
+    users = {}
+    for obj in scene.objects:
+        ds = _fluid_domain_settings(obj) if obj.type == "MESH" else None
+        if ds is None:
+            continue
+        # Unresolvable (unsaved //) paths still collide textually.
+        path = _abs_cache_dir(ds.cache_directory) or ds.cache_directory
+        users.setdefault(path, []).append(obj)
+    return {path: objs for path, objs in users.items() if len(objs) > 1}
+
+
+def _cache_usage(scene):
+    """(total bytes, bake count) from the session indexes (no disk access)."""
+    total = count = 0
+    for root in _scene_cache_roots(scene):
+        index = _CACHE_INDEXES.get(root)
+        if index is not None:
+            for entry in index["entries"].values():
+                total += entry.get("bytes", 0)
+                count += 1
+    return total, count
+
+
+def _enforce_cache_quota(scene):
+    """Evict least-recently-used, unreferenced bakes until under the quota.
+
+    Returns (evicted paths, bytes freed, bytes remaining).
+    """
+    quota = int(scene.fire_vfx_scene.cache_quota_gb * 1024 ** 3)
+    referenced = _referenced_cache_dirs()
+    evicted = []
+    freed = 0
+    remaining = 0
+    for root in _scene_cache_roots(scene):
+        index = _refresh_cache_index(root)
+        entries = index["entries"]
+        total = sum(e.get("bytes", 0) for e in entries.values())
+        if quota > 0:
+            candidates = sorted(
+                (entries[rel].get("last_access", 0.0), rel)
+                for rel in entries
+                if os.path.normpath(os.path.join(root, rel)) not in referenced
+            )
+            for _last, rel in candidates:
+                if total <= quota:
+                    break
+                path = os.path.join(root, rel)
+                size = entries[rel].get("bytes", 0)
+                shutil.rmtree(path, ignore_errors=True)
+                del entries[rel]
+                total -= size
+                freed += size
+                evicted.append(path)
+            if evicted:
+                _save_cache_index(root, index)
+        remaining += total
+    if evicted:
+        _invalidate_panel_caches()
+    return evicted, freed, remaining
+
+
+# -----------------------------
+# Bake estimates
+# -----------------------------
+
+# Rough, calibrated-by-eye constants for a Mantaflow fire (gas + reaction).
+_EST_RAM_BYTES_PER_CELL = 300.0  # base grids incl. solver temporaries
+_EST_RAM_BYTES_PER_NOISE_CELL = 60.0  # upres density/flame/fuel/react + scratch
+_EST_DATA_FLOATS_PER_CELL = 9  # density, heat, flame, fuel, react, velocity xyz, shadow
+_EST_NOISE_FLOATS_PER_CELL = 4  # upres density, flame, fuel, react
+_EST_NOISE_BASE_FLOATS_PER_CELL = 6  # two advected texture-coordinate grids
+_EST_CACHE_COMPRESSION = 0.3  # OpenVDB on mostly-empty grids
+_EST_ADAPTIVE_OCCUPANCY = 0.35  # share of the domain an adaptive bake touches
+_EST_CELL_STEPS_PER_SECOND = 6.0e5
+_EST_NOISE_CELLS_PER_SECOND = 4.0e6
+_EST_STEPS_PER_FRAME = 2.0
+
+
+def _grid_dims(domain_size, resolution: int):
+    """Mantaflow grid dims: the longest axis gets `resolution` cells."""
+    longest = max(domain_size)
+    return tuple(max(1, int(round(resolution * axis / longest))) for axis in domain_size)
+
+
+def _estimate_bake(settings, frames=DEFAULT_CACHE_FRAMES, upres=None, resolution=None):
+    """Predict grid size, peak RAM, cache bytes and bake time for settings.
+
+    `upres` is the noise upres factor (FluidDomainSettings.noise_scale);
+    defaults to the tier's noise_scale. `resolution` defaults to
+    `_effective_resolution(settings)`.
+    """
+    res = _effective_resolution(settings) if resolution is None else int(resolution)
+    if settings.use_adaptive_domain:
+        res += int(settings.adaptive_additional_res)
+    dims = _grid_dims(settings.domain_size, res)
+    voxels = dims[0] * dims[1] * dims[2]
+
+    occupancy = 1.0
+    if settings.use_adaptive_domain:
+        # Occupied box plus the adaptive margin on each side.
+        edge = _EST_ADAPTIVE_OCCUPANCY ** (1.0 / 3.0) + 2.0 * _tier_margin(settings) / max(1, min(dims))
+        occupancy = min(1.0, edge ** 3)
+    active = voxels * occupancy
+
+    use_noise, noise_scale = _tier_noise(settings)
+    upres = max(1, noise_scale if upres is None else int(upres))
+    noise_dims = tuple(d * upres for d in dims) if use_noise else (0, 0, 0)
+    noise_active = active * upres ** 3 if use_noise else 0.0
+
+    frame_count = max(1, frames[1] - frames[0] + 1)
+    steps = max(1.0, min(_tier(settings)["timesteps_max"], _EST_STEPS_PER_FRAME * settings.time_scale))
+
+    ram = active * _EST_RAM_BYTES_PER_CELL + noise_active * _EST_RAM_BYTES_PER_NOISE_CELL
+    disk_frame = 4.0 * _EST_CACHE_COMPRESSION * (
+        active * _EST_DATA_FLOATS_PER_CELL
+        + (noise_active * _EST_NOISE_FLOATS_PER_CELL + active * _EST_NOISE_BASE_FLOATS_PER_CELL if use_noise else 0.0)
+    )
+    seconds = frame_count * (active * steps / _EST_CELL_STEPS_PER_SECOND + noise_active / _EST_NOISE_CELLS_PER_SECOND)
+
+    return {
+        "dims": dims,
+        "voxels": voxels,
+        "active_voxels": active,
+        "upres": upres if use_noise else 1,
+        "noise_dims": noise_dims,
+        "frames": frame_count,
+        "ram_bytes": ram,
+        "disk_bytes_per_frame": disk_frame,
+        "disk_bytes": disk_frame * frame_count,
+        "seconds": seconds,
+    }
+
+
+def _rig_estimate(rig):
+    """`_estimate_bake` using the domain's real frame range and upres when present."""
+    ds = _fluid_domain_settings(rig.domain)
+    if ds is None:
+        return _estimate_bake(rig.settings)
+    return _estimate_bake(rig.settings, (ds.cache_frame_start, ds.cache_frame_end), ds.noise_scale)
+
+
+def _voxel_count(domain_size, resolution: int) -> int:
+    dims = _grid_dims(domain_size, resolution)
+    return dims[0] * dims[1] * dims[2]
+
+
+def _effective_resolution(settings, voxel_scale=None) -> int:
+    """resolution_max to write for settings, honoring the sizing mode.
+
+    In VOXEL_SIZE mode the longest domain axis is divided by the target
+    voxel size, then clamped by the rig's voxel budget and scaled by the
+    scene budget factor (`_scene_voxel_scale`, computed if not given).
+    Either way the quality tier's resolution factor applies last.
+    """
+    factor = _tier(settings)["resolution"]
+    if settings.sizing_mode != "VOXEL_SIZE":
+        if factor >= 1.0:
+            return int(settings.resolution_max)
+        return max(16, int(round(settings.resolution_max * factor)))
+    size = settings.domain_size
+    longest = max(size)
+    res = longest / max(1e-4, settings.voxel_size)
+    if settings.voxel_budget > 0.0:
+        ratio = (size[0] * size[1] * size[2]) / longest ** 3
+        res = min(res, (settings.voxel_budget * 1e6 / ratio) ** (1.0 / 3.0))
+    if voxel_scale is None:
+        voxel_scale = _scene_voxel_scale(settings.id_data)
+    return max(16, min(1024, int(res * voxel_scale * factor)))
+
+
+def _scene_voxel_scale(scene) -> float:
+    """Resolution factor that fits voxel-size rigs into the scene voxel budget.
+
+    Fixed-resolution rigs count against the budget but are not scaled.
+    """
+    state = getattr(scene, "fire_vfx_scene", None)
+    budget = state.scene_voxel_budget * 1e6 if state is not None else 0.0
+    if budget <= 0.0:
+        return 1.0
+    fixed = scalable = 0
+    for rig in state.rigs:
+        if not _rig_owns_domain(rig):
+            continue
+        st = rig.settings
+        if st.sizing_mode == "VOXEL_SIZE":
+            scalable += _voxel_count(st.domain_size, _effective_resolution(st, 1.0))
+        else:
+            fixed += _voxel_count(st.domain_size, _effective_resolution(st))
+    if scalable == 0 or fixed + scalable <= budget:
+        return 1.0
+    return max(0.0, (budget - fixed) / scalable) ** (1.0 / 3.0)
+
+
+def _physical_ram_bytes():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 90.0:
+        return f"{seconds:.0f}s"
+    if seconds < 5400.0:
+        return f"{seconds / 60.0:.0f} min"
+    return f"{seconds / 3600.0:.1f} h"
+
+
+def _budget_problems(scene, estimate):
+    """Human-readable list of budget limits the estimate exceeds."""
+    state = scene.fire_vfx_scene
+    problems = []
+    ram_limit = state.budget_ram_gb * 1024 ** 3 or _physical_ram_bytes()
+    if ram_limit and estimate["ram_bytes"] > ram_limit:
+        problems.append(f"RAM {_format_bytes(estimate['ram_bytes'])} > {_format_bytes(ram_limit)}")
+    disk_limit = state.budget_disk_gb * 1024 ** 3
+    if disk_limit and estimate["disk_bytes"] > disk_limit:
+        problems.append(f"disk {_format_bytes(estimate['disk_bytes'])} > {_format_bytes(disk_limit)}")
+    time_limit = state.budget_time_hours * 3600.0
+    if time_limit and estimate["seconds"] > time_limit:
+        problems.append(f"time {_format_duration(estimate['seconds'])} > {_format_duration(time_limit)}")
+    return problems
+
+
+def _panel_estimate(scene, rig, settings):
+    est = _rig_estimate(rig) if rig is not None else _estimate_bake(settings)
+    return est, _budget_problems(scene, est)
+
+
+def _guard_budget(op, scene, rigs) -> bool:
+    """Report budget overruns for `rigs`; False if the bake must not start."""
+    refuse = scene.fire_vfx_scene.budget_action == "REFUSE"
+    ok = True
+    for rig in rigs:
+        problems = _budget_problems(scene, _rig_estimate(rig))
+        if problems:
+            op.report({"ERROR" if refuse else "WARNING"}, f"{rig.name}: over budget ({', '.join(problems)})")
+            ok = ok and not refuse
+    return ok
+
+
+# -----------------------------
+# Background bakes (blender -b workers + local job queue)
+# -----------------------------
+
+JOB_PENDING = "PENDING"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+JOB_CANCELLED = "CANCELLED"
+# Temp dirs holding a submission's .blend snapshot and its jobs' logs.
+SNAPSHOT_DIR_PREFIX = "fire_vfx_bake_"
+
+# Session job queue, polled by `_poll_bake_jobs` on a bpy.app timer.
+_BAKE_JOBS = []
+# Worker limits, refreshed from the scene whenever jobs are submitted.
+_BAKE_LIMITS = {"max_workers": 1, "ram_budget_gb": 0.0}
+
+
+class _BakeJob:
+    """One background bake: a `blender -b` worker baking one rig's domain."""
+
+    __slots__ = ("rig_id", "label", "snapshot", "cache_dir", "ram_gb", "argv", "state", "proc", "log_path", "started", "finished")
+
+    def __init__(self, rig_id, label, snapshot, cache_dir, ram_gb, argv):
+        self.rig_id = rig_id
+        self.label = label
+        self.snapshot = snapshot
+        self.cache_dir = cache_dir
+        self.ram_gb = ram_gb
+        self.argv = argv
+        self.state = JOB_PENDING
+        self.proc = None
+        self.log_path = os.path.splitext(snapshot)[0] + f"_{rig_id}_{os.path.basename(cache_dir)}.log"
+        self.started = 0.0
+        self.finished = 0.0
+
+    def start(self):
+        log = open(self.log_path, "w")
+        try:
+            self.proc = subprocess.Popen(self.argv, stdout=log, stderr=subprocess.STDOUT)
+        finally:
+            log.close()
+        self.state = JOB_RUNNING
+        self.started = time.time()
+
+    def elapsed(self) -> float:
+        if not self.started:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+def _fluid_domain_settings(obj):
+    if obj is None:
+        return None
+    for m in obj.modifiers:
+        if m.type == "FLUID" and getattr(m, "fluid_type", "") == "DOMAIN":
+            return m.domain_settings
+    return None
+
+
+def _abs_cache_dir(path: str):
+    """Absolute cache path, or None when it is relative to an unsaved .blend."""
+    if path.startswith("//") and not bpy.data.filepath:
+        return None
+    return os.path.normpath(bpy.path.abspath(path))
+
+
+def _make_domain_active(context, domain):
+    # Ensure domain is active for bake ops.
+    try:
+        bpy.ops.object.select_all(action="DESELECT")
+        domain.select_set(True)
+        context.view_layer.objects.active = domain
     except Exception:
         pass
 
 
-def _get_or_create_material(name: str):
-    mat = bpy.data.materials.get(name)
-    if mat is None:
-        mat = bpy.data.materials.new(name=name)
-    mat.use_nodes = True
-    return mat
+def _bake_worker_argv(snapshot, rig_id, cache_dir, threads, overrides=None):
+    argv = [bpy.app.binary_path, "-b", snapshot]
+    if threads > 0:
+        argv += ["-t", str(threads)]
+    argv += [
+        "--python", os.path.abspath(__file__),
+        "--", "--fire-vfx-bake", rig_id, "--cache-dir", cache_dir,
+    ]
+    if overrides:
+        argv += ["--overrides", json.dumps(overrides, sort_keys=True)]
+    return argv
+
 
+def _save_bake_snapshot(directory=None) -> str:
+    """Save a copy of the open .blend for workers; the session file is untouched."""
+    directory = directory or tempfile.mkdtemp(prefix=SNAPSHOT_DIR_PREFIX)
+    name = bpy.path.basename(bpy.data.filepath) or "untitled.blend"
+    path = os.path.join(directory, f"{int(time.time())}_{name}")
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+    return path
 
-def _set_color_ramp_elements(color_ramp, elements):
-    """Set ColorRamp elements deterministically.
 
-    Blender doesn't allow removing the last element in some versions, so we:
-    - Ensure at least 1 element exists
-    - Resize to match desired count
-    - Set positions/colors in index order
+def _plan_background_bakes(rigs):
+    """([(rig, abs cache dir)] still to bake, number of cache hits).
+
+    Rigs whose content-addressed cache is already complete are hits; rigs
+    without a resolvable cache dir are left out.
     """
-    if color_ramp is None:
+    planned = []
+    hits = 0
+    for rig in rigs:
+        # Apply first so the snapshot and the cache key match the settings.
+        _update_rig(rig)
+        _key, cache_dir, complete = _rig_bake_state(rig)
+        if complete:
+            hits += 1
+        elif cache_dir is not None:
+            planned.append((rig, cache_dir))
+    return planned, hits
+
+
+def _submit_background_bakes(scene, planned):
+    """Queue one worker per `_plan_background_bakes` entry on a shared .blend snapshot.
+
+    Returns the queued jobs.
+    """
+    state = scene.fire_vfx_scene
+    _BAKE_LIMITS["max_workers"] = max(1, state.bake_max_workers)
+    _BAKE_LIMITS["ram_budget_gb"] = state.bake_ram_budget_gb
+    if not planned:
+        return []
+
+    snapshot = _save_bake_snapshot()
+    jobs = []
+    for rig, cache_dir in planned:
+        argv = _bake_worker_argv(snapshot, rig.rig_id, cache_dir, state.bake_threads_per_worker)
+        ram_gb = _rig_estimate(rig)["ram_bytes"] / 1024 ** 3
+        jobs.append(_BakeJob(rig.rig_id, rig.name, snapshot, cache_dir, ram_gb, argv))
+    _BAKE_JOBS.extend(jobs)
+
+    _ensure_job_timer()
+    return jobs
+
+
+def _cleanup_snapshot(snapshot):
+    if any(j.snapshot == snapshot and j.state in (JOB_PENDING, JOB_RUNNING) for j in _BAKE_JOBS):
         return
+    try:
+        os.remove(snapshot)
+    except OSError:
+        pass
 
-    desired = list(elements)
-    if not desired:
-        return
 
-    cr = color_ramp
+def _discard_finished_jobs():
+    """Drop finished jobs from the queue and delete temp dirs no queued job still uses.
 
-    # Ensure at least one element exists.
-    if len(cr.elements) == 0:
-        cr.elements.new(0.0)
+    A submission's snapshot dir (with its jobs' logs) lives as long as
+    one of its jobs is listed, so failed logs stay inspectable until cleared.
+    """
+    done = [j for j in _BAKE_JOBS if j.state not in (JOB_PENDING, JOB_RUNNING)]
+    _BAKE_JOBS[:] = [j for j in _BAKE_JOBS if j.state in (JOB_PENDING, JOB_RUNNING)]
+    live = {os.path.dirname(j.snapshot) for j in _BAKE_JOBS}
+    for directory in {os.path.dirname(j.snapshot) for j in done} - live:
+        if os.path.basename(directory).startswith(SNAPSHOT_DIR_PREFIX):
+            shutil.rmtree(directory, ignore_errors=True)
 
-    # Grow/shrink to desired length.
-    while len(cr.elements) < len(desired):
-        cr.elements.new(desired[len(cr.elements)][0])
 
-    while len(cr.elements) > len(desired):
-        try:
-            cr.elements.remove(cr.elements[-1])
-        except Exception:
-            break
+def _ensure_job_timer():
+    """Poll the queue on a timer; persistent, so opening another .blend does not drop it.
 
-    # Apply values.
-    for i, (pos, col) in enumerate(desired):
+    Background mode has no timers: the CLI drives `_poll_bake_jobs` itself.
+    """
+    if not bpy.app.background and not bpy.app.timers.is_registered(_poll_bake_jobs):
+        bpy.app.timers.register(_poll_bake_jobs, first_interval=0.1, persistent=True)
+
+
+def _poll_bake_jobs():
+    """Timer: reap finished workers and start pending ones within the budget."""
+    running = []
+    for job in _BAKE_JOBS:
+        if job.state != JOB_RUNNING:
+            continue
+        code = job.proc.poll()
+        if code is None:
+            _update_checkpoint(job.cache_dir)
+            running.append(job)
+            continue
+        job.state = JOB_DONE if code == 0 else JOB_FAILED
+        job.finished = time.time()
+        _cleanup_snapshot(job.snapshot)
+        _invalidate_panel_caches()
+
+    ram_used = sum(j.ram_gb for j in running)
+    budget = _BAKE_LIMITS["ram_budget_gb"]
+    for job in _BAKE_JOBS:
+        if len(running) >= _BAKE_LIMITS["max_workers"]:
+            break
+        if job.state != JOB_PENDING:
+            continue
+        # Jobs writing the same cache directory run one after another.
+        if any(r.cache_dir == job.cache_dir for r in running):
+            continue
+        # Always let one job run, even if it alone exceeds the budget.
+        if running and budget > 0.0 and ram_used + job.ram_gb > budget:
+            continue
         try:
-            cr.elements[i].position = float(pos)
-            cr.elements[i].color = col
-        except Exception:
-            pass
+            job.start()
+        except OSError:
+            job.state = JOB_FAILED
+            job.finished = time.time()
+            continue
+        running.append(job)
+        ram_used += job.ram_gb
 
+    _tag_redraw()
+    if running or any(j.state == JOB_PENDING for j in _BAKE_JOBS):
+        return 1.0
+    return None
 
-def _build_volume_shader(mat, flame_strength=25.0, smoke_density=2.0, flame_ramp=((0.0, (0.05, 0.01, 0.0, 1.0)), (0.25, (1.0, 0.35, 0.05, 1.0)), (1.0, (1.0, 1.0, 1.0, 1.0)))):
-    """Build a simple, robust Mantaflow volume shader.
 
-    Uses `Attribute` nodes: "density" and "flame".
-    """
+def _cache_dir_busy(cache_dir) -> bool:
+    return cache_dir is not None and any(j.state == JOB_RUNNING and j.cache_dir == cache_dir for j in _BAKE_JOBS)
 
-    nt = mat.node_tree
-    nodes = nt.nodes
-    links = nt.links
 
-    nodes.clear()
+def _cancel_bake_jobs():
+    for job in _BAKE_JOBS:
+        if job.state == JOB_RUNNING:
+            job.proc.terminate()
+            job.state = JOB_CANCELLED
+            job.finished = time.time()
+        elif job.state == JOB_PENDING:
+            job.state = JOB_CANCELLED
+    for snapshot in {j.snapshot for j in _BAKE_JOBS}:
+        _cleanup_snapshot(snapshot)
 
-    out = nodes.new("ShaderNodeOutputMaterial")
-    out.location = (520, 0)
 
-    pv = nodes.new("ShaderNodeVolumePrincipled")
-    pv.location = (260, 0)
+def _shutdown_bake_jobs():
+    """Stop every worker and delete the temp dirs (Blender quitting or the add-on unloading).
 
-    # Density
-    attr_density = nodes.new("ShaderNodeAttribute")
-    attr_density.attribute_name = "density"
-    attr_density.location = (-520, -120)
+    Terminated bakes keep their checkpoint, so they resume on the next bake.
+    """
+    _cancel_bake_jobs()
+    _discard_finished_jobs()
 
-    # Flame
-    attr_flame = nodes.new("ShaderNodeAttribute")
-    attr_flame.attribute_name = "flame"
-    attr_flame.location = (-520, 140)
 
-    ramp = nodes.new("ShaderNodeValToRGB")
-    ramp.location = (-240, 140)
-    _set_color_ramp_elements(ramp.color_ramp, flame_ramp)
+def _tag_redraw():
+    wm = getattr(bpy.context, "window_manager", None)
+    if wm is None:
+        return
+    for window in wm.windows:
+        for area in window.screen.areas:
+            if area.type == "VIEW_3D":
+                area.tag_redraw()
 
-    # Flame strength: flame * strength
-    mult = nodes.new("ShaderNodeMath")
-    mult.operation = "MULTIPLY"
-    mult.inputs[1].default_value = float(flame_strength)
-    mult.location = (-20, 140)
 
-    # Smoke density: density * smoke_density
-    mult_d = nodes.new("ShaderNodeMath")
-    mult_d.operation = "MULTIPLY"
-    mult_d.inputs[1].default_value = float(smoke_density)
-    mult_d.location = (-20, -120)
+def _bake_rig_headless(scene, rig_id: str, cache_dir=None, overrides=None) -> bool:
+    """Worker side: apply one rig's settings and bake its domain synchronously.
 
-    # Links
-    links.new(pv.outputs[0], out.inputs[1])  # Volume -> Material Output Volume
-    links.new(attr_flame.outputs.get("Fac"), ramp.inputs[0])
-    links.new(ramp.outputs.get("Color"), pv.inputs.get("Emission Color"))
-    links.new(attr_flame.outputs.get("Fac"), mult.inputs[0])
-    links.new(mult.outputs.get("Value"), pv.inputs.get("Emission Strength"))
-    links.new(attr_density.outputs.get("Fac"), mult_d.inputs[0])
-    links.new(mult_d.outputs.get("Value"), pv.inputs.get("Density"))
+    `overrides` ({settings attr: value}) are applied to the rig first, so
+    one snapshot can bake every variant of a wedge.
+    """
+    rig = _get_rig(scene, rig_id)
+    if rig is None or rig.domain is None:
+        print(f"[FireVFX] rig {rig_id!r} not found in {bpy.data.filepath}")
+        return False
+    for attr, value in (overrides or {}).items():
+        setattr(rig.settings, attr, value)
+    _update_rig(rig)
+    ds = _fluid_domain_settings(rig.domain)
+    if ds is None:
+        return False
+    if cache_dir:
+        ds.cache_directory = cache_dir
+    resume = _prepare_resume(rig, _abs_cache_dir(ds.cache_directory))
+    _make_domain_active(bpy.context, rig.domain)
+    if resume is None:
+        print(f"[FireVFX] baking {rig.name} -> {ds.cache_directory}")
+    else:
+        print(f"[FireVFX] resuming {rig.name} after frame {resume} -> {ds.cache_directory}")
+    ok = _run_bake(resume, _tier_noise(rig.settings)[0])
+    manifest = _record_bake(rig, cache_dir, extra={"wedge": overrides} if overrides else None)
+    return ok and bool(manifest and manifest["complete"])
 
-    # A little extinction helps smoke read.
-    _set_if_has(pv.inputs.get("Anisotropy"), "default_value", 0.2)
-    _set_if_has(pv.inputs.get("Color"), "default_value", (0.2, 0.2, 0.2, 1.0))
 
+# -----------------------------
+# Wedge (parameter sweep) bakes
+# -----------------------------
 
-def _ensure_domain_material(domain_obj, settings):
-    if domain_obj is None:
-        return
-    mat = _get_or_create_material(MATERIAL_NAME)
+WEDGE_SUMMARY = "fire_vfx_wedge_{rig_id}.json"
 
-    flame_ramp = (
-        (0.0, settings.flame_color_low),
-        (0.25, settings.flame_color_mid),
-        (1.0, settings.flame_color_high),
-    )
-    _build_volume_shader(
-        mat,
-        flame_strength=settings.flame_strength,
-        smoke_density=settings.smoke_density,
-        flame_ramp=flame_ramp,
-    )
 
-    if domain_obj.data is not None:
-        if len(domain_obj.data.materials) == 0:
-            domain_obj.data.materials.append(mat)
-        else:
-            domain_obj.data.materials[0] = mat
+# Enum items for FIREVFX_WedgeParam.attr: scalar numeric FIREVFX_Settings fields.
+_WEDGE_ITEMS = []
 
 
-def _ensure_fluid_modifier(obj):
-    if obj is None:
-        return None
-    for m in obj.modifiers:
-        if m.type == "FLUID":
-            return m
-    return obj.modifiers.new(name="Fluid", type="FLUID")
+def _wedge_attr_items(self, context):
+    # Blender needs the items list kept alive, hence the module-level cache.
+    if not _WEDGE_ITEMS:
+        for prop in FIREVFX_Settings.bl_rna.properties:
+            if prop.type in {"FLOAT", "INT"} and getattr(prop, "array_length", 0) == 0 and not prop.is_readonly:
+                _WEDGE_ITEMS.append((prop.identifier, prop.name, prop.description))
+    return _WEDGE_ITEMS
 
 
-def _apply_domain_settings(domain_obj, settings):
-    mod = _ensure_fluid_modifier(domain_obj)
-    if mod is None:
-        return
+def _wedge_values(start: float, end: float, steps: int):
+    if steps <= 1:
+        return [start]
+    return [start + (end - start) * i / (steps - 1) for i in range(steps)]
 
-    _set_if_has(mod, "fluid_type", "DOMAIN")
 
-    ds = getattr(mod, "domain_settings", None)
-    if ds is None:
-        return
+def _wedge_variants(params, mode="GRID", samples=8, seed=0, settings=None):
+    """Expand {attr: (start, end, steps)} into a list of {attr: value} overrides.
 
-    _set_if_has(ds, "domain_type", "GAS")
+    GRID takes every combination of each range's `steps` values; LHS draws
+    `samples` Latin-hypercube points (one per stratum of every range).
+    Integer settings are rounded when `settings` is given.
+    """
+    attrs = sorted(params)
+    if not attrs:
+        return []
+    if mode == "LHS":
+        rng = random.Random(seed)
+        columns = []
+        for attr in attrs:
+            start, end, _steps = params[attr]
+            strata = [(i + rng.random()) / samples for i in range(samples)]
+            rng.shuffle(strata)
+            columns.append([start + (end - start) * u for u in strata])
+        rows = zip(*columns)
+    else:
+        rows = itertools.product(*(_wedge_values(*params[attr]) for attr in attrs))
+
+    ints = set()
+    if settings is not None:
+        ints = {a for a in attrs if settings.bl_rna.properties[a].type == "INT"}
+    variants = []
+    for row in rows:
+        variant = {a: (int(round(v)) if a in ints else round(v, 6)) for a, v in zip(attrs, row)}
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+class _overridden:
+    """Temporarily apply {attr: value} to a settings group."""
+
+    def __init__(self, settings, overrides):
+        self.settings = settings
+        self.overrides = overrides
+        self.saved = {}
+
+    def __enter__(self):
+        for attr, value in self.overrides.items():
+            self.saved[attr] = getattr(self.settings, attr)
+            setattr(self.settings, attr, value)
+        return self.settings
+
+    def __exit__(self, *exc):
+        for attr, value in self.saved.items():
+            setattr(self.settings, attr, value)
+        return False
+
+
+def _submit_wedge_bakes(scene, rig, variants):
+    """Queue one background bake per wedge variant of `rig`.
+
+    Each variant bakes into `<rig cache dir>/<key of its settings>` with a
+    manifest recording its overrides; a summary JSON next to them maps
+    variants to directories. Variants already baked are skipped, and each
+    variant's own estimate is checked against the bake budget: over-budget
+    variants are left out when the scene's budget action is Refuse.
+    Returns (queued jobs, number of cache hits, [(label, problems)] over budget).
+    """
+    state = scene.fire_vfx_scene
+    _BAKE_LIMITS["max_workers"] = max(1, state.bake_max_workers)
+    _BAKE_LIMITS["ram_budget_gb"] = state.bake_ram_budget_gb
+
+    _update_rig(rig)
+    ds = _fluid_domain_settings(rig.domain)
+    root = _abs_cache_dir(_rig_cache_base(rig))
+    if ds is None or root is None:
+        return [], 0, []
+    frames = (ds.cache_frame_start, ds.cache_frame_end)
+    refuse = state.budget_action == "REFUSE"
+
+    planned = []
+    summary = []
+    over = []
+    hits = 0
+    for overrides in variants:
+        label = f"{rig.name} [" + ", ".join(f"{a}={v:g}" for a, v in sorted(overrides.items())) + "]"
+        with _overridden(rig.settings, overrides) as settings:
+            # The resolution the worker's `_update_rig` will write (an
+            # override can change the scene voxel scale too); the directory
+            # and the completeness check both use the key it yields.
+            resolution = _effective_resolution(settings)
+            key = _sim_fingerprint(rig, resolution)[0]
+            estimate = _estimate_bake(settings, frames, resolution=resolution)
+        cache_dir = os.path.join(root, key)
+        summary.append({"overrides": overrides, "cache_dir": cache_dir})
+        if _cache_is_complete(cache_dir, key, ds.cache_frame_start, ds.cache_frame_end):
+            hits += 1
+            continue
+        problems = _budget_problems(scene, estimate)
+        if problems:
+            over.append((label, problems))
+            if refuse:
+                summary[-1]["skipped"] = "over budget: " + ", ".join(problems)
+                continue
+        planned.append((overrides, label, cache_dir, estimate["ram_bytes"] / 1024 ** 3))
+
+    _write_manifest(root, {"rig_id": rig.rig_id, "rig": rig.name, "variants": summary}, WEDGE_SUMMARY.format(rig_id=rig.rig_id))
+    if not planned:
+        return [], hits, over
+
+    snapshot = _save_bake_snapshot()
+    jobs = []
+    for overrides, label, cache_dir, ram_gb in planned:
+        argv = _bake_worker_argv(snapshot, rig.rig_id, cache_dir, state.bake_threads_per_worker, overrides)
+        jobs.append(_BakeJob(rig.rig_id, label, snapshot, cache_dir, ram_gb, argv))
+    _BAKE_JOBS.extend(jobs)
+
+    _ensure_job_timer()
+    return jobs, hits, over
+
+
+def _wedge_params(state):
+    return {p.attr: (p.start, p.end, p.steps) for p in state.wedge_params if p.attr}
 
-    # Cache
-    _set_if_has(ds, "cache_directory", settings.cache_directory)
-    _set_if_has(ds, "cache_type", "MODULAR")
 
-    # Core quality / sim
-    _set_if_has(ds, "resolution_max", int(settings.resolution_max))
-    _set_if_has(ds, "time_scale", float(settings.time_scale))
-    _set_if_has(ds, "vorticity", float(settings.vorticity))
+# -----------------------------
+# Modal (in-UI) bake progress
+# -----------------------------
 
-    # Adaptive domain / padding
-    _set_if_has(ds, "use_adaptive_domain", bool(settings.use_adaptive_domain))
-    _set_if_has(ds, "additional_res", int(settings.adaptive_additional_res))
-    _set_if_has(ds, "adapt_margin", int(settings.adaptive_margin))
+# rig_id -> progress dict shown in the panel while/after a modal bake runs.
+_BAKE_PROGRESS = {}
+
+
+class _BakeMonitor:
+    """Polls a domain's data cache directory and derives throughput numbers."""
+
+    def __init__(self, cache_dir, frame_start, frame_end):
+        self.cache_dir = cache_dir
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.started = time.time()
+        # Frames already on disk (resumed bakes) don't count towards throughput.
+        self.baseline = self._done(_scan_cache_frames(cache_dir))
+
+    def _done(self, frames) -> int:
+        return sum(1 for f in frames if self.frame_start <= f <= self.frame_end)
+
+    @property
+    def total(self) -> int:
+        return max(1, self.frame_end - self.frame_start + 1)
+
+    def poll(self, state="BAKING"):
+        frames = _scan_cache_frames(self.cache_dir)
+        done = self._done(frames)
+        # A fresh bake frees the old cache first; follow the baseline down.
+        self.baseline = min(self.baseline, done)
+        elapsed = max(1e-6, time.time() - self.started)
+        fps = (done - self.baseline) / elapsed
+        remaining = max(0, self.total - done)
+        return {
+            "state": state,
+            "frames": done,
+            "total": self.total,
+            "fps": fps,
+            "eta": remaining / fps if fps > 0.0 else -1.0,
+            "bytes": sum(frames.values()),
+            "elapsed": elapsed,
+        }
+
+
+def _format_progress(p) -> str:
+    text = f"{p['state'].title()}: {p['frames']}/{p['total']} frames, {p['fps']:.2f} fps"
+    if p["state"] == "BAKING" and p["eta"] >= 0.0:
+        text += f", ETA {p['eta']:.0f}s"
+    return text + f", {_format_bytes(p['bytes'])}"
 
-    # Noise
-    _set_if_has(ds, "use_noise", bool(settings.use_noise))
-    _set_if_has(ds, "noise_strength", float(settings.noise_strength))
-    _set_if_has(ds, "noise_scale", float(settings.noise_scale))
 
-    # Dissolve smoke (optional)
-    _set_if_has(ds, "use_dissolve_smoke", bool(settings.use_dissolve_smoke))
-    _set_if_has(ds, "dissolve_speed", int(settings.dissolve_speed))
+# -----------------------------
+# Baked instancing (one cache, many time-offset volumes)
+# -----------------------------
 
-    # Flames & smoke from reaction (property names vary by Blender version)
-    _set_if_has(ds, "use_reaction", True)
-    _set_if_has(ds, "burning_rate", float(settings.burning_rate))
-    _set_if_has(ds, "flame_smoke", float(settings.flame_smoke))
+INSTANCE_VOLUME_PREFIX = "FireVFX_Inst_"
+INSTANCE_COLLECTION_PREFIX = "FireVFX_Instances_"
+# Object ID property on an instance: rig id of the bake it plays back.
+INSTANCE_SOURCE_PROP = "fire_vfx_instance_of"
 
 
-def _apply_flow_settings(emitter_obj, settings):
-    mod = _ensure_fluid_modifier(emitter_obj)
-    if mod is None:
-        return
+# Suffix Mantaflow gives the grids in `noise/*.vdb` (density_noise, flame_noise).
+NOISE_GRID_SUFFIX = "_noise"
+# Name suffix of the material/node group copies that read those grids.
+_NOISE_COPY_SUFFIX = "_Noise"
 
-    _set_if_has(mod, "fluid_type", "FLOW")
 
-    fs = getattr(mod, "flow_settings", None)
-    if fs is None:
-        return
+def _vdb_sequence(cache_dir: str, subdir: str = "data"):
+    """(first file name, first frame, frame count) of `<cache_dir>/<subdir>/*.vdb`, or None."""
+    try:
+        names = [e.name for e in os.scandir(os.path.join(cache_dir, subdir)) if e.name.endswith(".vdb")]
+    except OSError:
+        return None
+    frames = {}
+    for name in names:
+        m = _FRAME_RE.search(name)
+        if m is not None:
+            frames[int(m.group(1))] = name
+    if not frames:
+        return None
+    first, last = min(frames), max(frames)
+    return frames[first], first, last - first + 1
 
-    # Type/behavior
-    # Blender enums differ; try FIRE then SMOKE.
-    if hasattr(fs, "flow_type"):
-        try:
-            fs.flow_type = "FIRE"
-        except Exception:
-            try:
-                fs.flow_type = "SMOKE"
-            except Exception:
-                pass
 
-    _set_if_has(fs, "flow_behavior", "INFLOW")
+def _noise_grid_copy(collection, source):
+    """Copy of a material or node group whose grid Attribute nodes read the noise grids.
+
+    The copy is made fresh on every call so it tracks the source; an earlier
+    copy is remapped to it, so volumes instanced before keep their shading.
+    """
+    copy = source.copy()
+    tree = getattr(copy, "node_tree", copy)
+    for node in tree.nodes if tree is not None else ():
+        if node.bl_idname == "ShaderNodeAttribute" and node.attribute_name in STATS_GRIDS:
+            node.attribute_name += NOISE_GRID_SUFFIX
+        elif node.bl_idname == "ShaderNodeGroup" and node.node_tree is not None:
+            node.node_tree = _noise_grid_copy(bpy.data.node_groups, node.node_tree)
+    name = source.name + _NOISE_COPY_SUFFIX
+    previous = collection.get(name)
+    if previous is not None:
+        previous.user_remap(copy)
+        collection.remove(previous)
+    copy.name = name
+    return copy
+
+
+def _volume_variant(rig, filepath: str, frame_start: int, frame_count: int, offset: int, mode: str, material):
+    """Volume datablock reading the rig's VDB sequence at a frame offset.
+
+    Variants are reused by name, and Blender's volume file cache is keyed by
+    file path, so every variant shares the same grids in memory.
+    """
+    name = f"{INSTANCE_VOLUME_PREFIX}{rig.rig_id}_{mode.lower()}_{offset:+d}"
+    volume = bpy.data.volumes.get(name) or bpy.data.volumes.new(name)
+    _write_props(
+        volume,
+        (
+            ("filepath", filepath),
+            ("is_sequence", True),
+            ("frame_start", frame_start),
+            ("frame_duration", frame_count),
+            ("frame_offset", offset),
+            ("sequence_mode", mode),
+        ),
+    )
+    if material is not None and list(volume.materials) != [material]:
+        volume.materials.clear()
+        volume.materials.append(material)
+    return volume
 
-    # How much stuff we add
-    _set_if_has(fs, "density", float(settings.flow_density))
-    _set_if_has(fs, "temperature", float(settings.flow_temperature))
-    _set_if_has(fs, "fuel_amount", float(settings.flow_fuel))
 
-    # Initial velocity can cause a nice torch look; keep optional.
-    _set_if_has(fs, "use_initial_velocity", bool(settings.use_initial_velocity))
-    _set_if_has(fs, "velocity_factor", float(settings.velocity_factor))
+def instance_baked_fire(rig, locations, variants=4, max_offset=48, sequence_mode="REPEAT", seed=0, scene=None):
+    """Place Volume instances of a rig's baked cache at `locations`.
 
+    `variants` Volume datablocks with random frame offsets in
+    [0, max_offset] are made once; each instance links one of them, so the
+    cost is one bake and one cache regardless of the instance count. The
+    domain's transform is reused, shifted by each location minus the
+    emitter's. Returns the new objects (empty if the rig has no VDB cache).
+
+    When the noise stage is baked for the current settings the upres
+    `noise/` frames are instanced, with a material copy reading their
+    `*_noise` grids; otherwise the `data/` frames are.
+    """
+    scene = scene or bpy.context.scene
+    ds = _fluid_domain_settings(rig.domain)
+    cache_dir = _abs_cache_dir(ds.cache_directory) if ds is not None else None
+    if cache_dir is None:
+        return []
+    subdir, sequence = "data", None
+    if _bake_stages(rig)["noise"] == "BAKED":
+        subdir, sequence = "noise", _vdb_sequence(cache_dir, "noise")
+    if sequence is None:
+        subdir, sequence = "data", _vdb_sequence(cache_dir)
+    if sequence is None:
+        return []
+    first_name, frame_start, frame_count = sequence
+    filepath = os.path.join(ds.cache_directory, subdir, first_name)
+
+    rng = random.Random(seed)
+    offsets = sorted({rng.randint(0, max(0, max_offset)) for _ in range(max(1, variants))})
+    material = rig.domain.active_material or bpy.data.materials.get(MATERIAL_NAME)
+    if material is not None and subdir == "noise":
+        material = _noise_grid_copy(bpy.data.materials, material)
+    volumes = [_volume_variant(rig, filepath, frame_start, frame_count, o, sequence_mode, material) for o in offsets]
+
+    col = _ensure_collection(INSTANCE_COLLECTION_PREFIX + rig.rig_id, scene)
+    base = _object_matrix(rig.domain)
+    origin = _object_matrix(rig.emitter).translation if rig.emitter is not None else base.translation
+    objects = []
+    for i, location in enumerate(locations):
+        obj = bpy.data.objects.new(f"{INSTANCE_VOLUME_PREFIX}{rig.name}_{i:03d}", rng.choice(volumes))
+        obj.matrix_world = Matrix.Translation(Vector(location) - origin) @ base
+        obj[INSTANCE_SOURCE_PROP] = rig.rig_id
+        # The shared material reads the look from object properties.
+        _copy_shading_props(rig.domain, obj)
+        col.objects.link(obj)
+        obj.update_tag()
+        objects.append(obj)
+    return objects
 
-def _find_rig(context):
-    scene = context.scene
-    settings = scene.fire_vfx_settings
-    dom = bpy.data.objects.get(settings.domain_object_name) if settings.domain_object_name else None
-    emi = bpy.data.objects.get(settings.emitter_object_name) if settings.emitter_object_name else None
-    return dom, emi
+
+def _clear_instances(rig):
+    col = bpy.data.collections.get(INSTANCE_COLLECTION_PREFIX + rig.rig_id)
+    for obj in list(col.objects) if col is not None else ():
+        bpy.data.objects.remove(obj, do_unlink=True)
 
 
 # -----------------------------
@@ -416,6 +3221,36 @@ PRESET_OVERRIDES = {
 }
 
 
+# Quality tiers scale the rig's (Final) settings when they are written, so a
+# tier switch never edits the settings and each tier keeps its own cache key.
+QUALITY_TIERS = {
+    "DRAFT": {"resolution": 0.4, "noise": False, "noise_scale": 0.5, "margin": 0.5, "timesteps_max": 1, "cfl_condition": 8.0},
+    "PREVIEW": {"resolution": 0.65, "noise": True, "noise_scale": 0.5, "margin": 0.75, "timesteps_max": 2, "cfl_condition": 6.0},
+    # Mantaflow's own defaults for the substep controls.
+    "FINAL": {"resolution": 1.0, "noise": True, "noise_scale": 1.0, "margin": 1.0, "timesteps_max": 4, "cfl_condition": 4.0},
+}
+
+
+def _tier(settings):
+    return QUALITY_TIERS.get(settings.quality_tier, QUALITY_TIERS["FINAL"])
+
+
+def _tier_noise(settings):
+    """(use_noise, noise_scale) after the quality tier.
+
+    noise_scale is the int upres factor FluidDomainSettings accepts (1-10),
+    rounded down: FINAL keeps the upres the estimate has always priced a
+    preset at (e.g. 3 for Bonfire's 3.5), lower tiers only go below it.
+    """
+    tier = _tier(settings)
+    use_noise = bool(settings.use_noise) and tier["noise"]
+    return use_noise, max(1, min(10, int(settings.noise_scale * tier["noise_scale"])))
+
+
+def _tier_margin(settings) -> int:
+    return int(round(settings.adaptive_margin * _tier(settings)["margin"]))
+
+
 def _apply_preset_to_settings(settings, preset_id: str):
     # Apply base first for stable diffs and predictable behavior.
     for k, v in BASE_PRESET.items():
@@ -438,6 +3273,409 @@ def _preset_update(self, context):
     _apply_preset_to_settings(self, self.preset)
 
 
+# -----------------------------
+# Domain auto-fit
+# -----------------------------
+
+# Plume model (buoyant fire plume at Mantaflow's default buoyancy).
+_PLUME_BUOYANT_SPEED = 0.5  # m/s of rise per unit flow_temperature
+_PLUME_JET_SPEED = 0.3  # m/s added per unit velocity_factor (initial velocity on)
+_PLUME_FLAME_SECONDS = 1.6  # flame lifetime at burning_rate 1.0
+_PLUME_SPREAD = 0.22  # lateral growth per meter of rise
+_PLUME_VORTICITY_SPREAD = 0.04  # extra lateral growth per unit vorticity
+
+
+def _preset_value(preset_id: str, key: str):
+    return PRESET_OVERRIDES.get(preset_id, {}).get(key, BASE_PRESET[key])
+
+
+def _plume_extent(settings, seconds: float, fps: float):
+    """(height, lateral spread) in meters the plume reaches within `seconds`."""
+    speed = _PLUME_BUOYANT_SPEED * settings.flow_temperature
+    if settings.use_initial_velocity:
+        speed += _PLUME_JET_SPEED * settings.velocity_factor
+    speed *= settings.time_scale
+    flame = _PLUME_FLAME_SECONDS / max(0.1, settings.burning_rate)
+    # Smoke keeps rising after the flame; weight it by how much smoke is made.
+    smoke_life = settings.dissolve_speed / fps if settings.use_dissolve_smoke else seconds
+    visible = min(seconds, flame + settings.flame_smoke * smoke_life)
+    height = speed * visible
+    return height, height * (_PLUME_SPREAD + _PLUME_VORTICITY_SPREAD * settings.vorticity)
+
+
+def _fit_domain_box(emitter_min, emitter_max, settings, seconds: float, fps: float, padding=0.15):
+    """(center, size) of a tight domain box around the emitter and its plume."""
+    height, spread = _plume_extent(settings, seconds, fps)
+    lo = [emitter_min[i] - spread for i in range(2)]
+    hi = [emitter_max[i] + spread for i in range(2)]
+    lo.append(emitter_min[2] - max(0.05, 0.1 * height))
+    hi.append(emitter_max[2] + height)
+    size = []
+    center = []
+    for i in range(3):
+        extent = (hi[i] - lo[i]) * (1.0 + padding)
+        size.append(max(0.1, extent))
+        center.append((hi[i] + lo[i]) / 2.0)
+    return tuple(center), tuple(size)
+
+
+def _world_bbox(obj):
+    m = _object_matrix(obj)
+    corners = [m @ Vector(c) for c in obj.bound_box]
+    return (
+        tuple(min(c[i] for c in corners) for i in range(3)),
+        tuple(max(c[i] for c in corners) for i in range(3)),
+    )
+
+
+# -----------------------------
+# Emitter clustering
+# -----------------------------
+
+# Fixed per-domain cost in voxel-equivalents per frame (solver setup, cache I/O).
+_CLUSTER_DOMAIN_OVERHEAD = 250_000
+GROUP_COLLECTION_PREFIX = "FireVFX_Group_"
+
+
+def _rig_voxel_size(settings) -> float:
+    if settings.sizing_mode == "VOXEL_SIZE":
+        return settings.voxel_size
+    return max(settings.domain_size) / max(1, settings.resolution_max)
+
+
+def _cluster_key(settings):
+    """Rigs can share a domain only if their domain-level sim settings match."""
+    values = [[a, _snapshot_value(v)] for a, v in _domain_values(settings) if a not in ("resolution_max", "cache_directory")]
+    return json.dumps([values, round(_rig_voxel_size(settings), 4)])
+
+
+def _box_dims(lo, hi, voxel):
+    return [max(1, math.ceil((hi[i] - lo[i]) / voxel)) for i in range(3)]
+
+
+def _box_cost(lo, hi, voxel):
+    dims = _box_dims(lo, hi, voxel)
+    return dims[0] * dims[1] * dims[2] + _CLUSTER_DOMAIN_OVERHEAD
+
+
+def _cluster_boxes(boxes, voxel, max_resolution):
+    """Greedy agglomerative clustering of (lo, hi) boxes.
+
+    Repeatedly merges the pair whose union saves the most voxels (net of the
+    per-domain overhead) while the merged grid stays within `max_resolution`.
+    Returns lists of box indices.
+    """
+    clusters = {i: (lo, hi, [i]) for i, (lo, hi) in enumerate(boxes)}
+    heap = []
+
+    def push(a, b):
+        lo_a, hi_a, _ = clusters[a]
+        lo_b, hi_b, _ = clusters[b]
+        lo = tuple(min(lo_a[i], lo_b[i]) for i in range(3))
+        hi = tuple(max(hi_a[i], hi_b[i]) for i in range(3))
+        if max(_box_dims(lo, hi, voxel)) > max_resolution:
+            return
+        gain = _box_cost(lo_a, hi_a, voxel) + _box_cost(lo_b, hi_b, voxel) - _box_cost(lo, hi, voxel)
+        if gain > 0:
+            heapq.heappush(heap, (-gain, a, b, lo, hi))
+
+    ids = list(clusters)
+    for i, a in enumerate(ids):
+        for b in ids[i + 1:]:
+            push(a, b)
+
+    # Cluster ids are never reused, so an entry is valid while both ids live.
+    next_id = len(boxes)
+    while heap:
+        _gain, a, b, lo, hi = heapq.heappop(heap)
+        if a not in clusters or b not in clusters:
+            continue
+        members = clusters.pop(a)[2] + clusters.pop(b)[2]
+        others = list(clusters)
+        clusters[next_id] = (lo, hi, members)
+        for c in others:
+            push(next_id, c)
+        next_id += 1
+    return [members for _lo, _hi, members in clusters.values()]
+
+
+def _set_domain_group(domain, emitters):
+    """Restrict a domain to its own emitters via a `fluid_group` collection."""
+    ds = _fluid_domain_settings(domain)
+    if ds is None:
+        return
+    name = GROUP_COLLECTION_PREFIX + domain.get(RIG_ID_PROP, domain.name)
+    col = bpy.data.collections.get(name) or bpy.data.collections.new(name)
+    for obj in list(col.objects):
+        if obj not in emitters:
+            col.objects.unlink(obj)
+    for obj in emitters:
+        if obj.name not in col.objects:
+            col.objects.link(obj)
+    _set_if_has(ds, "fluid_group", col)
+
+
+def cluster_rigs(scene=None, padding=0.15, max_resolution=256):
+    """Re-partition the scene's emitters into as few voxel-frames as possible.
+
+    Each emitter's predicted plume box is clustered with compatible rigs;
+    every cluster gets one domain owned by its first rig (a new domain is
+    built if none of its rigs owns one) and unused domains are deleted.
+    Returns (domains before, domains after, cost before, cost after), costs
+    in voxels per frame including the per-domain overhead.
+    """
+    scene = scene or bpy.context.scene
+    rigs = [r for r in scene.fire_vfx_scene.rigs if r.domain is not None and r.emitter is not None]
+    fps = scene.render.fps / scene.render.fps_base
+
+    owners = [r for r in rigs if _rig_owns_domain(r)]
+    old_domains = {r.domain for r in rigs}
+    cost_before = sum(_box_cost(*_world_bbox(r.domain), _rig_voxel_size(r.settings)) for r in owners)
+
+    groups = {}
+    for rig in rigs:
+        groups.setdefault(_cluster_key(rig.settings), []).append(rig)
+
+    clusters = []
+    for group in groups.values():
+        ds = _fluid_domain_settings(_domain_rig(scene, group[0]).domain)
+        frames = (ds.cache_frame_start, ds.cache_frame_end) if ds is not None else DEFAULT_CACHE_FRAMES
+        seconds = (frames[1] - frames[0] + 1) / fps
+        boxes = []
+        for rig in group:
+            lo, hi = _world_bbox(rig.emitter)
+            center, size = _fit_domain_box(lo, hi, rig.settings, seconds, fps, padding)
+            boxes.append(
+                (
+                    tuple(center[i] - size[i] / 2.0 for i in range(3)),
+                    tuple(center[i] + size[i] / 2.0 for i in range(3)),
+                )
+            )
+        voxel = _rig_voxel_size(group[0].settings)
+        for indices in _cluster_boxes(boxes, voxel, max_resolution):
+            members = [group[i] for i in indices]
+            lo = tuple(min(boxes[i][0][k] for i in indices) for k in range(3))
+            hi = tuple(max(boxes[i][1][k] for i in indices) for k in range(3))
+            clusters.append((members, lo, hi, voxel))
+
+    col = _ensure_collection(COLLECTION_NAME, scene)
+    leads = []
+    cost_after = 0
+    for members, lo, hi, voxel in clusters:
+        lead = next((r for r in members if _rig_owns_domain(r) and r.domain not in {l.domain for l in leads}), None)
+        if lead is None:
+            lead = members[0]
+            lead.domain = _new_object(DOMAIN_NAME, _cube_mesh(DOMAIN_NAME), col, (0.0, 0.0, 0.0))
+            _set_if_has(lead.domain, "display_type", "WIRE")
+        lead.domain[RIG_ID_PROP] = lead.rig_id
+        lead.domain[MEMBERS_PROP] = ",".join(r.rig_id for r in members if r.rig_id != lead.rig_id)
+        for rig in members:
+            rig.domain = lead.domain
+
+        size = tuple(hi[i] - lo[i] for i in range(3))
+        lead.settings.domain_size = size
+        if lead.settings.sizing_mode == "RESOLUTION":
+            lead.settings.resolution_max = max(16, min(1024, math.ceil(max(size) / voxel)))
+        lead.domain.location = tuple((hi[i] + lo[i]) / 2.0 for i in range(3))
+        cost_after += _box_cost(lo, hi, voxel)
+        leads.append(lead)
+
+    # Delete the domains no cluster kept.
+    kept = {lead.domain for lead in leads}
+    for domain in old_domains - kept:
+        bpy.data.objects.remove(domain, do_unlink=True)
+
+    users_map = _mesh_users_map()
+    for lead in leads:
+        _update_rig(lead, users_map=users_map)
+        _set_domain_group(lead.domain, [lead.emitter] + [m.emitter for m in _domain_members(scene, lead)])
+    return len(owners), len(leads), cost_before, cost_after
+
+
+# -----------------------------
+# Render profiles
+# -----------------------------
+
+# Scene ID property: JSON {"profile", "saved"} where "saved" holds the
+# render/material values the first applied profile replaced.
+RENDER_RESTORE_PROP = "fire_vfx_render_restore"
+
+# step_rate scales the step size relative to the voxel size (1.0 = one
+# sample per voxel, Cycles' own default for volume objects).
+RENDER_PROFILES = {
+    "DRAFT": {
+        "step_rate": 4.0,
+        "preview_step_rate": 8.0,
+        "bounces": 0,
+        "volume_sampling": "DISTANCE",
+        "eevee_max_samples": 64,
+        "eevee_shadows": False,
+    },
+    "FINAL": {
+        "step_rate": 1.0,
+        "preview_step_rate": 2.0,
+        "bounces": 1,
+        "volume_sampling": "MULTIPLE_IMPORTANCE",
+        "eevee_max_samples": 256,
+        "eevee_shadows": True,
+    },
+}
+_EEVEE_TILE_SIZES = (2, 4, 8, 16)
+# Extra room on the computed max steps for rays entering at grazing angles.
+_MAX_STEPS_MARGIN = 1.25
+
+
+def _render_voxel_size(settings, voxel_scale=None) -> float:
+    """World size of the finest grid the domain renders (the noise grid when on)."""
+    voxel = max(settings.domain_size) / max(1, _effective_resolution(settings, voxel_scale))
+    use_noise, noise_scale = _tier_noise(settings)
+    return voxel / noise_scale if use_noise else voxel
+
+
+def _render_domains(scene):
+    """(domain object, settings) for every rig that owns a domain."""
+    state = getattr(scene, "fire_vfx_scene", None)
+    for rig in state.rigs if state is not None else ():
+        if _rig_owns_domain(rig):
+            yield rig.domain, rig.settings
+
+
+def _camera_pixels_per_meter(scene, distance: float) -> float:
+    cam = scene.camera
+    width = scene.render.resolution_x * scene.render.resolution_percentage / 100.0
+    if cam is None or cam.type != "CAMERA":
+        return 0.0
+    if cam.data.type == "ORTHO":
+        return width / max(1e-6, cam.data.ortho_scale)
+    return width / max(1e-6, 2.0 * distance * math.tan(cam.data.angle / 2.0))
+
+
+def _render_profile_values(scene, profile: str):
+    """Target values of a profile: {"cycles": pairs, "eevee": pairs, "material": pairs}.
+
+    Max steps cover the longest domain diagonal at the profile's step size;
+    with a camera, EEVEE's volume range is fitted to the domains and its
+    tile size to the nearest domain's projected voxel size.
+    """
+    p = RENDER_PROFILES[profile]
+    voxel_scale = _scene_voxel_scale(scene)
+    steps = 0
+    finest = voxel_px = near = far = None
+    scatter = False
+    for domain, settings in _render_domains(scene):
+        voxel = _render_voxel_size(settings, voxel_scale)
+        finest = voxel if finest is None else min(finest, voxel)
+        lo, hi = _world_bbox(domain)
+        diagonal = (Vector(hi) - Vector(lo)).length
+        steps = max(steps, math.ceil(diagonal / (voxel * p["step_rate"]) * _MAX_STEPS_MARGIN))
+        scatter = scatter or _resolve_shader_mode(settings) == "FULL"
+        if scene.camera is None:
+            continue
+        eye = scene.camera.matrix_world.translation
+        corners = [Vector((x, y, z)) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])]
+        dists = [(c - eye).length for c in corners]
+        center = (Vector(lo) + Vector(hi)) / 2.0
+        px = voxel * _camera_pixels_per_meter(scene, max(1e-3, (center - eye).length))
+        near = min(dists) if near is None else min(near, min(dists))
+        far = max(dists) if far is None else max(far, max(dists))
+        voxel_px = px if voxel_px is None else max(voxel_px, px)
+
+    cycles = [
+        ("volume_step_rate", p["step_rate"]),
+        ("volume_preview_step_rate", p["preview_step_rate"]),
+        # Only scattering (Full Volume) shaders use volume bounces.
+        ("volume_bounces", p["bounces"] if scatter else 0),
+    ]
+    if steps:
+        cycles.append(("volume_max_steps", int(min(1024, max(16, steps)))))
+
+    eevee = [("use_volumetric_shadows", p["eevee_shadows"])]
+    if near is not None:
+        start = max(0.1, near * 0.95)
+        end = max(start + 0.1, far * 1.05)
+        samples = math.ceil((end - start) / (finest * p["step_rate"]))
+        eevee += [
+            ("volumetric_start", start),
+            ("volumetric_end", end),
+            ("volumetric_samples", int(min(p["eevee_max_samples"], max(16, samples)))),
+        ]
+    if voxel_px:
+        # Froxel tiles no smaller than a voxel on screen (x step rate).
+        target = voxel_px * p["step_rate"]
+        tile = max([t for t in _EEVEE_TILE_SIZES if t <= target] or [_EEVEE_TILE_SIZES[0]])
+        eevee.append(("volumetric_tile_size", str(tile)))
+
+    material = [
+        ("volume_step_rate", 1.0),
+        ("volume_sampling", p["volume_sampling"]),
+        ("homogeneous_volume", False),
+    ]
+    return {"cycles": cycles, "eevee": eevee, "material": material}
+
+
+def _render_structs(scene):
+    """Render setting structs by key ("cycles"/"eevee"/"material:<name>")."""
+    structs = {}
+    for key in ("cycles", "eevee"):
+        rna = getattr(scene, key, None)
+        if rna is not None:
+            structs[key] = rna
+    for domain, _settings in _render_domains(scene):
+        mat = domain.active_material
+        if mat is not None and getattr(mat, "cycles", None) is not None:
+            structs["material:" + mat.name] = mat.cycles
+    return structs
+
+
+def _read_render_restore(scene):
+    raw = scene.get(RENDER_RESTORE_PROP)
+    try:
+        data = json.loads(raw) if raw else {}
+    except (TypeError, ValueError):
+        data = {}
+    return data if isinstance(data, dict) else {}
+
+
+def apply_render_profile(scene, profile="FINAL"):
+    """Set Cycles/EEVEE/material volume settings for `profile` ("DRAFT"/"FINAL").
+
+    The values replaced the first time are kept on the scene, so
+    `restore_render_settings` returns to the artist's own settings even
+    after switching profiles. Returns the number of settings written.
+    """
+    targets = _render_profile_values(scene, profile)
+    data = _read_render_restore(scene)
+    saved = data.get("saved", {})
+    written = 0
+    for key, rna in _render_structs(scene).items():
+        pairs = targets["material" if key.startswith("material:") else key]
+        setters = _setters_for(rna)
+        previous = saved.setdefault(key, {})
+        for attr, _value in pairs:
+            if attr not in previous and setters.get(attr) is not None and hasattr(rna, attr):
+                previous[attr] = _snapshot_value(getattr(rna, attr))
+        _write_props(rna, pairs)
+        written += len(pairs)
+    scene[RENDER_RESTORE_PROP] = json.dumps({"profile": profile, "saved": saved}, sort_keys=True)
+    return written
+
+
+def restore_render_settings(scene):
+    """Undo `apply_render_profile`; returns False when nothing was saved."""
+    data = _read_render_restore(scene)
+    if not data:
+        return False
+    structs = _render_structs(scene)
+    for key, values in data.get("saved", {}).items():
+        rna = structs.get(key)
+        if rna is None and key.startswith("material:"):
+            mat = bpy.data.materials.get(key.split(":", 1)[1])
+            rna = getattr(mat, "cycles", None)
+        _write_props(rna, tuple(values.items()))
+    del scene[RENDER_RESTORE_PROP]
+    return True
+
+
 # -----------------------------
 # Properties
 # -----------------------------
@@ -456,7 +3694,7 @@ class FIREVFX_Settings(PropertyGroup):
         update=_preset_update,
     )
 
-    # Rig object references stored by name (simple + robust)
+    # Legacy single-rig references by name; migrated into the rig registry.
     domain_object_name: StringProperty(name="Domain Object", default="")
     emitter_object_name: StringProperty(name="Emitter Object", default="")
 
@@ -469,7 +3707,34 @@ class FIREVFX_Settings(PropertyGroup):
     apply_scale_on_update: BoolProperty(
         name="Apply Scale",
         default=False,
-        description="Apply object scale when creating/updating the rig (can be disruptive to selection).",
+        description="Bake object scale into the mesh data when creating/updating the rig (object scale stays 1).",
+    )
+
+    material_mode: EnumProperty(
+        name="Material",
+        items=[
+            (
+                "SHARED",
+                "Shared",
+                "One material for every rig; each domain's look is read from its object properties, so look changes never recompile the shader",
+            ),
+            (
+                "BAKED",
+                "Baked Values",
+                "Write the look into the material itself; rigs with identical looks share one pooled material",
+            ),
+        ],
+        default="SHARED",
+    )
+    shader_mode: EnumProperty(
+        name="Shader",
+        items=_SHADER_MODE_ITEMS,
+        default="AUTO",
+    )
+    shader_patch_in_place: BoolProperty(
+        name="Patch Shader In Place",
+        default=True,
+        description="Only change values of an existing FireVFX node graph; rebuild it just when nodes/links are missing or hand-edited.",
     )
 
     # Transform-ish
@@ -492,7 +3757,40 @@ class FIREVFX_Settings(PropertyGroup):
     )
 
     # Domain quality & behavior
+    quality_tier: EnumProperty(
+        name="Quality",
+        items=[
+            ("DRAFT", "Draft", "Low resolution, no noise, one substep: blocking out timing and shape"),
+            ("PREVIEW", "Preview", "Reduced resolution and noise for look-dev"),
+            ("FINAL", "Final", "The preset as authored"),
+        ],
+        default="FINAL",
+        description="Scales the preset's resolution, noise, adaptive margin and substeps when written to the domain.",
+    )
+    sizing_mode: EnumProperty(
+        name="Sizing",
+        items=[
+            ("RESOLUTION", "Resolution", "Use the preset's resolution_max as is"),
+            ("VOXEL_SIZE", "Voxel Size", "Derive resolution_max from a target voxel size and the longest domain axis"),
+        ],
+        default="RESOLUTION",
+    )
     resolution_max: IntProperty(name="Resolution", min=16, max=1024, default=96)
+    voxel_size: FloatProperty(
+        name="Voxel Size",
+        subtype="DISTANCE",
+        min=0.001,
+        max=10.0,
+        default=0.03,
+        precision=4,
+        description="Target voxel edge length in meters (Voxel Size sizing).",
+    )
+    voxel_budget: FloatProperty(
+        name="Voxel Budget (M)",
+        min=0.0,
+        default=0.0,
+        description="Maximum voxels for this rig in millions (0 = unlimited).",
+    )
     time_scale: FloatProperty(name="Time Scale", min=0.05, max=3.0, default=1.0)
     vorticity: FloatProperty(name="Vorticity", min=0.0, max=10.0, default=0.8)
 
@@ -556,116 +3854,394 @@ class FIREVFX_Settings(PropertyGroup):
         default="//fire_vfx_cache",
         description="Relative to the .blend when starting with //",
     )
+    use_content_cache: BoolProperty(
+        name="Content-Addressed Cache",
+        default=True,
+        description="Bake into a subdirectory named by a hash of the simulation settings; re-baking identical settings is a no-op.",
+    )
+    analyze_after_bake: BoolProperty(
+        name="Analyze After Bake",
+        default=False,
+        description="Write per-frame stats (occupied box, flame energy, max density, empty frames) next to the cache once a bake completes. Skipped for .vdb caches unless the openvdb Python module is installed.",
+    )
+    use_rig_cache_dir: BoolProperty(
+        name="Per-Rig Subfolder",
+        default=True,
+        description="Keep each rig's bakes under <cache dir>/<rig id>, so rigs sharing a cache directory never overwrite each other.",
+    )
+
+
+class FIREVFX_RigEntry(PropertyGroup):
+    # `name` (built in) is the display name in the rig list.
+    rig_id: StringProperty(name="Rig ID", default="", description="Stable identifier of this rig.")
+    domain: PointerProperty(name="Domain", type=bpy.types.Object)
+    emitter: PointerProperty(name="Emitter", type=bpy.types.Object)
+    settings: PointerProperty(type=FIREVFX_Settings)
+
+
+class FIREVFX_WedgeParam(PropertyGroup):
+    attr: EnumProperty(name="Setting", items=_wedge_attr_items, description="Rig setting to sweep.")
+    start: FloatProperty(name="From", default=0.0)
+    end: FloatProperty(name="To", default=1.0)
+    steps: IntProperty(name="Steps", min=1, max=64, default=3, description="Values per range in Grid mode.")
+
+
+class FIREVFX_SceneSettings(PropertyGroup):
+    rigs: CollectionProperty(type=FIREVFX_RigEntry)
+    active_rig_index: IntProperty(name="Active Rig", default=-1)
+
+    # Background bake queue
+    bake_max_workers: IntProperty(
+        name="Max Workers",
+        min=1,
+        max=64,
+        default=2,
+        description="Background Blender processes allowed to bake at the same time.",
+    )
+    bake_threads_per_worker: IntProperty(
+        name="Threads / Worker",
+        min=0,
+        max=256,
+        default=0,
+        description="Threads per background worker (0 = let Blender decide).",
+    )
+    bake_ram_budget_gb: FloatProperty(
+        name="RAM Budget (GB)",
+        min=0.0,
+        default=16.0,
+        description="Estimated RAM all running workers may use together (0 = no limit).",
+    )
+
+    scene_voxel_budget: FloatProperty(
+        name="Scene Voxel Budget (M)",
+        min=0.0,
+        default=0.0,
+        description="Total voxels in millions for all rigs; Voxel Size rigs are scaled down to fit (0 = unlimited).",
+    )
+
+    # Pre-bake budget guard
+    budget_action: EnumProperty(
+        name="Over Budget",
+        items=[
+            ("WARN", "Warn", "Report the overrun and bake anyway"),
+            ("REFUSE", "Refuse", "Do not start bakes whose estimate exceeds the budget"),
+        ],
+        default="REFUSE",
+    )
+    budget_ram_gb: FloatProperty(
+        name="Max Bake RAM (GB)",
+        min=0.0,
+        default=0.0,
+        description="Peak RAM a single bake may need (0 = this machine's physical RAM).",
+    )
+    budget_disk_gb: FloatProperty(
+        name="Max Bake Disk (GB)",
+        min=0.0,
+        default=0.0,
+        description="Cache size a single bake may write (0 = unlimited).",
+    )
+    budget_time_hours: FloatProperty(
+        name="Max Bake Time (h)",
+        min=0.0,
+        default=0.0,
+        description="Expected bake time allowed for a single bake (0 = unlimited).",
+    )
+
+    # Cache disk quota
+    cache_quota_gb: FloatProperty(
+        name="Cache Quota (GB)",
+        min=0.0,
+        default=0.0,
+        description="Disk budget for content-addressed bakes under the rigs' cache roots (0 = unlimited).",
+    )
+    cache_auto_evict: BoolProperty(
+        name="Evict After Bake",
+        default=True,
+        description="Enforce the cache quota automatically whenever a bake finishes.",
+    )
+
+    # Wedge (parameter sweep) bakes
+    wedge_params: CollectionProperty(type=FIREVFX_WedgeParam)
+    wedge_mode: EnumProperty(
+        name="Sampling",
+        items=[
+            ("GRID", "Grid", "Every combination of each range's steps"),
+            ("LHS", "Latin Hypercube", "A fixed number of well-spread random samples"),
+        ],
+        default="GRID",
+    )
+    wedge_samples: IntProperty(name="Samples", min=1, max=256, default=8, description="Variants in Latin Hypercube mode.")
+    wedge_seed: IntProperty(name="Seed", default=0)
+
+
+# -----------------------------
+# Operators
+# -----------------------------
+
+class FIREVFX_OT_create_rig(Operator):
+    bl_idname = "fire_vfx.create_rig"
+    bl_label = "Create Fire Rig"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        scene = context.scene
+        _migrate_legacy_rig(scene)
+        rig = build_rig(scene, _active_settings(scene))
+        _invalidate_panel_caches()
+        self.report({"INFO"}, f"Created rig '{rig.name}'.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_update_rig(Operator):
+    bl_idname = "fire_vfx.update_rig"
+    bl_label = "Update Rig From Settings"
+    bl_options = {"REGISTER", "UNDO"}
+
+    force: BoolProperty(
+        name="Force Full Write",
+        default=False,
+        description="Rewrite every property, ignoring the last-applied snapshot (use after hand edits).",
+    )
+
+    def execute(self, context):
+        domain, emitter = _find_rig(context)
+
+        if domain is None or emitter is None:
+            self.report({"WARNING"}, "No rig found. Click Create Fire Rig first.")
+            return {"CANCELLED"}
 
+        written, skipped = _update_rig(_active_rig(context.scene), force=self.force)
+        self.report({"INFO"}, f"Rig updated: {written} write(s), {skipped} unchanged skipped.")
+        return {"FINISHED"}
 
-# -----------------------------
-# Operators
-# -----------------------------
 
-class FIREVFX_OT_create_rig(Operator):
-    bl_idname = "fire_vfx.create_rig"
-    bl_label = "Create Fire Rig"
+class FIREVFX_OT_update_all_rigs(Operator):
+    bl_idname = "fire_vfx.update_all_rigs"
+    bl_label = "Update All Rigs"
+    bl_description = "Apply every rig's settings in one pass, writing only changed properties"
     bl_options = {"REGISTER", "UNDO"}
 
+    force: BoolProperty(
+        name="Force Full Write",
+        default=False,
+        description="Rewrite every property, ignoring the last-applied snapshots.",
+    )
+
     def execute(self, context):
         scene = context.scene
-        settings = scene.fire_vfx_settings
-
-        # Create collection
-        col = _ensure_collection(COLLECTION_NAME)
+        _migrate_legacy_rig(scene)
+
+        # One mesh-users map for the whole batch keeps scale baking linear.
+        users_map = _mesh_users_map()
+        voxel_scale = _scene_voxel_scale(scene)
+        dirty = missing = written = skipped = 0
+        for rig in scene.fire_vfx_scene.rigs:
+            result = _update_rig(rig, force=self.force, users_map=users_map, voxel_scale=voxel_scale)
+            if result is None:
+                missing += 1
+                continue
+            written += result[0]
+            skipped += result[1]
+            if result[0]:
+                dirty += 1
+
+        # Single depsgraph evaluation for the whole batch.
+        if written:
+            context.view_layer.update()
+
+        msg = f"{dirty} dirty rig(s) updated: {written} write(s), {skipped} unchanged skipped."
+        if missing:
+            msg += f" {missing} rig(s) missing objects."
+        self.report({"INFO"}, msg)
+        return {"FINISHED"}
 
-        # Create (or reuse) objects
-        domain = bpy.data.objects.get(DOMAIN_NAME)
-        emitter = bpy.data.objects.get(EMITTER_NAME)
 
-        if domain is None:
-            bpy.ops.mesh.primitive_cube_add(size=2.0, location=(0.0, 0.0, 1.0))
-            domain = context.active_object
-            domain.name = DOMAIN_NAME
+class FIREVFX_OT_remove_rig(Operator):
+    bl_idname = "fire_vfx.remove_rig"
+    bl_label = "Remove Rig From List"
+    bl_description = "Forget the active rig (its objects are kept)"
+    bl_options = {"REGISTER", "UNDO"}
 
-        if emitter is None:
-            bpy.ops.mesh.primitive_cylinder_add(radius=0.25, depth=1.0, location=(0.0, 0.0, 0.25))
-            emitter = context.active_object
-            emitter.name = EMITTER_NAME
+    def execute(self, context):
+        scene = context.scene
+        state = scene.fire_vfx_scene
+        rig = _active_rig(scene)
+        if rig is None:
+            return {"CANCELLED"}
+        members = _domain_members(scene, rig) if _rig_owns_domain(rig) else []
+        if members:
+            # Hand a shared domain to the next emitter, keeping its box.
+            heir = members[0]
+            heir.settings.domain_size = rig.settings.domain_size
+            heir.settings.resolution_max = rig.settings.resolution_max
+            rig.domain[RIG_ID_PROP] = heir.rig_id
+            rig.domain[MEMBERS_PROP] = ",".join(m.rig_id for m in members[1:])
+        elif rig.domain is not None and _rig_owns_domain(rig):
+            del rig.domain[RIG_ID_PROP]
+        if rig.emitter is not None and RIG_ID_PROP in rig.emitter:
+            del rig.emitter[RIG_ID_PROP]
+        state.rigs.remove(state.active_rig_index)
+        state.active_rig_index = min(state.active_rig_index, len(state.rigs) - 1)
+        _rig_index(scene, rebuild=True)
+        _invalidate_panel_caches()
+        return {"FINISHED"}
 
-        # Link to collection
-        _link_to_collection(domain, col)
-        _link_to_collection(emitter, col)
 
-        # Apply sizes
-        domain.scale = (settings.domain_size[0] / 2.0, settings.domain_size[1] / 2.0, settings.domain_size[2] / 2.0)
-        emitter.scale = settings.emitter_scale
+class FIREVFX_OT_fit_domain(Operator):
+    bl_idname = "fire_vfx.fit_domain"
+    bl_label = "Fit Domain To Plume"
+    bl_description = "Size and place the domain around the emitter and its predicted plume, keeping the voxel size"
+    bl_options = {"REGISTER", "UNDO"}
 
-        # Optional (can be disruptive to selection); off by default for lightweightness.
-        if settings.apply_scale_on_update:
-            try:
-                bpy.context.view_layer.objects.active = domain
-                domain.select_set(True)
-                bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-            except Exception:
-                pass
-            try:
-                bpy.context.view_layer.objects.active = emitter
-                emitter.select_set(True)
-                bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-            except Exception:
-                pass
+    padding: FloatProperty(
+        name="Padding",
+        min=0.0,
+        max=2.0,
+        default=0.15,
+        description="Extra room around the predicted plume, as a fraction of its size.",
+    )
 
-        # Fluid settings
-        _apply_domain_settings(domain, settings)
-        _apply_flow_settings(emitter, settings)
+    def execute(self, context):
+        scene = context.scene
+        domain, emitter = _find_rig(context)
+        if domain is None or emitter is None:
+            self.report({"WARNING"}, "No rig found. Click Create Fire Rig first.")
+            return {"CANCELLED"}
+        rig = _domain_rig(scene, _active_rig(scene))
+        settings = rig.settings
+
+        ds = _fluid_domain_settings(domain)
+        frames = (ds.cache_frame_start, ds.cache_frame_end) if ds is not None else DEFAULT_CACHE_FRAMES
+        fps = scene.render.fps / scene.render.fps_base
+        seconds = (frames[1] - frames[0] + 1) / fps
+
+        lo, hi = _world_bbox(rig.emitter)
+        for member in _domain_members(scene, rig):
+            m_lo, m_hi = _world_bbox(member.emitter)
+            lo = tuple(min(lo[i], m_lo[i]) for i in range(3))
+            hi = tuple(max(hi[i], m_hi[i]) for i in range(3))
+        center, size = _fit_domain_box(lo, hi, settings, seconds, fps, self.padding)
+
+        # Hold the rig's current voxel size fixed so the savings are real, not
+        # a resolution trade; the preset box is only the comparison baseline.
+        voxel = _rig_voxel_size(settings)
+        if settings.sizing_mode != "VOXEL_SIZE":
+            settings.resolution_max = max(16, min(1024, math.ceil(max(size) / voxel)))
+        preset_size = _preset_value(settings.preset, "domain_size")
+        before = _voxel_count(preset_size, max(16, round(max(preset_size) / voxel)))
+        after = _voxel_count(size, max(16, math.ceil(max(size) / voxel)))
+
+        settings.domain_size = size
+        domain.location = center
+        _update_rig(rig)
+
+        saved = 100.0 * (1.0 - after / before) if before else 0.0
+        self.report(
+            {"INFO"},
+            f"Domain {size[0]:.2f} x {size[1]:.2f} x {size[2]:.2f} m: "
+            f"{after / 1e6:.2f}M voxels vs {before / 1e6:.2f}M for the preset ({saved:+.0f}% saved).",
+        )
+        return {"FINISHED"}
 
-        # Shader
-        _ensure_domain_material(domain, settings)
 
-        # Store references
-        settings.domain_object_name = domain.name
-        settings.emitter_object_name = emitter.name
+class FIREVFX_OT_cluster_rigs(Operator):
+    bl_idname = "fire_vfx.cluster_rigs"
+    bl_label = "Cluster Emitters Into Domains"
+    bl_description = "Merge nearby compatible rigs into shared domains where that lowers the total voxel count"
+    bl_options = {"REGISTER", "UNDO"}
 
-        # Small viewport niceties
-        _set_if_has(domain, "display_type", "WIRE")
-        _set_if_has(emitter, "display_type", "SOLID")
+    padding: FloatProperty(
+        name="Padding",
+        min=0.0,
+        max=2.0,
+        default=0.15,
+        description="Extra room around each predicted plume, as a fraction of its size.",
+    )
+    max_resolution: IntProperty(
+        name="Max Grid Resolution",
+        min=16,
+        max=1024,
+        default=256,
+        description="Never merge rigs into a domain whose longest axis needs more voxels than this.",
+    )
 
+    def execute(self, context):
+        scene = context.scene
+        _migrate_legacy_rig(scene)
+        if not scene.fire_vfx_scene.rigs:
+            self.report({"WARNING"}, "No rigs to cluster.")
+            return {"CANCELLED"}
+        before, after, cost_before, cost_after = cluster_rigs(scene, self.padding, self.max_resolution)
+        context.view_layer.update()
+        self.report(
+            {"INFO"},
+            f"{before} domain(s) -> {after}: {cost_before / 1e6:.2f}M -> {cost_after / 1e6:.2f}M voxels per frame.",
+        )
         return {"FINISHED"}
 
 
-class FIREVFX_OT_update_rig(Operator):
-    bl_idname = "fire_vfx.update_rig"
-    bl_label = "Update Rig From Settings"
+class FIREVFX_OT_instance_bake(Operator):
+    bl_idname = "fire_vfx.instance_bake"
+    bl_label = "Instance Baked Fire"
+    bl_description = (
+        "Place time-offset Volume instances of the active rig's baked cache at the selected objects "
+        "(or in a row), sharing one cache and material"
+    )
     bl_options = {"REGISTER", "UNDO"}
 
+    count: IntProperty(name="Count", min=1, max=1000, default=8, description="Instances to place when nothing is selected.")
+    spacing: FloatProperty(name="Spacing", min=0.0, default=2.0, description="Distance between instances placed in a row.")
+    variants: IntProperty(
+        name="Offset Variants",
+        min=1,
+        max=32,
+        default=4,
+        description="Distinct frame offsets; instances pick one at random.",
+    )
+    max_offset: IntProperty(name="Max Frame Offset", min=0, max=10000, default=48)
+    sequence_mode: EnumProperty(
+        name="Sequence Mode",
+        items=[
+            ("REPEAT", "Repeat", "Loop the baked frames"),
+            ("PING_PONG", "Ping-Pong", "Play forward then backward"),
+            ("EXTEND", "Extend", "Hold the first/last frame"),
+            ("CLIP", "Clip", "Show nothing outside the baked range"),
+        ],
+        default="REPEAT",
+    )
+    seed: IntProperty(name="Seed", default=0)
+    replace: BoolProperty(name="Replace Existing", default=True, description="Remove this rig's previous instances first.")
+
     def execute(self, context):
         scene = context.scene
-        settings = scene.fire_vfx_settings
-        domain, emitter = _find_rig(context)
-
-        if domain is None or emitter is None:
-            self.report({"WARNING"}, "No rig found. Click Create Fire Rig first.")
+        domain, _emitter = _find_rig(context)
+        if domain is None:
+            self.report({"WARNING"}, "No domain found. Create the rig first.")
+            return {"CANCELLED"}
+        rig = _domain_rig(scene, _active_rig(scene))
+
+        rig_objects = {rig.domain, rig.emitter}
+        targets = [o.matrix_world.translation.copy() for o in context.selected_objects if o not in rig_objects]
+        if not targets:
+            start = rig.emitter.matrix_world.translation if rig.emitter is not None else Vector()
+            targets = [start + Vector((self.spacing * (i + 1), 0.0, 0.0)) for i in range(self.count)]
+
+        if self.replace:
+            _clear_instances(rig)
+        objects = instance_baked_fire(
+            rig, targets, self.variants, self.max_offset, self.sequence_mode, self.seed, scene=scene
+        )
+        if not objects:
+            self.report({"WARNING"}, "No OpenVDB cache found for this rig; bake it first.")
             return {"CANCELLED"}
 
-        # Update transforms
-        domain.scale = (settings.domain_size[0] / 2.0, settings.domain_size[1] / 2.0, settings.domain_size[2] / 2.0)
-        emitter.scale = settings.emitter_scale
-
-        if settings.apply_scale_on_update:
-            # Apply transforms (scale only) to avoid changing sim location.
-            try:
-                bpy.context.view_layer.objects.active = domain
-                domain.select_set(True)
-                bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-            except Exception:
-                pass
-            try:
-                bpy.context.view_layer.objects.active = emitter
-                emitter.select_set(True)
-                bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-            except Exception:
-                pass
-
-        _apply_domain_settings(domain, settings)
-        _apply_flow_settings(emitter, settings)
-        _ensure_domain_material(domain, settings)
-
+        ds = _fluid_domain_settings(rig.domain)
+        cache_bytes = sum(_scan_cache_frames(_abs_cache_dir(ds.cache_directory)).values())
+        self.report(
+            {"INFO"},
+            f"{len(objects)} instance(s) of one {_format_bytes(cache_bytes)} cache "
+            f"({len({o.data for o in objects})} offset variant(s)).",
+        )
         return {"FINISHED"}
 
 
@@ -679,25 +4255,92 @@ class FIREVFX_OT_bake_all(Operator):
             self.report({"WARNING"}, "No domain found. Create the rig first.")
             return {"CANCELLED"}
 
-        # Ensure domain is active for bake ops.
-        try:
-            bpy.ops.object.select_all(action="DESELECT")
-            domain.select_set(True)
-            context.view_layer.objects.active = domain
-        except Exception:
-            pass
+        rig = _domain_rig(context.scene, _active_rig(context.scene))
+        _update_rig(rig)
+        key, cache_dir, complete = _rig_bake_state(rig)
+        if complete:
+            self.report({"INFO"}, f"Cache {key} already baked; nothing to do.")
+            return {"FINISHED"}
+        if _cache_dir_busy(cache_dir):
+            self.report({"WARNING"}, "A background bake is writing this cache directory; wait for it to finish.")
+            return {"CANCELLED"}
+        if _bake_stages(rig)["data"] == "BAKED":
+            # Only noise settings changed: keep the base sim, redo the upres.
+            return bpy.ops.fire_vfx.bake_stage(stage="NOISE")
+        if not _guard_budget(self, context.scene, [rig]):
+            return {"CANCELLED"}
+
+        resume = _prepare_resume(rig, cache_dir)
+        _make_domain_active(context, domain)
 
-        # Bake API differs; try common ops.
+        # Bake API differs; try common ops. The fallback does not free the
+        # cache first, so frames kept for a resume survive it.
         try:
-            bpy.ops.fluid.bake_all()
+            ok = _run_bake(resume, _tier_noise(rig.settings)[0])
         except Exception:
             try:
-                bpy.ops.fluid.free_all()
-                bpy.ops.fluid.bake_all()
+                ok = "FINISHED" in bpy.ops.fluid.bake_all()
             except Exception as e:
                 self.report({"ERROR"}, f"Bake failed: {e}")
                 return {"CANCELLED"}
 
+        # Record partial bakes too, so the manifest matches what is on disk.
+        _record_bake(rig)
+        if not ok:
+            self.report({"ERROR"}, "Bake did not finish; the frames baked so far are kept.")
+            return {"CANCELLED"}
+        if resume is not None:
+            self.report({"INFO"}, f"Resumed after frame {resume}.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_bake_stage(Operator):
+    bl_idname = "fire_vfx.bake_stage"
+    bl_label = "Bake Stage"
+    bl_description = "Bake only the base simulation data, or only the noise (upres) pass on top of baked data"
+
+    stage: EnumProperty(
+        name="Stage",
+        items=[
+            ("DATA", "Data", "Base simulation grids (frees the noise)"),
+            ("NOISE", "Noise", "Noise upres pass; needs baked data"),
+        ],
+        default="DATA",
+    )
+
+    def execute(self, context):
+        domain, _emitter = _find_rig(context)
+        if domain is None:
+            self.report({"WARNING"}, "No domain found. Create the rig first.")
+            return {"CANCELLED"}
+
+        rig = _domain_rig(context.scene, _active_rig(context.scene))
+        _update_rig(rig)
+        stages = _bake_stages(rig)
+        if self.stage == "NOISE":
+            if stages["noise"] == "OFF":
+                self.report({"INFO"}, "Noise is off for this rig; nothing to do.")
+                return {"FINISHED"}
+            if stages["data"] != "BAKED":
+                self.report({"WARNING"}, "Bake the data first: the noise pass upsamples it.")
+                return {"CANCELLED"}
+        if stages[self.stage.lower()] == "BAKED":
+            self.report({"INFO"}, f"{self.stage.title()} already baked; nothing to do.")
+            return {"FINISHED"}
+        if self.stage == "DATA" and not _guard_budget(self, context.scene, [rig]):
+            return {"CANCELLED"}
+
+        _make_domain_active(context, domain)
+        try:
+            if self.stage == "DATA":
+                bpy.ops.fluid.bake_data()
+            else:
+                bpy.ops.fluid.bake_noise()
+        except RuntimeError as e:
+            self.report({"ERROR"}, f"Bake failed: {e}")
+            return {"CANCELLED"}
+
+        _record_bake(rig, stage=self.stage)
         return {"FINISHED"}
 
 
@@ -711,12 +4354,7 @@ class FIREVFX_OT_free_all(Operator):
             self.report({"WARNING"}, "No domain found. Create the rig first.")
             return {"CANCELLED"}
 
-        try:
-            bpy.ops.object.select_all(action="DESELECT")
-            domain.select_set(True)
-            context.view_layer.objects.active = domain
-        except Exception:
-            pass
+        _make_domain_active(context, domain)
 
         try:
             bpy.ops.fluid.free_all()
@@ -724,6 +4362,356 @@ class FIREVFX_OT_free_all(Operator):
             self.report({"ERROR"}, f"Free failed: {e}")
             return {"CANCELLED"}
 
+        ds = _fluid_domain_settings(domain)
+        cache_dir = _abs_cache_dir(ds.cache_directory) if ds is not None else None
+        if cache_dir is not None:
+            try:
+                os.remove(os.path.join(cache_dir, CACHE_MANIFEST))
+            except OSError:
+                pass
+            _clear_checkpoint(cache_dir)
+        _invalidate_panel_caches()
+
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_bake_modal(Operator):
+    bl_idname = "fire_vfx.bake_modal"
+    bl_label = "Bake (Interactive)"
+    bl_description = "Bake the active rig without blocking the UI; ESC pauses and keeps the frames baked so far"
+
+    _timer = None
+
+    def invoke(self, context, event):
+        domain, _emitter = _find_rig(context)
+        if domain is None:
+            self.report({"WARNING"}, "No domain found. Create the rig first.")
+            return {"CANCELLED"}
+        rig = _domain_rig(context.scene, _active_rig(context.scene))
+        _update_rig(rig)
+        ds = _fluid_domain_settings(domain)
+        key, cache_dir, complete = _rig_bake_state(rig)
+        if ds is None or cache_dir is None:
+            self.report({"WARNING"}, "Save the .blend first (or use an absolute cache directory).")
+            return {"CANCELLED"}
+        if complete:
+            self.report({"INFO"}, f"Cache {key} already baked; nothing to do.")
+            return {"FINISHED"}
+        if _cache_dir_busy(cache_dir):
+            self.report({"WARNING"}, "A background bake is writing this cache directory; wait for it to finish.")
+            return {"CANCELLED"}
+        if not _guard_budget(self, context.scene, [rig]):
+            return {"CANCELLED"}
+
+        self.rig_id = rig.rig_id
+        self.domain_name = domain.name
+        resume = _prepare_resume(rig, cache_dir)
+        # A resumed bake continues the data only; the noise is left stale.
+        self.stage = "ALL" if resume is None else "DATA"
+        self.monitor = _BakeMonitor(cache_dir, ds.cache_frame_start, ds.cache_frame_end)
+
+        _make_domain_active(context, domain)
+        # INVOKE runs Mantaflow as a window-manager job, so the UI stays live.
+        try:
+            if resume is None:
+                result = bpy.ops.fluid.bake_all("INVOKE_DEFAULT")
+            else:
+                result = bpy.ops.fluid.bake_data("INVOKE_DEFAULT")
+        except RuntimeError as e:
+            self.report({"ERROR"}, f"Bake failed: {e}")
+            return {"CANCELLED"}
+        if "CANCELLED" in result:
+            return {"CANCELLED"}
+
+        _BAKE_PROGRESS[self.rig_id] = self.monitor.poll()
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.5, window=context.window)
+        wm.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def _finish(self, context, state):
+        context.window_manager.event_timer_remove(self._timer)
+        _BAKE_PROGRESS[self.rig_id] = self.monitor.poll(state)
+        rig = _get_rig(context.scene, self.rig_id)
+        if rig is not None:
+            _record_bake(rig, self.monitor.cache_dir, stage=self.stage, defer_stats=True)
+        _tag_redraw()
+
+    def modal(self, context, event):
+        domain = bpy.data.objects.get(self.domain_name)
+        ds = _fluid_domain_settings(domain)
+
+        if event.type == "ESC" and event.value == "PRESS":
+            if domain is not None:
+                _make_domain_active(context, domain)
+                try:
+                    # Pausing stops between frames, so the cache stays consistent.
+                    bpy.ops.fluid.pause_bake()
+                except RuntimeError:
+                    pass
+            self._finish(context, "CANCELLED")
+            self.report({"INFO"}, "Bake paused; frames baked so far are kept.")
+            return {"CANCELLED"}
+
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        progress = self.monitor.poll()
+        if progress["frames"] != _BAKE_PROGRESS.get(self.rig_id, {}).get("frames"):
+            _update_checkpoint(self.monitor.cache_dir)
+        _BAKE_PROGRESS[self.rig_id] = progress
+        _tag_redraw()
+
+        baking = getattr(ds, "is_cache_baking_any", None) if ds is not None else False
+        if baking is None:
+            baking = progress["frames"] < progress["total"]
+        # Give the job a moment to flag itself as running before trusting it.
+        if not baking and progress["elapsed"] > 1.0:
+            self._finish(context, "DONE")
+            return {"FINISHED"}
+        return {"PASS_THROUGH"}
+
+
+class FIREVFX_OT_bake_background(Operator):
+    bl_idname = "fire_vfx.bake_background"
+    bl_label = "Bake in Background"
+    bl_description = "Save a snapshot of the .blend and bake rigs in background Blender processes"
+
+    all_rigs: BoolProperty(name="All Rigs", default=False, description="Queue every rig instead of the active one.")
+
+    def execute(self, context):
+        scene = context.scene
+        _find_rig(context)  # migrates a legacy rig if needed
+        if self.all_rigs:
+            # One job per domain: clustered emitters bake with their owner.
+            rigs = [r for r in scene.fire_vfx_scene.rigs if r.domain is not None and _domain_rig(scene, r).rig_id == r.rig_id]
+        else:
+            rig = _domain_rig(scene, _active_rig(scene))
+            rigs = [rig] if rig is not None and rig.domain is not None else []
+        if not rigs:
+            self.report({"WARNING"}, "No domain found. Create the rig first.")
+            return {"CANCELLED"}
+        planned, hits = _plan_background_bakes(rigs)
+        # Cache hits cost nothing, so only the rigs that will bake are checked.
+        if not _guard_budget(self, scene, [rig for rig, _cache_dir in planned]):
+            return {"CANCELLED"}
+
+        try:
+            jobs = _submit_background_bakes(scene, planned)
+        except RuntimeError as e:
+            self.report({"ERROR"}, f"Could not save bake snapshot: {e}")
+            return {"CANCELLED"}
+        if not jobs and not hits:
+            self.report({"WARNING"}, "Save the .blend first (or use an absolute cache directory).")
+            return {"CANCELLED"}
+        self.report({"INFO"}, f"Queued {len(jobs)} background bake(s); {hits} already cached.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_wedge_add_param(Operator):
+    bl_idname = "fire_vfx.wedge_add_param"
+    bl_label = "Add Wedge Range"
+
+    def execute(self, context):
+        context.scene.fire_vfx_scene.wedge_params.add()
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_wedge_remove_param(Operator):
+    bl_idname = "fire_vfx.wedge_remove_param"
+    bl_label = "Remove Wedge Range"
+
+    index: IntProperty(default=-1)
+
+    def execute(self, context):
+        params = context.scene.fire_vfx_scene.wedge_params
+        if not 0 <= self.index < len(params):
+            return {"CANCELLED"}
+        params.remove(self.index)
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_bake_wedge(Operator):
+    bl_idname = "fire_vfx.bake_wedge"
+    bl_label = "Bake Wedge"
+    bl_description = "Bake every variant of the wedge ranges for the active rig in background processes"
+
+    def execute(self, context):
+        scene = context.scene
+        state = scene.fire_vfx_scene
+        domain, _emitter = _find_rig(context)
+        if domain is None:
+            self.report({"WARNING"}, "No domain found. Create the rig first.")
+            return {"CANCELLED"}
+        rig = _domain_rig(scene, _active_rig(scene))
+        variants = _wedge_variants(_wedge_params(state), state.wedge_mode, state.wedge_samples, state.wedge_seed, rig.settings)
+        if not variants:
+            self.report({"WARNING"}, "Add at least one wedge range.")
+            return {"CANCELLED"}
+
+        try:
+            jobs, hits, over = _submit_wedge_bakes(scene, rig, variants)
+        except RuntimeError as e:
+            self.report({"ERROR"}, f"Could not save bake snapshot: {e}")
+            return {"CANCELLED"}
+        refuse = state.budget_action == "REFUSE"
+        for label, problems in over:
+            self.report({"ERROR" if refuse else "WARNING"}, f"{label}: over budget ({', '.join(problems)})")
+        if not jobs and not hits and not over:
+            self.report({"WARNING"}, "Save the .blend first (or use an absolute cache directory).")
+            return {"CANCELLED"}
+        if refuse and over and not jobs and not hits:
+            return {"CANCELLED"}
+        skipped = f", {len(over)} over budget skipped" if refuse and over else ""
+        self.report({"INFO"}, f"Queued {len(jobs)} of {len(variants)} wedge variant(s); {hits} already cached{skipped}.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_cancel_background_bakes(Operator):
+    bl_idname = "fire_vfx.cancel_background_bakes"
+    bl_label = "Cancel Background Bakes"
+
+    def execute(self, context):
+        _cancel_bake_jobs()
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_clear_finished_bakes(Operator):
+    bl_idname = "fire_vfx.clear_finished_bakes"
+    bl_label = "Clear Finished Bakes"
+
+    def execute(self, context):
+        _discard_finished_jobs()
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_gc_materials(Operator):
+    bl_idname = "fire_vfx.gc_materials"
+    bl_label = "Clean Up Materials"
+    bl_description = "Recount which rigs use each pooled FireVFX material and delete the unused ones"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        removed = gc_material_pool()
+        pooled = sum(1 for m in bpy.data.materials if m.get(POOL_HASH_PROP))
+        self.report({"INFO"}, f"Removed {removed} unused material(s); {pooled} pooled material(s) in use.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_render_profile(Operator):
+    bl_idname = "fire_vfx.render_profile"
+    bl_label = "Apply Render Profile"
+    bl_description = "Tune Cycles/EEVEE volume step, max steps and bounce settings to the rigs' voxel size"
+    bl_options = {"REGISTER", "UNDO"}
+
+    profile: EnumProperty(
+        name="Profile",
+        items=[
+            ("DRAFT", "Draft", "Coarse steps, no volume bounces or volume shadows"),
+            ("FINAL", "Final", "One step per voxel"),
+        ],
+        default="FINAL",
+    )
+
+    def execute(self, context):
+        written = apply_render_profile(context.scene, self.profile)
+        self.report({"INFO"}, f"{self.profile.title()} render profile: {written} volume setting(s) applied.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_restore_render_settings(Operator):
+    bl_idname = "fire_vfx.restore_render_settings"
+    bl_label = "Restore Render Settings"
+    bl_description = "Put back the volume render settings the render profile replaced"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        if not restore_render_settings(context.scene):
+            self.report({"INFO"}, "No render profile applied.")
+            return {"CANCELLED"}
+        self.report({"INFO"}, "Restored previous volume render settings.")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_analyze_cache(Operator):
+    bl_idname = "fire_vfx.analyze_cache"
+    bl_label = "Analyze Cache"
+    bl_description = "Compute per-frame stats of the active rig's baked grids (only frames whose files changed)"
+
+    force: BoolProperty(name="Recompute All", default=False)
+
+    def execute(self, context):
+        rig = _domain_rig(context.scene, _active_rig(context.scene))
+        ds = _fluid_domain_settings(rig.domain) if rig is not None else None
+        if ds is None:
+            self.report({"ERROR"}, "Active rig has no fluid domain.")
+            return {"CANCELLED"}
+        cache_dir = _abs_cache_dir(ds.cache_directory)
+        if cache_dir is None:
+            self.report({"WARNING"}, "Save the .blend first (or use an absolute cache directory).")
+            return {"CANCELLED"}
+        if cache_dir in _STATS_RUNNING:
+            self.report({"INFO"}, "This cache is already being analyzed after its bake.")
+            return {"CANCELLED"}
+        use_noise = bool(_read_manifest(cache_dir).get("noise_complete"))
+        stats, recomputed, unreadable = _update_cache_stats(cache_dir, use_noise, self.force)
+        if unreadable:
+            hint = "" if _openvdb() is not None else " (.vdb frames need the openvdb Python module)"
+            self.report({"WARNING"}, f"{unreadable} frame(s) could not be read{hint}.")
+        if stats is None:
+            self.report({"INFO"}, "No baked frames to analyze.")
+            return {"CANCELLED"}
+        empty = int(stats["empty"].sum())
+        self.report(
+            {"INFO"},
+            f"{len(stats['frame'])} frame(s), {empty} empty; {recomputed} recomputed -> {CACHE_STATS}",
+        )
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_check_cache_collisions(Operator):
+    bl_idname = "fire_vfx.check_cache_collisions"
+    bl_label = "Check Cache Paths"
+    bl_description = "Find fluid domains in the scene that bake into the same cache directory"
+
+    def execute(self, context):
+        collisions = _cache_collisions(context.scene)
+        if not collisions:
+            self.report({"INFO"}, "Every domain has its own cache directory.")
+            return {"FINISHED"}
+        for path, objs in sorted(collisions.items()):
+            self.report({"WARNING"}, f"{', '.join(o.name for o in objs)} share {path}")
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_enforce_cache_quota(Operator):
+    bl_idname = "fire_vfx.enforce_cache_quota"
+    bl_label = "Enforce Cache Quota"
+    bl_description = "Index FireVFX bakes on disk and delete least-recently-used ones no rig references"
+
+    def execute(self, context):
+        evicted, freed, remaining = _enforce_cache_quota(context.scene)
+        self.report(
+            {"INFO"},
+            f"Evicted {len(evicted)} bake(s), freed {_format_bytes(freed)}; {_format_bytes(remaining)} in use.",
+        )
+        return {"FINISHED"}
+
+
+class FIREVFX_OT_report_capabilities(Operator):
+    bl_idname = "fire_vfx.report_capabilities"
+    bl_label = "Report RNA Capabilities"
+    bl_description = "Print which fluid/shader properties this Blender build supports to the console"
+
+    def execute(self, context):
+        table = capability_table()
+        rejected = 0
+        for rna_id, info in table.items():
+            print(f"[FireVFX] {rna_id}: {len(info['writable'])} writable")
+            for attr, reason in info["rejected"].items():
+                print(f"[FireVFX]   {attr}: {reason}")
+                rejected += 1
+        self.report({"INFO"}, f"Probed {len(table)} RNA type(s); {rejected} property write(s) unsupported (see console).")
         return {"FINISHED"}
 
 
@@ -731,6 +4719,15 @@ class FIREVFX_OT_free_all(Operator):
 # UI
 # -----------------------------
 
+class FIREVFX_UL_rigs(UIList):
+    bl_idname = "FIREVFX_UL_rigs"
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row(align=True)
+        row.prop(item, "name", text="", emboss=False, icon="OUTLINER_OB_VOLUME" if item.domain else "ERROR")
+        row.label(text=item.settings.preset.title() if _rig_owns_domain(item) else "Shared")
+
+
 class FIREVFX_PT_panel(Panel):
     bl_label = "Fire VFX"
     bl_idname = "FIREVFX_PT_panel"
@@ -740,30 +4737,55 @@ class FIREVFX_PT_panel(Panel):
 
     def draw(self, context):
         layout = self.layout
-        s = context.scene.fire_vfx_settings
+        state = context.scene.fire_vfx_scene
+        rig = _active_rig(context.scene)
+        s = _active_settings(context.scene)
 
         col = layout.column(align=True)
         col.prop(s, "preset")
         row = col.row(align=True)
         row.operator("fire_vfx.create_rig", text="Create")
         row.operator("fire_vfx.update_rig", text="Update")
+        col.operator("fire_vfx.update_all_rigs", text="Update All Rigs")
         col.prop(s, "ui_show_advanced")
 
         layout.separator()
 
         box = layout.box()
-        box.label(text="Rig")
-        box.prop(s, "domain_object_name")
-        box.prop(s, "emitter_object_name")
+        box.label(text=f"Rigs ({len(state.rigs)})")
+        row = box.row()
+        row.template_list("FIREVFX_UL_rigs", "", state, "rigs", state, "active_rig_index", rows=3)
+        row.operator("fire_vfx.remove_rig", text="", icon="X")
+        box.operator("fire_vfx.cluster_rigs", text="Cluster Emitters Into Domains")
+        if rig is not None:
+            box.prop(rig, "domain")
+            box.prop(rig, "emitter")
+        else:
+            box.label(text="No rig selected: settings below are the template for new rigs.")
 
         box = layout.box()
         box.label(text="Transforms")
         box.prop(s, "domain_size")
         box.prop(s, "emitter_scale")
+        box.operator("fire_vfx.fit_domain", text="Fit Domain To Plume")
 
         box = layout.box()
         box.label(text="Simulation")
-        box.prop(s, "resolution_max")
+        box.row().prop(s, "quality_tier", expand=True)
+        box.prop(s, "sizing_mode")
+        # Keyed on every input, so edits show before the next Update.
+        settings_key = (rig.rig_id if rig is not None else "", _settings_key(s), state.scene_voxel_budget)
+        resolution = _panel_cached("resolution", settings_key, lambda: _effective_resolution(s))
+        if s.sizing_mode == "VOXEL_SIZE":
+            box.prop(s, "voxel_size")
+            box.prop(s, "voxel_budget")
+            box.label(text=f"Resolution: {resolution}")
+        else:
+            box.prop(s, "resolution_max")
+            if s.quality_tier != "FINAL":
+                box.label(text=f"{s.quality_tier.title()} resolution: {resolution}")
+        if s.ui_show_advanced:
+            box.prop(state, "scene_voxel_budget")
         box.prop(s, "time_scale")
         box.prop(s, "vorticity")
 
@@ -806,15 +4828,119 @@ class FIREVFX_PT_panel(Panel):
         box.prop(s, "flame_color_low")
         box.prop(s, "flame_color_mid")
         box.prop(s, "flame_color_high")
+        box.prop(s, "shader_mode")
+        mode = _resolve_shader_mode(s)
+        if mode != "FULL" or s.shader_mode == "AUTO":
+            label = next(i[1] for i in _SHADER_MODE_ITEMS if i[0] == mode)
+            saving = 1.0 - SHADER_MODE_COST[mode]
+            box.label(text=f"{label}: ~{saving:.0%} less volume shading", icon="INFO")
+        box.prop(s, "material_mode")
+        if s.ui_show_advanced and s.material_mode == "BAKED":
+            box.prop(s, "shader_patch_in_place")
+            box.operator("fire_vfx.gc_materials", text="Clean Up Materials")
+
+        box = layout.box()
+        box.label(text="Estimate")
+        est, problems = _panel_cached("estimate", settings_key, lambda: _panel_estimate(context.scene, rig, s))
+        dims = est["dims"]
+        col = box.column(align=True)
+        col.label(text=f"Grid {dims[0]}x{dims[1]}x{dims[2]} ({est['voxels'] / 1e6:.2f}M vox), noise x{est['upres']}")
+        col.label(text=f"RAM ~{_format_bytes(est['ram_bytes'])}, disk ~{_format_bytes(est['disk_bytes'])}")
+        col.label(text=f"~{_format_duration(est['seconds'])} for {est['frames']} frames")
+        if problems:
+            col.label(text="Over budget: " + ", ".join(problems), icon="ERROR")
+        if s.ui_show_advanced:
+            box.prop(state, "budget_action")
+            box.prop(state, "budget_ram_gb")
+            box.prop(state, "budget_disk_gb")
+            box.prop(state, "budget_time_hours")
+
+        box = layout.box()
+        applied = _read_render_restore(context.scene).get("profile")
+        box.label(text=f"Render ({applied.title()} profile)" if applied else "Render")
+        row = box.row(align=True)
+        row.operator("fire_vfx.render_profile", text="Draft").profile = "DRAFT"
+        row.operator("fire_vfx.render_profile", text="Final").profile = "FINAL"
+        sub = row.row(align=True)
+        sub.enabled = applied is not None
+        sub.operator("fire_vfx.restore_render_settings", text="", icon="LOOP_BACK")
 
         box = layout.box()
         box.label(text="Cache / Bake")
         box.prop(s, "cache_directory")
+        box.prop(s, "use_content_cache")
+        box.prop(s, "use_rig_cache_dir")
+        collisions = _panel_cached("collisions", context.scene.name, lambda: _cache_collisions(context.scene))
+        if collisions:
+            row = box.row()
+            row.alert = True
+            row.label(text=f"{len(collisions)} cache dir(s) shared by several domains", icon="ERROR")
+            row.operator("fire_vfx.check_cache_collisions", text="", icon="VIEWZOOM")
         if s.ui_show_advanced:
             box.prop(s, "apply_scale_on_update")
+            row = box.row(align=True)
+            row.prop(s, "analyze_after_bake")
+            row.operator("fire_vfx.analyze_cache", text="", icon="GRAPH")
         row = box.row(align=True)
         row.operator("fire_vfx.bake_all", text="Bake")
         row.operator("fire_vfx.free_all", text="Free")
+        if rig is not None and _fluid_domain_settings(rig.domain) is not None:
+            stages = _cached_bake_stages(_domain_rig(context.scene, rig))
+            row = box.row(align=True)
+            sub = row.row(align=True)
+            sub.alert = stages["data"] == "STALE"
+            sub.operator("fire_vfx.bake_stage", text=f"Data: {BAKE_STAGE_LABELS[stages['data']]}").stage = "DATA"
+            sub = row.row(align=True)
+            sub.alert = stages["noise"] == "STALE"
+            sub.enabled = stages["noise"] != "OFF"
+            sub.operator("fire_vfx.bake_stage", text=f"Noise: {BAKE_STAGE_LABELS[stages['noise']]}").stage = "NOISE"
+        box.operator("fire_vfx.bake_modal", text="Bake (Interactive)")
+        box.operator("fire_vfx.instance_bake", text="Instance Baked Fire")
+        progress = _BAKE_PROGRESS.get(rig.rig_id) if rig is not None else None
+        if progress is not None:
+            box.label(text=_format_progress(progress))
+        row = box.row(align=True)
+        row.operator("fire_vfx.bake_background", text="Bake in Background").all_rigs = False
+        row.operator("fire_vfx.bake_background", text="All Rigs").all_rigs = True
+        if s.ui_show_advanced:
+            box.prop(state, "bake_max_workers")
+            box.prop(state, "bake_threads_per_worker")
+            box.prop(state, "bake_ram_budget_gb")
+        if _BAKE_JOBS:
+            sub = box.column(align=True)
+            for job in _BAKE_JOBS:
+                sub.label(text=f"{job.label}: {job.state.title()} ({job.elapsed():.0f}s)")
+            row = box.row(align=True)
+            row.operator("fire_vfx.cancel_background_bakes", text="Cancel")
+            row.operator("fire_vfx.clear_finished_bakes", text="Clear Finished")
+        used, bakes = _panel_cached("usage", context.scene.name, lambda: _cache_usage(context.scene))
+        row = box.row(align=True)
+        row.label(text=f"Cache: {_format_bytes(used)} in {bakes} bake(s)")
+        row.operator("fire_vfx.enforce_cache_quota", text="", icon="TRASH")
+        if s.ui_show_advanced:
+            box.prop(state, "cache_quota_gb")
+            box.prop(state, "cache_auto_evict")
+            box.operator("fire_vfx.report_capabilities", text="Report Capabilities")
+
+        box = layout.box()
+        row = box.row()
+        row.label(text="Wedge")
+        row.operator("fire_vfx.wedge_add_param", text="", icon="ADD")
+        for i, param in enumerate(state.wedge_params):
+            row = box.row(align=True)
+            row.prop(param, "attr", text="")
+            row.prop(param, "start")
+            row.prop(param, "end")
+            if state.wedge_mode == "GRID":
+                row.prop(param, "steps")
+            row.operator("fire_vfx.wedge_remove_param", text="", icon="X").index = i
+        if state.wedge_params:
+            row = box.row(align=True)
+            row.prop(state, "wedge_mode", text="")
+            if state.wedge_mode == "LHS":
+                row.prop(state, "wedge_samples")
+                row.prop(state, "wedge_seed")
+            box.operator("fire_vfx.bake_wedge", text="Bake Wedge")
 
 
 # -----------------------------
@@ -823,10 +4949,34 @@ class FIREVFX_PT_panel(Panel):
 
 CLASSES = (
     FIREVFX_Settings,
+    FIREVFX_RigEntry,
+    FIREVFX_WedgeParam,
+    FIREVFX_SceneSettings,
     FIREVFX_OT_create_rig,
     FIREVFX_OT_update_rig,
+    FIREVFX_OT_update_all_rigs,
+    FIREVFX_OT_remove_rig,
+    FIREVFX_OT_fit_domain,
+    FIREVFX_OT_cluster_rigs,
+    FIREVFX_OT_instance_bake,
     FIREVFX_OT_bake_all,
+    FIREVFX_OT_bake_stage,
     FIREVFX_OT_free_all,
+    FIREVFX_OT_bake_modal,
+    FIREVFX_OT_bake_background,
+    FIREVFX_OT_wedge_add_param,
+    FIREVFX_OT_wedge_remove_param,
+    FIREVFX_OT_bake_wedge,
+    FIREVFX_OT_cancel_background_bakes,
+    FIREVFX_OT_clear_finished_bakes,
+    FIREVFX_OT_check_cache_collisions,
+    FIREVFX_OT_gc_materials,
+    FIREVFX_OT_render_profile,
+    FIREVFX_OT_analyze_cache,
+    FIREVFX_OT_restore_render_settings,
+    FIREVFX_OT_enforce_cache_quota,
+    FIREVFX_OT_report_capabilities,
+    FIREVFX_UL_rigs,
     FIREVFX_PT_panel,
 )
 
@@ -835,18 +4985,96 @@ def register():
     for c in CLASSES:
         bpy.utils.register_class(c)
     bpy.types.Scene.fire_vfx_settings = PointerProperty(type=FIREVFX_Settings)
+    bpy.types.Scene.fire_vfx_scene = PointerProperty(type=FIREVFX_SceneSettings)
 
     # Initialize defaults from preset once.
     s = bpy.context.scene.fire_vfx_settings
     _apply_preset_to_settings(s, s.preset)
+    # Workers and their temp dirs go when Blender quits, even if never cleared.
+    atexit.register(_shutdown_bake_jobs)
 
 
 def unregister():
+    atexit.unregister(_shutdown_bake_jobs)
+    if bpy.app.timers.is_registered(_poll_bake_jobs):
+        bpy.app.timers.unregister(_poll_bake_jobs)
+    _shutdown_bake_jobs()
+    if hasattr(bpy.types.Scene, "fire_vfx_scene"):
+        del bpy.types.Scene.fire_vfx_scene
     if hasattr(bpy.types.Scene, "fire_vfx_settings"):
         del bpy.types.Scene.fire_vfx_settings
+    _RIG_INDEX.clear()
     for c in reversed(CLASSES):
         bpy.utils.unregister_class(c)
 
 
+# -----------------------------
+# Command line (background workers)
+# -----------------------------
+
+def _cli_wedge(scene, rig_id: str, spec: str, max_workers=0) -> int:
+    """Expand a wedge spec, bake every variant in a worker pool and wait."""
+    if os.path.isfile(spec):
+        with open(spec) as f:
+            spec = f.read()
+    spec = json.loads(spec)
+    rig = _domain_rig(scene, _get_rig(scene, rig_id))
+    if rig is None or rig.domain is None:
+        print(f"[FireVFX] rig {rig_id!r} not found in {bpy.data.filepath}")
+        return 1
+    params = {attr: tuple(r) for attr, r in spec.get("params", {}).items()}
+    variants = _wedge_variants(params, spec.get("mode", "GRID"), spec.get("samples", 8), spec.get("seed", 0), rig.settings)
+    if max_workers > 0:
+        scene.fire_vfx_scene.bake_max_workers = max_workers
+    jobs, hits, over = _submit_wedge_bakes(scene, rig, variants)
+    for label, problems in over:
+        print(f"[FireVFX] {label}: over budget ({', '.join(problems)})")
+    print(f"[FireVFX] wedge: {len(variants)} variant(s), {len(jobs)} to bake, {hits} already cached")
+    # No timers in background mode: drive the queue directly.
+    while _poll_bake_jobs() is not None:
+        time.sleep(1.0)
+    for job in jobs:
+        print(f"[FireVFX] {job.label}: {job.state} -> {job.cache_dir}")
+        if job.state != JOB_DONE:
+            try:
+                with open(job.log_path) as f:
+                    print("".join(f.readlines()[-20:]), end="")
+            except OSError:
+                pass
+    _discard_finished_jobs()
+    refused = over and scene.fire_vfx_scene.budget_action == "REFUSE"
+    return 0 if all(j.state == JOB_DONE for j in jobs) and not refused else 1
+
+
+def _cli_main(argv) -> int:
+    """Entry point for `blender -b file.blend --python blender_fire_vfx.py -- ...`."""
+    parser = argparse.ArgumentParser(prog="blender_fire_vfx")
+    parser.add_argument("--fire-vfx-bake", metavar="RIG_ID", help="Bake one rig's domain.")
+    parser.add_argument("--cache-dir", help="Absolute cache directory for the bake.")
+    parser.add_argument("--overrides", help="JSON {setting: value} applied to the rig before baking.")
+    parser.add_argument("--fire-vfx-wedge", metavar="RIG_ID", help="Bake a parameter sweep of one rig.")
+    parser.add_argument(
+        "--wedge-spec",
+        help='JSON (or a path to it): {"mode": "GRID"|"LHS", "samples": N, "seed": N, '
+        '"params": {setting: [start, end, steps]}}.',
+    )
+    parser.add_argument("--max-workers", type=int, default=0, help="Concurrent wedge workers (default: scene setting).")
+    args = parser.parse_args(argv)
+
+    if not hasattr(bpy.types.Scene, "fire_vfx_scene"):
+        register()
+
+    if args.fire_vfx_bake:
+        overrides = json.loads(args.overrides) if args.overrides else None
+        return 0 if _bake_rig_headless(bpy.context.scene, args.fire_vfx_bake, args.cache_dir, overrides) else 1
+    if args.fire_vfx_wedge:
+        return _cli_wedge(bpy.context.scene, args.fire_vfx_wedge, args.wedge_spec or "{}", args.max_workers)
+    parser.print_help()
+    return 2
+
+
 if __name__ == "__main__":
+    _argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if any(a.startswith("--fire-vfx-") for a in _argv):
+        sys.exit(_cli_main(_argv))
     register()
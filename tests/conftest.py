@@ -0,0 +1,225 @@
+"""Load blender_fire_vfx outside Blender with a minimal bpy/mathutils stand-in.
+
+Only the pure-Python helpers (cache, quota, wedge, clustering, stats) are
+tested; anything that needs real RNA stays untested here.
+"""
+
+import os
+import sys
+import types
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Vector:
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._v = np.array(values, dtype=np.float64)
+
+    def __getitem__(self, i):
+        return float(self._v[i])
+
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(float(v) for v in self._v)
+
+    def __add__(self, other):
+        return Vector(self._v + np.asarray(tuple(other)))
+
+    def __sub__(self, other):
+        return Vector(self._v - np.asarray(tuple(other)))
+
+    def __truediv__(self, k):
+        return Vector(self._v / k)
+
+    def __mul__(self, k):
+        return Vector(self._v * k)
+
+    @property
+    def length(self):
+        return float(np.linalg.norm(self._v))
+
+    def copy(self):
+        return Vector(self._v)
+
+
+class Matrix:
+    def __init__(self, rows=None):
+        self._m = np.eye(4) if rows is None else np.array(rows, dtype=np.float64)
+
+    def __getitem__(self, i):
+        return self._m[i]
+
+    def __len__(self):
+        return len(self._m)
+
+    def __iter__(self):
+        return iter(self._m)
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self._m @ other._m)
+        v = np.asarray(tuple(other), dtype=np.float64)
+        return Vector(self._m[:3, :3] @ v + self._m[:3, 3])
+
+    @property
+    def translation(self):
+        return Vector(self._m[:3, 3])
+
+    def copy(self):
+        return Matrix(self._m)
+
+    def to_4x4(self):
+        m = np.eye(4)
+        m[: len(self._m), : len(self._m)] = self._m
+        return Matrix(m)
+
+    @classmethod
+    def Translation(cls, v):
+        m = np.eye(4)
+        m[:3, 3] = tuple(v)
+        return cls(m)
+
+    @classmethod
+    def Diagonal(cls, v):
+        return cls(np.diag(tuple(v)))
+
+
+def _install_fakes():
+    bpy = types.ModuleType("bpy")
+    props = types.ModuleType("bpy.props")
+    for name in (
+        "BoolProperty",
+        "CollectionProperty",
+        "EnumProperty",
+        "FloatProperty",
+        "FloatVectorProperty",
+        "IntProperty",
+        "PointerProperty",
+        "StringProperty",
+    ):
+        setattr(props, name, lambda *args, **kwargs: kwargs)
+    bpy_types = types.ModuleType("bpy.types")
+    for name in ("Operator", "Panel", "PropertyGroup", "UIList", "Scene", "Object"):
+        setattr(bpy_types, name, type(name, (), {}))
+    bpy.props = props
+    bpy.types = bpy_types
+    bpy.app = SimpleNamespace(
+        background=True,
+        binary_path="blender",
+        handlers=SimpleNamespace(load_post=[]),
+        timers=SimpleNamespace(register=lambda *a, **k: None, is_registered=lambda f: False, unregister=lambda f: None),
+    )
+    bpy.data = SimpleNamespace(filepath="", objects=[], scenes=[], volumes=[], materials={}, collections={})
+
+    def abspath(path):
+        if path.startswith("//"):
+            return os.path.join(os.path.dirname(bpy.data.filepath), path[2:])
+        return path
+
+    bpy.path = SimpleNamespace(abspath=abspath, basename=os.path.basename)
+    bpy.utils = SimpleNamespace(register_class=lambda c: None, unregister_class=lambda c: None)
+    bpy.ops = SimpleNamespace()
+    bpy.context = SimpleNamespace(scene=None)
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = Vector
+    mathutils.Matrix = Matrix
+
+    sys.modules.update({"bpy": bpy, "bpy.props": props, "bpy.types": bpy_types, "mathutils": mathutils})
+
+
+_install_fakes()
+sys.path.insert(0, ROOT)
+
+import blender_fire_vfx  # noqa: E402
+
+
+@pytest.fixture
+def fv():
+    return blender_fire_vfx
+
+
+@pytest.fixture(autouse=True)
+def _session_state(monkeypatch):
+    """Fresh session caches and an unsaved, empty file for every test."""
+    import bpy
+
+    monkeypatch.setattr(bpy.data, "filepath", "")
+    monkeypatch.setattr(bpy.data, "objects", [])
+    monkeypatch.setattr(bpy.data, "scenes", [])
+    monkeypatch.setattr(bpy.data, "volumes", [])
+    blender_fire_vfx._CACHE_INDEXES.clear()
+    blender_fire_vfx._BAKE_STAGES.clear()
+    blender_fire_vfx._PANEL_CACHE.clear()
+    yield
+
+
+class _FakeArray:
+    """A mesh vertex/loop collection supporting len() and foreach_get."""
+
+    def __init__(self, attr, values):
+        self._attr = attr
+        self._values = np.asarray(values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def foreach_get(self, attr, out):
+        assert attr == self._attr
+        out[:] = self._values.ravel()
+
+
+class FakeObject(dict):
+    """Object stand-in: ID custom props are the dict items."""
+
+    def __init__(self, name, location=(0.0, 0.0, 0.0), vertices=None, loops=None):
+        super().__init__()
+        self.name = name
+        self.type = "MESH"
+        self.parent = None
+        self.modifiers = []
+        self.matrix_basis = Matrix.Translation(location)
+        self.data = None
+        if vertices is not None:
+            self.data = SimpleNamespace(vertices=_FakeArray("co", vertices), loops=_FakeArray("vertex_index", loops))
+
+
+CUBE_VERTICES = [(x, y, z) for x in (-1.0, 1.0) for y in (-1.0, 1.0) for z in (-1.0, 1.0)]
+CUBE_LOOPS = [0, 1, 3, 2, 4, 5, 7, 6, 0, 1, 5, 4, 2, 3, 7, 6, 0, 2, 6, 4, 1, 3, 7, 5]
+
+
+@pytest.fixture
+def make_settings(fv):
+    """Rig settings from the property defaults plus a preset, as a plain namespace."""
+
+    def make(preset="TORCH", scene=None, **overrides):
+        values = {name: prop.get("default") for name, prop in fv.FIREVFX_Settings.__annotations__.items()}
+        values.update(fv.BASE_PRESET)
+        values.update(fv.PRESET_OVERRIDES.get(preset, {}))
+        values.update(overrides)
+        values["preset"] = preset
+        scene = scene or SimpleNamespace(fire_vfx_scene=SimpleNamespace(rigs=[], scene_voxel_budget=0.0))
+        return SimpleNamespace(id_data=scene, **values)
+
+    return make
+
+
+@pytest.fixture
+def make_rig(make_settings):
+    """A rig with a cube emitter inside an unsimulated domain object."""
+
+    def make(rig_id="rig1", emitter_location=(0.0, 0.0, 0.5), domain_location=(0.0, 0.0, 1.5), **overrides):
+        settings = make_settings(**overrides)
+        domain = FakeObject("FireDomain", domain_location)
+        emitter = FakeObject("FireEmitter", emitter_location, CUBE_VERTICES, CUBE_LOOPS)
+        rig = SimpleNamespace(rig_id=rig_id, name=rig_id, settings=settings, domain=domain, emitter=emitter, id_data=settings.id_data)
+        settings.id_data.fire_vfx_scene.rigs.append(rig)
+        return rig
+
+    return make
@@ -0,0 +1,21 @@
+import os
+import sys
+
+
+def test_shutdown_terminates_workers_and_removes_temp_dirs(fv, tmp_path, monkeypatch):
+    snapshot_dir = tmp_path / (fv.SNAPSHOT_DIR_PREFIX + "x")
+    snapshot_dir.mkdir()
+    snapshot = str(snapshot_dir / "snapshot.blend")
+    open(snapshot, "wb").close()
+    monkeypatch.setattr(fv, "_BAKE_JOBS", [])
+    running = fv._BakeJob("r1", "Rig", snapshot, str(tmp_path / "cache"), 0.0, [sys.executable, "-c", "import time; time.sleep(60)"])
+    pending = fv._BakeJob("r2", "Rig 2", snapshot, str(tmp_path / "cache2"), 0.0, [sys.executable, "-c", "pass"])
+    fv._BAKE_JOBS.extend([running, pending])
+    running.start()
+
+    fv._shutdown_bake_jobs()
+
+    assert running.proc.wait(timeout=10) != 0
+    assert pending.proc is None
+    assert fv._BAKE_JOBS == []
+    assert not os.path.exists(snapshot_dir)
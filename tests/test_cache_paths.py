@@ -0,0 +1,49 @@
+import os
+from types import SimpleNamespace
+
+import bpy
+import pytest
+
+
+def _rig(cache_directory, per_rig=True, content=True):
+    settings = SimpleNamespace(cache_directory=cache_directory, use_rig_cache_dir=per_rig, use_content_cache=content)
+    return SimpleNamespace(rig_id="abc123", settings=settings)
+
+
+@pytest.mark.parametrize(
+    "root, expected",
+    [
+        ("//", "//abc123"),
+        ("//fire_cache/", "//fire_cache/abc123"),
+        ("/tmp/fire", "/tmp/fire/abc123"),
+    ],
+)
+def test_rig_cache_base_keeps_blend_relative_roots(fv, root, expected):
+    assert fv._rig_cache_base(_rig(root)) == expected
+
+
+def test_rig_cache_base_without_subfolder(fv):
+    assert fv._rig_cache_base(_rig("//", per_rig=False)) == "//"
+
+
+def test_rig_cache_directory_appends_key(fv, monkeypatch):
+    monkeypatch.setattr(fv, "_sim_fingerprint", lambda rig, resolution=None, noise=True: ("k" * 16, {}))
+    assert fv._rig_cache_directory(_rig("//")) == "//abc123/" + "k" * 16
+    assert fv._rig_cache_directory(_rig("//", content=False)) == "//abc123"
+
+
+def test_abs_cache_dir(fv, monkeypatch, tmp_path):
+    assert fv._abs_cache_dir("//abc123") is None
+    monkeypatch.setattr(bpy.data, "filepath", str(tmp_path / "shot.blend"))
+    assert fv._abs_cache_dir("//abc123/") == os.path.join(str(tmp_path), "abc123")
+    assert fv._abs_cache_dir("/tmp/fire/") == "/tmp/fire"
+
+
+def test_vdb_sequence_reads_requested_subdir(fv, tmp_path):
+    for subdir, stem in (("data", "fluid_data"), ("noise", "fluid_noise")):
+        (tmp_path / subdir).mkdir()
+        for frame in (3, 4, 7):
+            (tmp_path / subdir / f"{stem}_{frame:04d}.vdb").write_bytes(b"")
+    assert fv._vdb_sequence(str(tmp_path)) == ("fluid_data_0003.vdb", 3, 5)
+    assert fv._vdb_sequence(str(tmp_path), "noise") == ("fluid_noise_0003.vdb", 3, 5)
+    assert fv._vdb_sequence(str(tmp_path / "missing")) is None
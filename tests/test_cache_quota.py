@@ -0,0 +1,62 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+
+def _bake(root, name, baked_at, size=1000):
+    path = os.path.join(root, name)
+    os.makedirs(os.path.join(path, "data"))
+    with open(os.path.join(path, "data", "fluid_data_0001.vdb"), "wb") as f:
+        f.write(b"\0" * size)
+    with open(os.path.join(path, "fire_vfx_manifest.json"), "w") as f:
+        json.dump({"key": name, "rig_id": "r1", "baked_at": baked_at}, f)
+    return path
+
+
+def _scene(root, quota_bytes):
+    rig = SimpleNamespace(
+        rig_id="r1",
+        name="Rig",
+        domain=None,
+        settings=SimpleNamespace(cache_directory=root, use_content_cache=True, use_rig_cache_dir=False),
+    )
+    return SimpleNamespace(fire_vfx_scene=SimpleNamespace(rigs=[rig], cache_quota_gb=quota_bytes / 1024 ** 3))
+
+
+def test_evicts_least_recently_used_until_under_quota(fv, tmp_path):
+    root = str(tmp_path)
+    now = time.time()
+    old = _bake(root, "old", now - 300)
+    mid = _bake(root, "mid", now - 200)
+    new = _bake(root, "new", now - 100)
+
+    evicted, freed, remaining = fv._enforce_cache_quota(_scene(root, 2500))
+
+    assert evicted == [old]
+    assert not os.path.exists(old) and os.path.isdir(mid) and os.path.isdir(new)
+    assert freed > 1000 and remaining <= 2500
+    with open(os.path.join(root, fv.CACHE_INDEX)) as f:
+        assert set(json.load(f)["entries"]) == {"mid", "new"}
+
+
+def test_referenced_bakes_are_never_evicted(fv, tmp_path, monkeypatch):
+    root = str(tmp_path)
+    now = time.time()
+    old = _bake(root, "old", now - 300)
+    new = _bake(root, "new", now - 100)
+    monkeypatch.setattr(fv, "_referenced_cache_dirs", lambda: {os.path.normpath(old)})
+
+    evicted, _freed, _remaining = fv._enforce_cache_quota(_scene(root, 1500))
+
+    assert evicted == [new]
+    assert os.path.isdir(old)
+
+
+def test_no_quota_keeps_everything(fv, tmp_path):
+    root = str(tmp_path)
+    _bake(root, "a", time.time())
+
+    evicted, freed, remaining = fv._enforce_cache_quota(_scene(root, 0))
+
+    assert evicted == [] and freed == 0 and remaining > 1000
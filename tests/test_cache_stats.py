@@ -0,0 +1,76 @@
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+
+def _write_uni(fv, path, grid):
+    """Write a zyx float32 array as a Mantaflow MNT3 .uni grid."""
+    nz, ny, nx = grid.shape
+    header = fv._UNI_HEADER.pack(nx, ny, nz, 1, fv._UNI_REAL, 4, b"", 0, 0)
+    with gzip.open(path, "wb") as f:
+        f.write(fv._UNI_MAGIC + header + grid.astype("<f4").tobytes())
+
+
+@pytest.fixture
+def cache(fv, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    density = np.zeros((6, 5, 4), dtype=np.float32)
+    density[1:3, 2, 1:4] = 0.5
+    density[2, 2, 3] = 2.0
+    flame = np.zeros_like(density)
+    flame[4, 1, 0] = 3.0
+    _write_uni(fv, data / "density_0001.uni", density)
+    _write_uni(fv, data / "flame_0001.uni", flame)
+    _write_uni(fv, data / "density_0002.uni", np.zeros_like(density))
+    _write_uni(fv, data / "flame_0002.uni", np.zeros_like(density))
+    return tmp_path
+
+
+@pytest.mark.parametrize("slab_voxels", [4 * 1024 * 1024, 20, 1])
+def test_uni_slabs_cover_the_grid(fv, monkeypatch, tmp_path, slab_voxels):
+    grid = np.arange(6 * 5 * 4, dtype=np.float32).reshape(6, 5, 4)
+    _write_uni(fv, tmp_path / "density_0001.uni", grid)
+    monkeypatch.setattr(fv, "_STATS_SLAB_VOXELS", slab_voxels)
+    slabs = list(fv._uni_slabs(str(tmp_path / "density_0001.uni")))
+    assert np.array_equal(np.concatenate([s for _origin, s in slabs]), grid)
+    assert [origin[2] for origin, _s in slabs] == sorted(origin[2] for origin, _s in slabs)
+
+
+def test_uni_slabs_reject_other_files(fv, tmp_path):
+    path = tmp_path / "density_0001.uni"
+    with gzip.open(path, "wb") as f:
+        f.write(b"MNT2" + bytes(400))
+    with pytest.raises(ValueError):
+        list(fv._uni_slabs(str(path)))
+
+
+def test_stats_per_frame(fv, cache):
+    stats, recomputed, unreadable = fv._update_cache_stats(str(cache), use_noise=False)
+    assert (recomputed, unreadable) == (2, 0)
+    assert stats["frame"].tolist() == [1, 2]
+    # Occupied box spans both grids, in (x, y, z) index space.
+    assert stats["bbox_min"][0].tolist() == [0, 1, 1]
+    assert stats["bbox_max"][0].tolist() == [3, 2, 4]
+    assert stats["flame_energy"][0] == pytest.approx(3.0)
+    assert stats["max_density"][0] == pytest.approx(2.0)
+    assert stats["empty"].tolist() == [False, True]
+    assert os.path.isfile(cache / fv.CACHE_STATS)
+
+
+def test_stats_only_reread_changed_frames(fv, cache):
+    fv._update_cache_stats(str(cache), use_noise=False)
+    assert fv._update_cache_stats(str(cache), use_noise=False)[1] == 0
+
+    flame = np.zeros((6, 5, 4), dtype=np.float32)
+    flame[0, 0, 0] = 1.0
+    _write_uni(fv, cache / "data" / "flame_0002.uni", flame)
+    os.remove(cache / "data" / "density_0001.uni")
+    os.remove(cache / "data" / "flame_0001.uni")
+    stats, recomputed, _unreadable = fv._update_cache_stats(str(cache), use_noise=False)
+    assert recomputed == 1
+    assert stats["frame"].tolist() == [2]
+    assert stats["empty"].tolist() == [False]
+    assert fv.cache_stats(str(cache))["frame"].tolist() == [2]
@@ -0,0 +1,25 @@
+def _box(center, half=0.25):
+    return tuple(c - half for c in center), tuple(c + half for c in center)
+
+
+def test_neighbours_share_a_domain(fv):
+    boxes = [_box((0.0, 0.0, 0.0)), _box((0.6, 0.0, 0.0)), _box((0.0, 0.6, 0.0))]
+    assert sorted(map(sorted, fv._cluster_boxes(boxes, 0.05, 256))) == [[0, 1, 2]]
+
+
+def test_distant_emitters_keep_their_own_domains(fv):
+    boxes = [_box((0.0, 0.0, 0.0)), _box((20.0, 20.0, 20.0))]
+    assert sorted(map(sorted, fv._cluster_boxes(boxes, 0.05, 4096))) == [[0], [1]]
+
+
+def test_merge_respects_max_resolution(fv):
+    boxes = [_box((0.0, 0.0, 0.0)), _box((0.6, 0.0, 0.0))]
+    # The union is 22 voxels wide: allowed at 32, refused at 16.
+    assert len(fv._cluster_boxes(boxes, 0.05, 32)) == 1
+    assert len(fv._cluster_boxes(boxes, 0.05, 16)) == 2
+
+
+def test_every_box_is_assigned_once(fv):
+    boxes = [_box((x * 0.4, (x % 3) * 7.0, 0.0)) for x in range(12)]
+    members = [i for cluster in fv._cluster_boxes(boxes, 0.05, 128) for i in cluster]
+    assert sorted(members) == list(range(12))
@@ -0,0 +1,38 @@
+import pytest
+
+
+def test_fingerprint_is_stable(make_rig, fv):
+    a, b = make_rig(), make_rig()
+    assert fv._sim_fingerprint(a)[0] == fv._sim_fingerprint(b)[0]
+    assert len(fv._sim_fingerprint(a)[0]) == 16
+
+
+def test_shading_does_not_change_key(make_rig, fv):
+    base = fv._sim_fingerprint(make_rig())[0]
+    looks = make_rig(flame_strength=99.0, smoke_density=0.1, flame_color_mid=(0.0, 1.0, 0.0, 1.0))
+    assert fv._sim_fingerprint(looks)[0] == base
+
+
+@pytest.mark.parametrize("attr, value", [("vorticity", 0.1), ("flow_fuel", 3.0), ("resolution_max", 128), ("domain_size", (3.0, 3.0, 4.0))])
+def test_simulation_inputs_change_key(make_rig, fv, attr, value):
+    assert fv._sim_fingerprint(make_rig(**{attr: value}))[0] != fv._sim_fingerprint(make_rig())[0]
+
+
+def test_noise_settings_only_change_the_noise_key(make_rig, fv):
+    plain, noisy = make_rig(use_noise=True), make_rig(use_noise=True, noise_strength=2.0)
+    assert fv._sim_fingerprint(noisy)[0] != fv._sim_fingerprint(plain)[0]
+    assert fv._sim_fingerprint(noisy, noise=False)[0] == fv._sim_fingerprint(plain, noise=False)[0]
+
+
+def test_explicit_resolution_overrides_settings(make_rig, fv):
+    rig = make_rig()
+    assert fv._sim_fingerprint(rig, 64)[0] != fv._sim_fingerprint(rig)[0]
+    assert fv._sim_fingerprint(rig, rig.settings.resolution_max)[0] == fv._sim_fingerprint(rig)[0]
+
+
+def test_emitter_placement_is_relative_to_domain(make_rig, fv):
+    base = fv._sim_fingerprint(make_rig())[0]
+    # Moving the whole rig keeps the key; moving the emitter inside the domain does not.
+    moved = make_rig(emitter_location=(5.0, 0.0, 0.5), domain_location=(5.0, 0.0, 1.5))
+    assert fv._sim_fingerprint(moved)[0] == base
+    assert fv._sim_fingerprint(make_rig(emitter_location=(0.3, 0.0, 0.5)))[0] != base
@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+def _settings(preset, tier, fv):
+    values = dict(fv.BASE_PRESET, **fv.PRESET_OVERRIDES.get(preset, {}))
+    return SimpleNamespace(quality_tier=tier, use_noise=True, noise_scale=values["noise_scale"])
+
+
+@pytest.mark.parametrize("preset, upres", [("CANDLE", 2), ("TORCH", 2), ("CAMPFIRE", 3), ("BONFIRE", 3), ("EXPLOSION", 4)])
+def test_final_tier_keeps_preset_upres(fv, preset, upres):
+    assert fv._tier_noise(_settings(preset, "FINAL", fv)) == (True, upres)
+
+
+@pytest.mark.parametrize("preset", ["CANDLE", "TORCH", "CAMPFIRE", "BONFIRE", "EXPLOSION"])
+def test_lower_tiers_never_raise_upres(fv, preset):
+    final = fv._tier_noise(_settings(preset, "FINAL", fv))[1]
+    use_noise, preview = fv._tier_noise(_settings(preset, "PREVIEW", fv))
+    assert use_noise and 1 <= preview <= final
+    assert fv._tier_noise(_settings(preset, "DRAFT", fv))[0] is False
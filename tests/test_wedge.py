@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+
+def test_grid_takes_every_combination(fv):
+    variants = fv._wedge_variants({"vorticity": (0.2, 0.6, 3), "flow_fuel": (1.0, 2.0, 2)})
+    assert len(variants) == 6
+    assert {v["vorticity"] for v in variants} == {0.2, 0.4, 0.6}
+    assert {v["flow_fuel"] for v in variants} == {1.0, 2.0}
+
+
+def test_grid_drops_duplicates(fv):
+    assert fv._wedge_variants({"vorticity": (0.5, 0.5, 4)}) == [{"vorticity": 0.5}]
+
+
+def test_lhs_hits_every_stratum_once(fv):
+    params = {"vorticity": (0.0, 1.0, 0), "flow_fuel": (1.0, 3.0, 0)}
+    variants = fv._wedge_variants(params, "LHS", samples=5, seed=7)
+    assert len(variants) == 5
+    for attr, (start, end, _steps) in params.items():
+        strata = sorted(int((v[attr] - start) / (end - start) * 5) for v in variants)
+        assert strata == [0, 1, 2, 3, 4]
+    assert fv._wedge_variants(params, "LHS", samples=5, seed=7) == variants
+
+
+def test_int_settings_are_rounded(fv):
+    kinds = {"resolution_max": "INT", "vorticity": "FLOAT"}
+    settings = SimpleNamespace(bl_rna=SimpleNamespace(properties={a: SimpleNamespace(type=t) for a, t in kinds.items()}))
+    variants = fv._wedge_variants({"resolution_max": (64, 128, 3), "vorticity": (0.25, 0.25, 1)}, settings=settings)
+    assert [v["resolution_max"] for v in variants] == [64, 96, 128]
+    assert all(isinstance(v["resolution_max"], int) for v in variants)
+
+
+def test_no_params_no_variants(fv):
+    assert fv._wedge_variants({}) == []